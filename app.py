@@ -1,22 +1,34 @@
 import datetime
+import gzip
+import hashlib
+import math
 import os
+import time
+
+_import_start = time.perf_counter()
 
 import pytz as pytz
-from flask import Flask, render_template, session, request, redirect, url_for, send_file, send_from_directory
+from flask import Flask, render_template, session, request, redirect, url_for, send_file, send_from_directory, \
+    stream_with_context, jsonify, make_response, abort
 
-from server.criteria import Criteria
-from server.lp import Data, LpSolve, LpIdealDot
-from server.meta_data import MenuTypes, Mode, AppType
+# Решатель (numpy, pulp), критерии и выгрузка документов (docxtpl) импортируются в обработчиках при первом обращении.
+from server.meta_data import MenuTypes, Mode, AppType, MetaData
+from server.progress import TaskCancelledError, tasks
+from server.scheduler import SolverOverloadError, scheduler
 from server.session import Session
-from server.document import render_table, render_criteria
-from server.config import SECRET_FLASK, SPACE
+from server.config import SECRET_FLASK, SPACE, MAX_CONTENT_LENGTH, WARMUP, IMPORT_TIME_BUDGET, FIRST_ORDER_TIME_LIMIT
 
 
 app = Flask(__name__)
 app.secret_key = SECRET_FLASK
 ALLOWED_EXTENSIONS = set(['txt'])
-app.config['MAX_CONTENT_LENGTH'] = 10 * 1024 * 1024
+app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
 app.permanent_session_lifetime = datetime.timedelta(days=1)
+PAGE_SIZE = 100  # Количество строк таблицы на странице.
+GZIP_MIN_SIZE = 1024  # Минимальный размер ответа в байтах, который сжимается gzip.
+IMPORT_TIME = time.perf_counter() - _import_start  # Время импорта зависимостей приложения в секундах.
+if IMPORT_TIME > IMPORT_TIME_BUDGET:
+    app.logger.warning('Import time %.3f s exceeds budget %.3f s', IMPORT_TIME, IMPORT_TIME_BUDGET)
 
 
 def is_object_session(name):
@@ -91,6 +103,125 @@ def read_file(file):
         return _list
 
 
+def get_table_page(total: int, get_rows) -> dict:
+    """
+    Формирует страницу таблицы по параметру page запроса.
+    :param total: количество строк таблицы.
+    :param get_rows: функция (start, stop), возвращающая строки страницы.
+    """
+
+    pages = max(1, math.ceil(total / PAGE_SIZE))
+    page = min(max(request.args.get('page', 1, type=int), 1), pages)
+    start = (page - 1) * PAGE_SIZE
+
+    return {'page': page, 'pages': pages, 'offset': start, 'rows': get_rows(start, min(start + PAGE_SIZE, total))}
+
+
+def conditional_response(etag_parts: list, render):
+    """
+    Формирует ответ с ETag. Если клиент уже получил ответ с таким ETag, возвращает 304 без рендеринга.
+    :param etag_parts: значения, от которых зависит содержимое ответа.
+    :param render: функция, формирующая ответ.
+    """
+
+    etag = hashlib.sha1(repr(etag_parts).encode()).hexdigest()
+
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        response = make_response(render())
+
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@app.after_request
+def compress_response(response):
+    """
+    Сжимает большие HTML и JSON ответы, если клиент поддерживает gzip.
+    """
+
+    if response.status_code != 200 or response.direct_passthrough or response.is_streamed \
+            or 'Content-Encoding' in response.headers \
+            or response.mimetype not in ['text/html', 'application/json'] \
+            or 'gzip' not in request.accept_encodings \
+            or (response.content_length or 0) < GZIP_MIN_SIZE:
+        return response
+
+    response.set_data(gzip.compress(response.get_data(), compresslevel=5))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+
+    return response
+
+
+@app.errorhandler(SolverOverloadError)
+def solver_overload(error: SolverOverloadError):
+    """
+    Сообщает о превышении ограничений решателя вместо долгого ожидания.
+    """
+
+    response = make_response(render_template('error.html', message=str(error)), 503)
+    if error.retry_after:
+        response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+
+@app.errorhandler(TaskCancelledError)
+def task_cancelled(error: TaskCancelledError):
+    """
+    Расчёт отменён пользователем или новым запросом той же сессии, клиент возвращается к вводу данных.
+    """
+
+    return redirect(url_for('data_get'))
+
+
+@app.route('/status/progress', methods=["GET"])
+def progress_status():
+    """
+    Состояние длительного расчёта сессии: текущее r, количество выполненных и оставшихся решений,
+    лучшая оценка r_dot и время с начала расчёта.
+    """
+
+    progress = Session.get_progress(get_object_session('token')) if is_object_session('token') else None
+    response = jsonify(progress or {'state': 'idle'})
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+@app.route('/form/cancel', methods=["POST"])
+def form_cancel():
+    """
+    Отменяет длительный расчёт сессии и завершает запущенные им процессы CBC.
+    """
+
+    cancelled = tasks.cancel(get_object_session('token')) if is_object_session('token') else False
+    return jsonify({'cancelled': cancelled})
+
+
+@app.route('/status/solver', methods=["GET"])
+def solver_status():
+    """
+    Состояние очереди решателя.
+    """
+
+    return jsonify(scheduler.stats())
+
+
+def get_load_data_page(meta_data: MetaData) -> dict:
+    load_data = meta_data.load_data if 'load_data' in meta_data.__dict__ and meta_data.load_data else []
+    return get_table_page(len(load_data), lambda start, stop: load_data[start:stop])
+
+
+def require_load_data(meta_data: MetaData):
+    """
+    Прерывает запрос с кодом 400, если исходные данные не загружены.
+    """
+    if 'load_data' not in meta_data.__dict__ or not meta_data.load_data:
+        abort(400, description='Исходные данные не загружены!')
+
+
 @app.route('/')
 def main():
     """
@@ -122,7 +253,7 @@ def load_get():
     meta_data.set_active_app(AppType.NSKP)
 
     _session.meta_data = meta_data
-    return render_template('load.html', meta_data=meta_data)
+    return render_template('load.html', meta_data=meta_data, table=get_load_data_page(meta_data))
 
 
 @app.route('/load', methods=['POST'])
@@ -140,10 +271,10 @@ def load_post():
 
     file = request.files['file']
 
-    meta_data.load_data = read_file(file)
+    meta_data.set_load_data(read_file(file))
 
     _session.meta_data = meta_data
-    return render_template('load.html', meta_data=meta_data)
+    return render_template('load.html', meta_data=meta_data, table=get_load_data_page(meta_data))
 
 
 @app.route('/data', methods=["GET"])
@@ -160,7 +291,42 @@ def data_get():
     meta_data.set_active_app(AppType.NSKP)
 
     _session.meta_data = meta_data
-    return render_template('data.html', meta_data=meta_data)
+    return conditional_response(
+        ['data', meta_data.get_state_hash(), request.args.get('page')],
+        lambda: render_template('data.html', meta_data=meta_data, table=get_load_data_page(meta_data),
+                                first_order_time_limit=FIRST_ORDER_TIME_LIMIT))
+
+
+@app.route('/table/data', methods=["GET"])
+def table_data():
+    """
+    Отдаёт страницу загруженной матрицы в формате JSON.
+    """
+
+    _session = get_session()
+    save_session(_session)
+
+    meta_data = _session.meta_data
+
+    return conditional_response(
+        ['table_data', meta_data.get_load_data_hash(), request.args.get('page')],
+        lambda: jsonify(get_load_data_page(meta_data)))
+
+
+@app.route('/table/answer', methods=["GET"])
+def table_answer():
+    """
+    Отдаёт страницу таблицы результатов решения в формате JSON.
+    """
+
+    _session = get_session()
+    save_session(_session)
+
+    result = _session.result
+
+    return conditional_response(
+        ['table_answer', result.get_hash(), request.args.get('page')],
+        lambda: jsonify(get_table_page(getattr(result, 'count_rows', 0), result.print_rows)))
 
 
 @app.route('/answer')
@@ -216,33 +382,88 @@ def criteria_post():
     meta_data.set_active_menu(MenuTypes.CRITERIA)
     meta_data.set_active_app(AppType.CRITERIA)
 
-    file = request.files['file']
+    from server.criteria import Criteria, ChunkedCriteria
 
-    meta_data.criteria_data = read_file(file)
+    file = request.files['file']
 
-    meta_data.criteria = Criteria(meta_data.criteria_data)
+    try:
+        if MetaData.get_value(request.form, 'chunked') and file and allowed_file(file.filename):
+            # Для больших файлов данные в сессии не сохраняются, хранятся только результаты.
+            meta_data.criteria_data = None
+            meta_data.criteria = ChunkedCriteria(file.stream)
+            file.close()
+        else:
+            meta_data.criteria_data = read_file(file)
+            rows = [row for row in meta_data.criteria_data or [] if row]
+            if not rows:
+                raise ValueError('Файл не содержит данных!')
+            if len(rows) < 2 or len(rows[0]) < 2:
+                raise ValueError('Файл должен содержать не менее двух строк и столбец расчётных значений!')
+            if any(len(row) != len(rows[0]) for row in rows):
+                raise ValueError('Строки файла должны содержать одинаковое количество чисел!')
+            meta_data.criteria_data = rows
+            meta_data.criteria = Criteria(
+                meta_data.criteria_data,
+                approximate=bool(MetaData.get_value(request.form, 'approximate')),
+                tolerance=float(MetaData.get_value(request.form, 'tolerance')) / 100
+                if MetaData.get_value(request.form, 'tolerance') else 0.01)
+    except ValueError as error:
+        abort(400, description=str(error))
 
     _session.meta_data = meta_data
     return redirect(url_for('criteria_get'))
 
 
 def _lp_task(meta_data, _session):
-    result = LpSolve(meta_data.mode, Data(meta_data)).result
+    from server.context import solver_contexts
+    from server.history import RunHistory
+
+    # Решение с теми же параметрами берётся из истории сессии без повторного расчёта.
+    history = RunHistory(_session)
+    result = history.find(meta_data)
+    if result is None:
+        with tasks.run(_session.token.body, meta_data.mode.value) as task:
+            task.report(r=meta_data.r, remaining=1)
+            task.publish()
+            start = time.perf_counter()
+            result = solver_contexts.solve(_session.token.body, meta_data)
+            task.report(done=1, remaining=0)
+        history.add(meta_data, result, time.perf_counter() - start)
 
     _session.meta_data = meta_data
     _session.result = result
+    records = history.records()
 
-    return render_template('answer.html', meta_data=meta_data, result=result)
+    return conditional_response(
+        ['answer', meta_data.get_state_hash(), result.get_hash(), [record.id for record in records],
+         request.args.get('page')],
+        lambda: render_template('answer.html', meta_data=meta_data, result=result,
+                                table=get_table_page(result.count_rows, result.print_rows),
+                                history=records, result_hash=result.get_hash()))
 
 
 def _ideal_dot_task(meta_data, _session):
-    result = LpIdealDot(Data(meta_data)).pre_result
+    from server.context import SolverContextStorage
+    from server.lp import Data, LpIdealDot, Pod
+
+    # Поиск идеальной точки выполняется один раз для набора данных и параметров.
+    key = SolverContextStorage.build_key(meta_data)
+    result = _session.ideal_dot
+    if result is None or result.key != key:
+        with tasks.run(_session.token.body, meta_data.mode.value):
+            result = LpIdealDot(Data(meta_data)).pre_result
+        result.key = key
+        _session.ideal_dot = result
 
     meta_data.r = result.r
     _session.meta_data = meta_data
     _session.result = result.result
 
-    return render_template('answer.html', meta_data=meta_data, result=result.result, pods=result.pods_)
+    return conditional_response(
+        ['answer', meta_data.get_state_hash(), result.result.get_hash(), request.args.get('page')],
+        lambda: render_template('answer.html', meta_data=meta_data, result=result.result,
+                                table=get_table_page(result.result.count_rows, result.result.print_rows),
+                                pods=Pod.from_array(result.pods_)))
 
 
 @app.route('/form/data', methods=["POST"])
@@ -261,11 +482,180 @@ def form_data():
     return redirect(url_for('answer'))
 
 
+@app.route('/form/all-targets', methods=["POST"])
+def form_all_targets():
+    """
+    Решает задачу для каждого выбора зависимой переменной
+    и передаёт результаты в расчёт критериев.
+    """
+
+    _session = get_session()
+    save_session(_session)
+
+    meta_data = _session.meta_data
+    meta_data.set_active_menu(MenuTypes.ANSWER)
+    meta_data.set_active_app(AppType.NSKP)
+    meta_data.set_data(request.form)
+    require_load_data(meta_data)
+
+    from server.targets import LpAllTargets
+
+    with tasks.run(_session.token.body, meta_data.mode.value):
+        targets = LpAllTargets(meta_data)
+
+    meta_data.targets = targets.to_print()
+    meta_data.criteria_data = None
+    meta_data.criteria = targets.to_criteria()
+
+    _session.meta_data = meta_data
+    return render_template('targets.html', meta_data=meta_data, targets=meta_data.targets)
+
+
+@app.route('/form/compare-modes', methods=["POST"])
+def form_compare_modes():
+    """
+    Решает задачу во всех режимах расчётов
+    и передаёт расчётные значения в расчёт критериев.
+    """
+
+    _session = get_session()
+    save_session(_session)
+
+    meta_data = _session.meta_data
+    meta_data.set_active_menu(MenuTypes.ANSWER)
+    meta_data.set_active_app(AppType.NSKP)
+    meta_data.set_data(request.form)
+
+    from server.comparison import LpAllModes
+
+    with tasks.run(_session.token.body, meta_data.mode.value):
+        modes = LpAllModes(meta_data, request.form)
+
+    meta_data.modes = modes.to_print()
+    meta_data.criteria_data = None
+    meta_data.criteria = modes.to_criteria()
+
+    _session.meta_data = meta_data
+    return render_template('modes.html', meta_data=meta_data, modes=meta_data.modes,
+                           data_criteria=meta_data.criteria.results.to_print())
+
+
+@app.route('/form/history/recall', methods=["POST"])
+def form_history_recall():
+    """
+    Открывает решение из истории сессии: параметры решения переносятся в метаданные,
+    само решение берётся из истории без повторного расчёта.
+    """
+
+    _session = get_session()
+    save_session(_session)
+
+    from server.history import RunHistory
+
+    meta_data = _session.meta_data
+    if RunHistory(_session).restore(MetaData.get_value(request.form, 'recall'), meta_data):
+        _session.meta_data = meta_data
+
+    return redirect(url_for('answer'))
+
+
+@app.route('/form/history/compare', methods=["POST"])
+def form_history_compare():
+    """
+    Сравнивает выбранные решения из истории сессии без повторного расчёта
+    и передаёт расчётные значения в расчёт критериев.
+    """
+
+    _session = get_session()
+    save_session(_session)
+
+    from server.history import RunHistory
+
+    meta_data = _session.meta_data
+    meta_data.set_active_menu(MenuTypes.ANSWER)
+    meta_data.set_active_app(AppType.NSKP)
+
+    runs, criteria = RunHistory(_session).compare(request.form.getlist('run'), meta_data)
+
+    if criteria is not None:
+        meta_data.criteria_data = None
+        meta_data.criteria = criteria
+
+    _session.meta_data = meta_data
+    return render_template('history.html', meta_data=meta_data, runs=runs,
+                           data_criteria=criteria.results.to_print() if criteria is not None else None)
+
+
+@app.route('/form/resampling', methods=["POST"])
+def form_resampling():
+    """
+    Оценивает устойчивость решения бутстрепом или k-кратной кросс-валидацией.
+    Результаты выборок и итоговая сводка передаются клиенту потоком в формате JSON Lines.
+    """
+
+    _session = get_session()
+    save_session(_session)
+
+    from server.lp import Data
+    from server.resampling import Resampling, ResamplingMethod
+
+    meta_data = _session.meta_data
+    require_load_data(meta_data)
+    mode = Mode.MNM if meta_data.mode is Mode.IDEAL_DOT else meta_data.mode
+
+    try:
+        method = ResamplingMethod.build(MetaData.get_value(request.form, 'method'))
+        count = int(MetaData.get_value(request.form, 'count')) if MetaData.get_value(request.form, 'count') else 10
+        seed = int(MetaData.get_value(request.form, 'seed')) if MetaData.get_value(request.form, 'seed') else None
+
+        resampling = Resampling(mode, Data(meta_data), method, count, seed)
+    except ValueError as error:
+        abort(400, description=str(error))
+
+    token = _session.token.body
+
+    def stream():
+        # Расчёт регистрируется на время передачи потока: его ход виден в /status/progress, /form/cancel его
+        # отменяет. Сводка по решённым выборкам при отмене уже передана.
+        try:
+            with tasks.run(token, mode.value):
+                yield from resampling.stream()
+        except TaskCancelledError:
+            pass
+
+    return app.response_class(stream_with_context(stream()), mimetype='application/x-ndjson')
+
+
+@app.route('/form/grid', methods=["POST"])
+def form_grid():
+    """
+    Рассчитывает поверхности E, M, L, ОСП и N на сетке параметров r × delta (для HMMCAO r × delta_1 × delta_2)
+    и отдаёт их в формате JSON вместе с лучшей точкой сетки.
+    """
+
+    _session = get_session()
+    save_session(_session)
+
+    from server.grid import LpGrid
+
+    meta_data = _session.meta_data
+
+    try:
+        with tasks.run(_session.token.body, meta_data.mode.value):
+            grid = LpGrid.from_form(meta_data, request.form)
+    except ValueError as error:
+        abort(400, description=str(error))
+
+    return jsonify(grid.surfaces.to_dict())
+
+
 @app.route('/form/load_result', methods=["POST"])
 def form_load_result():
     _session = get_session()
     save_session(_session)
 
+    from server.document import render_table
+
     result = _session.result
     file_stream = render_table(_session.meta_data.mode, result.print(), result.pods)
 
@@ -282,6 +672,8 @@ def form_load_criteria_result():
     _session = get_session()
     save_session(_session)
 
+    from server.document import render_criteria
+
     file_stream = render_criteria(_session.meta_data.criteria.results.to_print())
 
     return send_file(
@@ -292,6 +684,42 @@ def form_load_criteria_result():
                       f'.docx')
 
 
+@app.route('/export/<table>', methods=["GET"])
+def export_table(table: str):
+    """
+    Выгружает потоком таблицу результатов решения (answer), подзадач поиска идеальной точки (pods)
+    или критериев (criteria) в формате CSV, JSON Lines или XLSX.
+    """
+
+    _session = get_session()
+    save_session(_session)
+
+    from server.export import ExportFormat, TABLE_HEADERS, POD_HEADERS, CRITERIA_HEADERS, \
+        result_rows, pod_rows, criteria_rows, stream
+
+    meta_data = _session.meta_data
+    try:
+        export_format = ExportFormat.build(request.args.get('format'))
+    except ValueError:
+        abort(400, description='Неизвестный формат выгрузки!')
+
+    if table == 'answer':
+        headers, rows = TABLE_HEADERS[meta_data.mode], result_rows(_session.result, meta_data.mode)
+    elif table == 'pods':
+        headers, rows = POD_HEADERS, pod_rows(getattr(_session.result, 'pods', None))
+    elif table == 'criteria':
+        headers, rows = CRITERIA_HEADERS, criteria_rows(getattr(meta_data, 'criteria', None))
+    else:
+        abort(404)
+
+    return app.response_class(
+        stream_with_context(stream(export_format, headers, rows)),
+        mimetype=export_format.mimetype,
+        headers={'Content-Disposition': f'attachment; filename={table}_'
+                                        f'{datetime.datetime.now(pytz.timezone("Asia/Irkutsk")).strftime("%Y-%m-%d_%H-%M-%S")}'
+                                        f'.{export_format.value}'})
+
+
 @app.route('/form/update_params', methods=['POST'])
 def form_update_params():
     _session = get_session()
@@ -328,4 +756,9 @@ if __name__ == '__main__':
     else:
         from waitress import serve
 
+        if WARMUP:
+            from server.warmup import warm_up
+
+            app.logger.warning('Warm-up: %s', warm_up())
+
         serve(app, host="0.0.0.0", port=5000)
@@ -0,0 +1,425 @@
+"""
+Нагрузочное тестирование приложения.
+
+Прогоняет полный сценарий работы пользователя через маршруты app.py (загрузка данных, выбор режима,
+ввод параметров, решение, выгрузка результата и расчёт критериев) для множества одновременных сессий.
+Запросы выполняются в процессе через тестовый клиент Flask, Redis может быть локальным или заменяться
+хранилищем в памяти процесса.
+
+Пример:
+    python loadtest.py --sessions 40 --concurrency 8 --rows 30 --memory-redis
+"""
+import argparse
+import io
+import json
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import redis
+
+from server.session import Session
+
+
+class MemoryRedis:
+    """
+    Хранилище в памяти процесса с командами Redis, которые использует Session.
+    Сроки хранения не отслеживаются: время теста много меньше срока жизни сессии.
+    """
+
+    _data: dict
+    _versions: dict  # Номер изменения ключа, по нему транзакция проверяет ключи под WATCH.
+    _lock: threading.RLock
+
+    def __init__(self):
+        self._data = {}
+        self._versions = {}
+        self._lock = threading.RLock()
+
+    def get(self, key):
+        with self._lock:
+            return self._data.get(key)
+
+    def set(self, key, value, ex=None, keepttl=False):
+        if isinstance(value, (str, int)):
+            value = str(value).encode()
+        with self._lock:
+            self._data[key] = value
+            self._touch(key)
+        return True
+
+    def incr(self, key):
+        with self._lock:
+            value = int(self._data.get(key) or 0) + 1
+            self._data[key] = str(value).encode()
+            self._touch(key)
+        return value
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._touch(key)
+            return sum(self._data.pop(key, None) is not None for key in keys)
+
+    def _touch(self, key):
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+    def expireat(self, key, when):
+        return True
+
+    def pipeline(self, transaction=True):
+        return MemoryPipeline(self)
+
+    def ping(self):
+        return True
+
+    def close(self):
+        pass
+
+    def used_memory(self) -> int:
+        with self._lock:
+            return sum(len(key) + len(value) for key, value in self._data.items())
+
+
+class MemoryPipeline:
+    """
+    Транзакция MemoryRedis: команды копятся и выполняются под блокировкой хранилища.
+    После watch() команды выполняются сразу до вызова multi(), а execute() отменяет транзакцию
+    с redis.WatchError, если ключи под WATCH изменились.
+    """
+
+    _client: MemoryRedis
+    _commands: list
+    _watched: dict | None  # Ключи под WATCH и их номера изменений.
+    _immediate: bool  # После watch() и до multi() команды выполняются сразу.
+
+    def __init__(self, client: MemoryRedis):
+        self._client = client
+        self._commands = []
+        self._watched = None
+        self._immediate = False
+
+    def watch(self, *keys):
+        with self._client._lock:
+            self._watched = {key: self._client._versions.get(key, 0) for key in keys}
+        self._immediate = True
+
+    def multi(self):
+        self._immediate = False
+
+    def reset(self):
+        self._commands = []
+        self._watched = None
+        self._immediate = False
+
+    def __getattr__(self, name):
+        method = getattr(MemoryRedis, name)
+        if self._immediate:
+            return lambda *args, **kwargs: method(self._client, *args, **kwargs)
+
+        def queue(*args, **kwargs):
+            self._commands.append((method, args, kwargs))
+            return self
+
+        return queue
+
+    def execute(self) -> list:
+        # Блокировка хранилища повторно входимая: транзакция держит её, пока выполняются все команды.
+        with self._client._lock:
+            watched = self._watched or {}
+            if any(self._client._versions.get(key, 0) != version for key, version in watched.items()):
+                self.reset()
+                raise redis.WatchError(f'Изменены ключи {list(watched)}')
+            results = [method(self._client, *args, **kwargs) for method, args, kwargs in self._commands]
+        self.reset()
+        return results
+
+
+class RedisMeter:
+    """
+    Обёртка над клиентом Redis, считающая объём записанных и прочитанных данных.
+    """
+
+    _client: object
+    _stats: 'LoadStats'
+
+    def __init__(self, client, stats: 'LoadStats'):
+        self._client = client
+        self._stats = stats
+
+    def get(self, key):
+        value = self._client.get(key)
+        self._stats.add_redis(read=RedisMeter.size(value))
+        return value
+
+    def set(self, key, value, *args, **kwargs):
+        self._stats.add_redis(written=RedisMeter.size(value))
+        return self._client.set(key, value, *args, **kwargs)
+
+    def pipeline(self, transaction=True):
+        return PipelineMeter(self._client.pipeline(transaction=transaction), self._stats)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    @staticmethod
+    def size(value) -> int:
+        return len(value) if isinstance(value, (bytes, str)) else 0
+
+
+class PipelineMeter:
+    """
+    Обёртка над транзакцией Redis, считающая объём записанных и прочитанных данных.
+    """
+
+    def __init__(self, pipeline, stats: 'LoadStats'):
+        self._pipeline = pipeline
+        self._stats = stats
+        self._reads = []
+        self._immediate = False
+
+    def watch(self, *keys):
+        self._pipeline.watch(*keys)
+        self._immediate = True
+
+    def multi(self):
+        self._pipeline.multi()
+        self._immediate = False
+
+    def reset(self):
+        self._pipeline.reset()
+        self._reads = []
+        self._immediate = False
+
+    def get(self, key):
+        if self._immediate:
+            value = self._pipeline.get(key)
+            self._stats.add_redis(read=RedisMeter.size(value))
+            return value
+
+        self._reads.append(True)
+        self._pipeline.get(key)
+        return self
+
+    def set(self, key, value, *args, **kwargs):
+        self._reads.append(False)
+        self._stats.add_redis(written=RedisMeter.size(value))
+        self._pipeline.set(key, value, *args, **kwargs)
+        return self
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self._reads.append(False)
+            getattr(self._pipeline, name)(*args, **kwargs)
+            return self
+
+        return queue
+
+    def execute(self) -> list:
+        results = self._pipeline.execute()
+        self._stats.add_redis(read=sum(RedisMeter.size(value) for value, read in zip(results, self._reads) if read))
+        self._reads = []
+        return results
+
+
+class LoadStats:
+    """
+    Накопленные показатели теста: время и процессорное время запросов по маршрутам, объём обмена с Redis.
+    """
+
+    def __init__(self):
+        self.latency = defaultdict(list)
+        self.cpu = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.redis_read = 0
+        self.redis_written = 0
+        self._lock = threading.Lock()
+
+    def add_request(self, route: str, latency: float, cpu: float, ok: bool):
+        with self._lock:
+            self.latency[route].append(latency)
+            self.cpu[route].append(cpu)
+            if not ok:
+                self.errors[route] += 1
+
+    def add_redis(self, read: int = 0, written: int = 0):
+        with self._lock:
+            self.redis_read += read
+            self.redis_written += written
+
+    @property
+    def requests(self) -> int:
+        return sum(len(values) for values in self.latency.values())
+
+
+def percentile(values: list, q: float) -> float:
+    """
+    Перцентиль q (от 0 до 100) методом ближайшего ранга.
+    """
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def build_dataset(rows: int, columns: int, rng: random.Random) -> bytes:
+    """
+    Формирует синтетический набор данных: первый столбец - линейная комбинация остальных с шумом.
+    """
+    coefficients = [rng.uniform(-3, 3) for _ in range(columns - 1)]
+    lines = []
+    for _ in range(rows):
+        x = [round(rng.uniform(1, 20), 1) for _ in range(columns - 1)]
+        y = round(sum(a * value for a, value in zip(coefficients, x)) + rng.gauss(0, 2), 2)
+        lines.append(' '.join(map(str, [y] + x)))
+
+    return '\n'.join(lines).encode()
+
+
+def build_criteria(rows: int, rng: random.Random) -> bytes:
+    """
+    Формирует данные для расчёта критериев: фактические значения и два прогноза.
+    """
+    lines = []
+    for _ in range(rows):
+        y = round(rng.uniform(1, 100), 1)
+        lines.append(f'{y} {round(y + rng.gauss(0, 5), 1)} {round(y + rng.gauss(0, 15), 1)}')
+
+    return '\n'.join(lines).encode()
+
+
+def run_session(app, index: int, args, stats: LoadStats):
+    """
+    Проходит сценарий одной сессии пользователя.
+    """
+    rng = random.Random(args.seed + index)
+    client = app.test_client()
+    mode = args.modes[index % len(args.modes)]
+
+    def request(route: str, method: str, expected: int, **kwargs):
+        start, cpu_start = time.perf_counter(), time.thread_time()
+        response = client.open(route, method=method, **kwargs)
+        ok = response.status_code == expected
+        stats.add_request(route, time.perf_counter() - start, time.thread_time() - cpu_start, ok)
+        return response
+
+    data = build_dataset(args.rows, args.columns, rng)
+    request('/', 'GET', 200)
+    request('/load', 'POST', 200, data={'file': (io.BytesIO(data), 'data.txt')}, content_type='multipart/form-data')
+    request('/form/change-mode', 'POST', 302,
+            data={'mode': 'MODE_MNM', 'ideal_dot': 'on'} if mode == 'IDEAL_DOT' else {'mode': mode})
+    request('/form/data', 'POST', 302, data={'var_y': '1', 'r': str(args.r), 'M': '100000', 'free_chlen': 'on'})
+    request('/answer', 'GET', 200)
+    request('/form/load_result', 'POST', 200)
+
+    if args.criteria:
+        criteria = build_criteria(args.rows, rng)
+        request('/criteria', 'GET', 200)
+        request('/criteria', 'POST', 302, data={'file': (io.BytesIO(criteria), 'criteria.txt')},
+                content_type='multipart/form-data')
+        request('/criteria', 'GET', 200)
+
+
+def report(stats: LoadStats, args, wall: float, cpu: float, children_cpu: float, redis_memory: int | None) -> dict:
+    routes = {}
+    for route, values in stats.latency.items():
+        routes[route] = {
+            'count': len(values),
+            'errors': stats.errors[route],
+            'p50': percentile(values, 50),
+            'p95': percentile(values, 95),
+            'p99': percentile(values, 99),
+            'mean': sum(values) / len(values),
+            'cpu': sum(stats.cpu[route]) / len(values),
+        }
+
+    requests = max(stats.requests, 1)
+    return {
+        'sessions': args.sessions,
+        'concurrency': args.concurrency,
+        'rows': args.rows,
+        'columns': args.columns,
+        'modes': args.modes,
+        'wall': wall,
+        'throughput': stats.requests / wall,
+        'sessions_per_second': args.sessions / wall,
+        'cpu_per_request': cpu / requests,
+        'solver_cpu_per_request': children_cpu / requests,
+        'redis_written_per_request': stats.redis_written / requests,
+        'redis_read_per_request': stats.redis_read / requests,
+        'redis_memory': redis_memory,
+        'routes': routes,
+    }
+
+
+def print_report(data: dict):
+    print(f"Сессий: {data['sessions']}, одновременно: {data['concurrency']}, "
+          f"данные: {data['rows']} x {data['columns']}, режимы: {', '.join(data['modes'])}")
+    print(f"Время: {data['wall']:.2f} с, запросов в секунду: {data['throughput']:.2f}, "
+          f"сессий в секунду: {data['sessions_per_second']:.2f}")
+    print(f"CPU на запрос: {data['cpu_per_request'] * 1000:.1f} мс (процесс), "
+          f"{data['solver_cpu_per_request'] * 1000:.1f} мс (CBC)")
+    print(f"Redis на запрос: записано {data['redis_written_per_request'] / 1024:.1f} КБ, "
+          f"прочитано {data['redis_read_per_request'] / 1024:.1f} КБ"
+          + (f", занято {data['redis_memory'] / 2 ** 20:.1f} МБ" if data['redis_memory'] is not None else ''))
+    print()
+    print(f"{'Маршрут':<22}{'запросов':>9}{'ошибок':>8}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}{'CPU, мс':>10}")
+    for route, item in data['routes'].items():
+        print(f"{route:<22}{item['count']:>9}{item['errors']:>8}{item['p50'] * 1000:>10.1f}"
+              f"{item['p95'] * 1000:>10.1f}{item['p99'] * 1000:>10.1f}{item['cpu'] * 1000:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочное тестирование маршрутов приложения.')
+    parser.add_argument('--sessions', type=int, default=20, help='количество сессий пользователей')
+    parser.add_argument('--concurrency', type=int, default=4, help='количество одновременных сессий')
+    parser.add_argument('--rows', type=int, default=20, help='количество строк синтетических данных')
+    parser.add_argument('--columns', type=int, default=3, help='количество столбцов синтетических данных')
+    parser.add_argument('--modes', default='MODE_MNM,HMMCAO',
+                        help='режимы расчётов через запятую: MODE_MNM, HMMCAO, MODE_PIECEWISE_GIVEN, IDEAL_DOT')
+    parser.add_argument('--r', type=float, default=0.5, help='уровень приоритета суммы модулей')
+    parser.add_argument('--no-criteria', dest='criteria', action='store_false', help='не проверять расчёт критериев')
+    parser.add_argument('--memory-redis', action='store_true', help='хранить сессии в памяти процесса вместо Redis')
+    parser.add_argument('--seed', type=int, default=0, help='зерно генератора синтетических данных')
+    parser.add_argument('--json', help='файл для сохранения результатов в формате JSON')
+    args = parser.parse_args()
+    args.modes = [mode.strip() for mode in args.modes.split(',') if mode.strip()]
+
+    stats = LoadStats()
+    memory = MemoryRedis() if args.memory_redis else None
+    get_redis = Session._get_redis
+    Session._get_redis = staticmethod(lambda: RedisMeter(memory if memory is not None else get_redis(), stats))
+
+    from app import app
+
+    times, start = os.times(), time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        futures = [executor.submit(run_session, app, index, args, stats) for index in range(args.sessions)]
+        for future in futures:
+            future.result()
+    wall = time.perf_counter() - start
+    end = os.times()
+
+    if memory is not None:
+        redis_memory = memory.used_memory()
+    else:
+        r = get_redis()
+        redis_memory = r.info('memory').get('used_memory')
+        r.close()
+
+    data = report(stats, args, wall, (end.user + end.system) - (times.user + times.system),
+                  (end.children_user + end.children_system) - (times.children_user + times.children_system),
+                  redis_memory)
+    print_report(data)
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(data, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
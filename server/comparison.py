@@ -0,0 +1,126 @@
+import copy
+import time
+from concurrent.futures import wait
+from typing import List
+
+import numpy as np
+
+from server.criteria import Criteria, Results
+from server.first_order import FirstOrderSolve
+from server.lp import Data, LpSolve, Result
+from server.meta_data import MetaData, Mode, Solver
+from server.pool import PoolRun
+from server.progress import Task, tasks
+from server.scheduler import ModelSize
+
+# Сравниваемые режимы расчётов и их подписи.
+MODES = {
+    Mode.MNM: 'МНМ',
+    Mode.HMMCAO: 'HMMCAO',
+    Mode.PIECEWISE_GIVEN: 'Кусочно-заданная',
+}
+
+
+class ModeResult:
+    """
+    Результат решения задачи в одном режиме расчётов.
+    """
+
+    mode: Mode
+    result: Result
+    time: float
+
+    def __init__(self, mode: Mode, result: Result, _time: float):
+        self.mode = mode
+        self.result = result
+        self.time = _time
+
+    @property
+    def name(self) -> str:
+        if getattr(self.result, 'convergence', None) is not None:
+            return f'{MODES[self.mode]}, первый порядок'
+        return MODES[self.mode]
+
+    def to_print(self) -> list:
+        return [self.name,
+                Results.formatting(self.result.e),
+                self.result.osp,
+                Results.formatting(self.result.m),
+                Results.formatting(self.result.N),
+                Results.formatting(self.time)]
+
+
+def _solve_mode(mode: Mode, data: Data, solver: Solver, gap: float) -> ModeResult:
+    """
+    Решает задачу в одном режиме расчётов выбранным решателем, как при обычном решении. Выполняется в воркере пула.
+    """
+    start = time.perf_counter()
+    if solver is Solver.FIRST_ORDER:
+        result = FirstOrderSolve(mode, data, gap=gap).result
+    else:
+        result = LpSolve(mode, data, cache=True).result
+
+    return ModeResult(mode, result, time.perf_counter() - start)
+
+
+def _solve_size(mode: Mode, data: Data, solver: Solver) -> ModelSize:
+    """
+    Оценка размера решения в одном режиме для места в планировщике.
+    """
+    if solver is Solver.FIRST_ORDER:
+        return FirstOrderSolve.estimate_size(*data.x.shape)
+    return LpSolve.estimate_size(mode, data)
+
+
+class LpAllModes:
+    """
+    Решение задачи во всех режимах расчётов для одной зависимой переменной.
+    Матрица исходных данных подготавливается один раз, задачи решаются параллельно в пуле воркеров.
+    Параметры каждого режима берутся из формы, незаполненные - по умолчанию. Метод первого порядка, выбранный
+    на форме, применяется к МНМ и HMMCAO, кусочно-заданная модель всегда решается CBC.
+    Ход расчёта публикуется по решённым режимам, при отмене ещё не начатые режимы не решаются.
+    """
+
+    y: np.ndarray
+    results: List[ModeResult]
+
+    def __init__(self, meta_data: MetaData, form):
+        self.results = []
+
+        self._calculation(meta_data, form)
+
+    def _calculation(self, meta_data: MetaData, form):
+        matrix = Data.prepare_matrix(meta_data)
+
+        task = tasks.current()
+        with PoolRun() as run:
+            for mode in MODES:
+                mode_meta_data = copy.copy(meta_data)
+                mode_meta_data.mode = mode
+                mode_meta_data.set_data(form)
+
+                data = Data(mode_meta_data, matrix=matrix)
+                self.y = data.y
+                run.submit(_solve_size(mode, data, mode_meta_data.solver), _solve_mode, mode, data,
+                           mode_meta_data.solver, getattr(mode_meta_data, 'gap', None))
+
+            pending = set(run.futures)
+            while pending:
+                _, pending = wait(pending, timeout=Task.PUBLISH_INTERVAL)
+                if task is not None:
+                    task.check()
+                    task.report(done=len(run.futures) - len(pending), remaining=len(pending))
+
+            self.results = [future.result() for future in run.futures]
+
+    def to_print(self) -> list:
+        return [item.to_print() for item in self.results]
+
+    def to_criteria(self) -> Criteria:
+        """
+        Формирует таблицу критериев: фактические значения y сравниваются с расчётными значениями всех режимов.
+        """
+        criteria = Criteria(np.column_stack([self.y] + [item.result.yy for item in self.results]).tolist())
+        criteria.results.names = [item.name for item in self.results]
+
+        return criteria
@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 SECRET_FLASK = os.environ.get('SECRET_FLASK') if os.environ.get('SECRET_FLASK') is not None else 'secret'
 SECRET_JWT = os.environ.get('SECRET_JWT') if os.environ.get('SECRET_FLASK') is not None else 'secret'
@@ -9,3 +10,80 @@ REDIS_PORT = os.environ.get("REDIS_PORT") if os.environ.get('SECRET_FLASK') is n
 SPACE = os.environ.get("SPACE") if os.environ.get('SECRET_FLASK') is not None else 'dev'
 
 BASE_DIR = os.environ.get('BASE_DIR') if os.environ.get('BASE_DIR') is not None else 'resources'
+
+# Максимальный размер загружаемого файла в байтах.
+MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH')) \
+    if os.environ.get('MAX_CONTENT_LENGTH') is not None else 10 * 1024 * 1024
+
+# Количество построенных задач ЛП, которые хранятся в памяти процесса для повторного решения.
+SOLVER_CONTEXTS_SIZE = int(os.environ.get('SOLVER_CONTEXTS_SIZE')) \
+    if os.environ.get('SOLVER_CONTEXTS_SIZE') is not None else 32
+
+# Количество процессов в пуле для параллельного решения задач ЛП.
+WORKERS = int(os.environ.get('WORKERS')) if os.environ.get('WORKERS') is not None else (os.cpu_count() or 1)
+
+# Количество одновременно работающих процессов CBC в одном процессе приложения.
+SOLVER_CONCURRENCY = int(os.environ.get('SOLVER_CONCURRENCY')) \
+    if os.environ.get('SOLVER_CONCURRENCY') is not None else (os.cpu_count() or 1)
+
+# Оценка памяти, которую могут занимать одновременно решаемые модели, в мегабайтах.
+SOLVER_MEMORY_BUDGET = int(os.environ.get('SOLVER_MEMORY_BUDGET')) \
+    if os.environ.get('SOLVER_MEMORY_BUDGET') is not None else 2048
+
+# Максимальное время ожидания решения в очереди, в секундах.
+SOLVER_MAX_WAIT = float(os.environ.get('SOLVER_MAX_WAIT')) \
+    if os.environ.get('SOLVER_MAX_WAIT') is not None else 60
+
+# Прогрев приложения при запуске через waitress: шаблоны docx, решатель, соединение с Redis.
+WARMUP = os.environ.get('WARMUP', '1') == '1'
+
+# Допустимое время импорта приложения в секундах, при превышении пишется предупреждение.
+IMPORT_TIME_BUDGET = float(os.environ.get('IMPORT_TIME_BUDGET')) \
+    if os.environ.get('IMPORT_TIME_BUDGET') is not None else 0.5
+
+# Каталог кеша построенных задач ЛП на локальном диске. Должен принадлежать пользователю процесса (права 0o700).
+MODEL_CACHE_DIR = os.environ.get('MODEL_CACHE_DIR') if os.environ.get('MODEL_CACHE_DIR') is not None \
+    else os.path.join(tempfile.gettempdir(), f'nksp_models_{os.getuid() if hasattr(os, "getuid") else 0}')
+
+# Максимальный размер кеша построенных задач ЛП в мегабайтах, 0 отключает кеш.
+MODEL_CACHE_SIZE = int(os.environ.get('MODEL_CACHE_SIZE')) \
+    if os.environ.get('MODEL_CACHE_SIZE') is not None else 512
+
+# Количество столбцов моделей, критерии которых хранятся в памяти процесса для повторного расчёта.
+CRITERIA_CACHE_SIZE = int(os.environ.get('CRITERIA_CACHE_SIZE')) \
+    if os.environ.get('CRITERIA_CACHE_SIZE') is not None else 256
+
+# Наибольшее количество пар, для которого относительный непрерывный КСП (Ñ) считается точно перебором всех пар.
+# Для большего количества Ñ оценивается по стратифицированной выборке пар с доверительным интервалом.
+CRITERIA_EXACT_PAIRS = int(os.environ.get('CRITERIA_EXACT_PAIRS')) \
+    if os.environ.get('CRITERIA_EXACT_PAIRS') is not None else 10 ** 7
+
+# Ограничение времени одного решения методом первого порядка, в секундах. По истечении возвращается лучшее
+# найденное решение с достигнутым разрывом двойственности.
+FIRST_ORDER_TIME_LIMIT = float(os.environ.get('FIRST_ORDER_TIME_LIMIT')) \
+    if os.environ.get('FIRST_ORDER_TIME_LIMIT') is not None else 60
+
+# Количество сессий, проверенные токены и разобранные данные которых хранятся в памяти процесса.
+SESSION_CACHE_SIZE = int(os.environ.get('SESSION_CACHE_SIZE')) \
+    if os.environ.get('SESSION_CACHE_SIZE') is not None else 256
+
+# Максимальный суммарный размер упакованных данных сессий в кеше процесса, в мегабайтах.
+SESSION_CACHE_MEMORY = int(os.environ.get('SESSION_CACHE_MEMORY')) \
+    if os.environ.get('SESSION_CACHE_MEMORY') is not None else 256
+
+# Количество решений в истории сессии, которые можно открыть и сравнить без повторного расчёта.
+HISTORY_SIZE = int(os.environ.get('HISTORY_SIZE')) if os.environ.get('HISTORY_SIZE') is not None else 20
+
+# Максимальный суммарный размер упакованных решений в истории одной сессии, в мегабайтах.
+HISTORY_MEMORY = int(os.environ.get('HISTORY_MEMORY')) if os.environ.get('HISTORY_MEMORY') is not None else 16
+
+# Количество наборов поверхностей E, M, L, ОСП, N по сетке параметров, хранимых в памяти процесса.
+GRID_CACHE_SIZE = int(os.environ.get('GRID_CACHE_SIZE')) if os.environ.get('GRID_CACHE_SIZE') is not None else 16
+
+# Максимальное количество точек сетки параметров в одном расчёте.
+GRID_MAX_POINTS = int(os.environ.get('GRID_MAX_POINTS')) if os.environ.get('GRID_MAX_POINTS') is not None else 2500
+
+# Наибольшее количество пар, для которого результат, восстановленный по коэффициентам (приближённый режим,
+# метод первого порядка), хранит потери l по всем парам. L, ОСП и N считаются без перебора пар при любом размере.
+RESULT_PAIRS_LIMIT = int(os.environ.get('RESULT_PAIRS_LIMIT')) \
+    if os.environ.get('RESULT_PAIRS_LIMIT') is not None else 2 * 10 ** 6
@@ -0,0 +1,146 @@
+import hashlib
+import pickle
+import threading
+from collections import OrderedDict
+
+from server.config import SOLVER_CONTEXTS_SIZE
+from server.first_order import FirstOrderSolve
+from server.lp import Data, LpSolve, Result
+from server.meta_data import MetaData, Mode, Solver
+
+
+class SolverContext:
+    """
+    Контекст решателя сессии.
+    Хранит построенную задачу ЛП для текущего набора данных и режима расчётов,
+    чтобы изменение r или M не требовало построения модели заново.
+    Для метода первого порядка хранится решатель, новый расчёт начинается с предыдущего решения.
+    """
+
+    key: str
+    lp: LpSolve | FirstOrderSolve
+    lock: threading.Lock
+
+    def __init__(self, key: str, lp: LpSolve | FirstOrderSolve):
+        self.key = key
+        self.lp = lp
+        self.lock = threading.Lock()
+
+    def solve(self, meta_data: MetaData) -> Result:
+        """
+        Решает задачу с параметрами r и M из метаданных.
+        Если параметры не изменились или r лежит в интервале устойчивости решения,
+        возвращает последний результат без решения.
+        """
+        with self.lock:
+            m = meta_data.m if meta_data.mode is Mode.PIECEWISE_GIVEN else None
+            if self.lp.data.r == meta_data.r and (m is None or self.lp.data.m == m):
+                return self.lp.result
+
+            return self.lp.update_params(meta_data.r, m)
+
+    def update(self, key: str, meta_data: MetaData) -> Result | None:
+        """
+        Переносит построенную задачу ЛП на изменённые загруженные данные и решает её.
+        :return: результат или None, если задачу нужно построить заново.
+        """
+        diff = meta_data.load_data_diff
+        with self.lock:
+            if not isinstance(self.lp, LpSolve) or \
+                    diff.changed > SolverContextStorage.MAX_CHANGED_SHARE * len(meta_data.load_data):
+                return None
+            if not self.lp.update_rows(Data(meta_data), diff.edited, diff.appended):
+                return None
+
+            self.key = key
+            return self.lp.update_params(meta_data.r)
+
+
+class SolverContextStorage:
+    """
+    Хранилище контекстов решателя в памяти процесса.
+    Для каждой сессии хранится один контекст, старые контексты вытесняются (LRU).
+    """
+
+    MAX_CHANGED_SHARE = 0.25  # Наибольшая доля изменённых строк, при которой задача дополняется, а не строится заново.
+
+    max_size: int
+    _contexts: OrderedDict
+    _lock: threading.Lock
+
+    def __init__(self, max_size: int = SOLVER_CONTEXTS_SIZE):
+        self.max_size = max_size
+        self._contexts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def solve(self, token: str, meta_data: MetaData) -> Result:
+        """
+        Решает задачу ЛП для сессии, по возможности переиспользуя построенную модель.
+        :param token: токен сессии.
+        :param meta_data: метаданные сессии.
+        :return: результат решения.
+        """
+        key = SolverContextStorage.build_key(meta_data)
+        # Если загруженные данные дополнены или исправлены, задача для прежних данных дополняется.
+        diff = getattr(meta_data, 'load_data_diff', None)
+        base_key = SolverContextStorage.build_key(meta_data, diff.base_hash) if diff is not None else None
+
+        with self._lock:
+            context = self._contexts.get(token)
+            if context is not None and context.key in (key, base_key):
+                self._contexts.move_to_end(token)
+            else:
+                context = None
+
+        if context is not None:
+            try:
+                if context.key == key:
+                    return context.solve(meta_data)
+                result = context.update(key, meta_data)
+                if result is not None:
+                    return result
+            except Exception:
+                # Прерванное решение (например, отменённое) оставляет модель с параметрами без решения.
+                self.drop(token)
+                raise
+
+        if getattr(meta_data, 'solver', Solver.LP) is Solver.FIRST_ORDER:
+            lp = FirstOrderSolve(meta_data.mode, Data(meta_data), gap=meta_data.gap)
+        else:
+            lp = LpSolve(meta_data.mode, Data(meta_data), ranging=True, cache=True)
+
+        with self._lock:
+            self._contexts[token] = SolverContext(key, lp)
+            self._contexts.move_to_end(token)
+            while len(self._contexts) > self.max_size:
+                self._contexts.popitem(last=False)
+
+        return lp.result
+
+    def drop(self, token: str):
+        with self._lock:
+            self._contexts.pop(token, None)
+
+    @staticmethod
+    def build_key(meta_data: MetaData, load_data_hash: str = None) -> str:
+        """
+        Формирует ключ структуры задачи: всё, кроме r и M.
+        :param load_data_hash: хеш загруженных данных, по умолчанию хеш текущих данных.
+        """
+        return hashlib.sha1(pickle.dumps((
+            load_data_hash or meta_data.get_load_data_hash(),
+            meta_data.mode.value,
+            meta_data.var_y,
+            meta_data.free_chlen,
+            getattr(meta_data, 'delta', None),
+            getattr(meta_data, 'delta_1', None),
+            getattr(meta_data, 'delta_2', None),
+            getattr(meta_data, 'scaling', None),
+            getattr(meta_data, 'pairs_window', None),
+            getattr(meta_data, 'pairs_sample', None),
+            getattr(meta_data, 'solver', None),
+            getattr(meta_data, 'gap', None),
+        ))).hexdigest()
+
+
+solver_contexts = SolverContextStorage()
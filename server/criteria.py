@@ -1,6 +1,18 @@
+import hashlib
 import math
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from statistics import NormalDist
 from typing import List
 
+import numpy as np
+
+from server.config import CRITERIA_CACHE_SIZE, CRITERIA_EXACT_PAIRS
+
 
 class Results:
     approximation_error: List[float]
@@ -13,6 +25,9 @@ class Results:
     maximum_relative_error: List[float]
     sum_squared_errors: List[float]
     # multiple_determination_criterion: List[float]
+    names: List[str] = None  # Подписи вариантов моделей, по умолчанию y1, y2, ...
+    # Доверительные интервалы приближённо рассчитанных критериев: имя критерия -> [(нижняя, верхняя), ...].
+    intervals: dict = None
 
     def to_print(self):
         data = []
@@ -21,13 +36,13 @@ class Results:
         for index in range(n):
             data.append([])
 
-            data[index].append(f'y{index + 1}')
+            data[index].append(self.names[index] if self.names else f'y{index + 1}')
 
             data[index].append(self.formatting(self.approximation_error[index]))
-            data[index].append(self.formatting(self.ksp[index]))
-            data[index].append(self.formatting(self.relative_ksp[index]))
-            data[index].append(self.formatting(self.continuous_ksp[index]))
-            data[index].append(self.formatting(self.relative_continuous_ksp[index]))
+            data[index].append(self.print_value('ksp', index))
+            data[index].append(self.print_value('relative_ksp', index))
+            data[index].append(self.print_value('continuous_ksp', index))
+            data[index].append(self.print_value('relative_continuous_ksp', index))
             data[index].append(self.formatting(self.sum_error_modules[index]))
             data[index].append(self.formatting(self.maximum_error[index]))
             data[index].append(self.formatting(self.maximum_relative_error[index]))
@@ -36,11 +51,133 @@ class Results:
 
         return data
 
+    def print_value(self, key: str, index: int):
+        """
+        Форматирует значение критерия, для приближённых значений добавляет полуширину интервала.
+        """
+        value = self.formatting(getattr(self, key)[index])
+        if not self.intervals or key not in self.intervals:
+            return value
+
+        low, high = self.intervals[key][index]
+        return f'{value} ± {self.formatting((high - low) / 2)}'
+
     @staticmethod
     def formatting(value: float) -> float:
         return float('{:.2f}'.format(value))
 
 
+class ActualValues:
+    """
+    Фактические значения и общие для всех столбцов моделей структуры:
+    пары (k < s) со знаками разностей y_k - y_s и суммами y_k + y_s, порядок сортировки и страты.
+    Структуры строятся при первом обращении.
+    """
+
+    key: str
+    values: np.ndarray
+    n: int
+
+    def __init__(self, values: np.ndarray, key: str):
+        self.key = key
+        self.values = values
+        self.n = values.size
+        self._pairs = None
+        self._strata = None
+
+    @property
+    def pairs(self) -> tuple:
+        """
+        :return: (k, s, знак y_k - y_s, y_k + y_s) для всех пар.
+        """
+        if self._pairs is None:
+            k, s = np.triu_indices(self.n, 1)
+            self._pairs = (k.astype(np.int32), s.astype(np.int32),
+                           np.sign(self.values[k] - self.values[s]).astype(np.int8),
+                           self.values[k] + self.values[s])
+
+        return self._pairs
+
+    @property
+    def strata(self) -> tuple:
+        """
+        :return: (порядок сортировки, границы страт, ячейки (страта, страта), количество пар в ячейках).
+        """
+        if self._strata is None:
+            order = np.argsort(self.values, kind='stable')
+            bounds = np.linspace(0, self.n, Criteria.PAIR_STRATA + 1).astype(int)
+            cells = [(i, j) for i in range(Criteria.PAIR_STRATA) for j in range(i, Criteria.PAIR_STRATA)]
+
+            sizes = bounds[1:] - bounds[:-1]
+            cell_pairs = np.array([sizes[i] * (sizes[i] - 1) / 2 if i == j else sizes[i] * sizes[j]
+                                   for i, j in cells])
+            self._strata = (order, bounds, cells, cell_pairs)
+
+        return self._strata
+
+
+class CriteriaCache:
+    """
+    Кеш расчёта критериев в памяти процесса.
+    Структуры фактических значений и критерии столбцов моделей хранятся по хешу содержимого,
+    старые записи вытесняются (LRU).
+    """
+
+    ACTUAL_SIZE = 4  # Количество хранимых наборов фактических значений.
+
+    max_size: int
+    _actual: OrderedDict
+    _columns: OrderedDict
+    _lock: threading.Lock
+
+    def __init__(self, max_size: int = CRITERIA_CACHE_SIZE):
+        self.max_size = max_size
+        self._actual = OrderedDict()
+        self._columns = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_actual(self, values: list) -> ActualValues:
+        values = np.array(values, dtype=np.float64)
+        key = CriteriaCache.hash(values)
+
+        with self._lock:
+            actual = self._actual.get(key)
+            if actual is not None:
+                self._actual.move_to_end(key)
+                return actual
+
+        actual = ActualValues(values, key)
+
+        with self._lock:
+            self._actual[key] = actual
+            while len(self._actual) > CriteriaCache.ACTUAL_SIZE:
+                self._actual.popitem(last=False)
+
+        return actual
+
+    def get_column(self, key: tuple) -> dict | None:
+        with self._lock:
+            column = self._columns.get(key)
+            if column is not None:
+                self._columns.move_to_end(key)
+
+            return column
+
+    def put_column(self, key: tuple, column: dict):
+        with self._lock:
+            self._columns[key] = column
+            self._columns.move_to_end(key)
+            while len(self._columns) > self.max_size:
+                self._columns.popitem(last=False)
+
+    @staticmethod
+    def hash(values: np.ndarray) -> str:
+        return hashlib.blake2b(np.ascontiguousarray(values).tobytes(), digest_size=16).hexdigest()
+
+
+criteria_cache = CriteriaCache()
+
+
 class Criteria:
     data: list
     actual_values: List[float]
@@ -48,28 +185,92 @@ class Criteria:
 
     results: Results
 
-    def __init__(self, data: list = None):
+    RESULT_FIELDS = ['approximation_error', 'ksp', 'relative_ksp', 'continuous_ksp', 'relative_continuous_ksp',
+                     'sum_error_modules', 'maximum_error', 'maximum_relative_error', 'sum_squared_errors']
+
+    PAIR_STRATA = 16  # Количество страт по отсортированным фактическим значениям.
+    PAIR_SAMPLES = 64  # Начальное количество пар на ячейку страт.
+    PAIR_CACHE_LIMIT = 2 * 10 ** 6  # Наибольшее количество пар, для которого строится структура пар.
+
+    approximate: bool
+    tolerance: float
+    confidence: float
+    time_budget: float
+    seed: int
+
+    def __init__(self, data: list = None, approximate: bool = False, tolerance: float = 0.01,
+                 confidence: float = 0.95, time_budget: float = 0.5, seed: int = 0):
+        """
+        :param data: матрица, в первом столбце фактические значения, в остальных - расчётные.
+        :param approximate: оценивать попарные критерии (K, L, Ñ) по случайной выборке пар.
+        :param tolerance: допустимая относительная полуширина доверительного интервала.
+        :param confidence: уровень доверия интервалов.
+        :param time_budget: ограничение времени на увеличение выборки, с.
+        :param seed: зерно генератора случайных чисел.
+        """
         if not data:
             return
 
         self.data = data
         self.results = Results()
+        self.approximate = approximate
+        self.tolerance = tolerance
+        self.confidence = confidence
+        self.time_budget = time_budget
+        self.seed = seed
 
         self.data_preparation()
 
         self.calculation()
 
+    @staticmethod
+    def join(items: List['Criteria'], names: List[str]) -> 'Criteria':
+        """
+        Объединяет результаты нескольких расчётов критериев в одну таблицу.
+        Используется, когда у моделей разные фактические значения.
+        :param items: расчёты критериев, по одному столбцу модели в каждом.
+        :param names: подписи строк итоговой таблицы.
+        """
+        criteria = Criteria()
+        criteria.data = None
+        criteria.results = Results()
+
+        for key in Criteria.RESULT_FIELDS:
+            values = []
+            for item in items:
+                values.extend(getattr(item.results, key))
+            setattr(criteria.results, key, values)
+
+        criteria.results.names = names
+
+        return criteria
+
     def calculation(self):
-        self.get_approximation_error()
-        self.get_ksp()
-        self.get_relative_ksp()
-        self.get_continuous_ksp()
-        self.get_relative_continuous_ksp()
-        self.get_sum_error_modules()
-        self.get_maximum_error()
-        self.get_maximum_relative_error()
-        self.get_sum_squared_errors()
-        # self.get_multiple_determination_criterion()
+        """
+        Рассчитывает критерии по столбцам моделей.
+        Критерии столбца зависят только от него и фактических значений, поэтому берутся из кеша
+        по хешу содержимого: при добавлении, удалении или замене столбца рассчитывается только он.
+        """
+        actual = criteria_cache.get_actual(self.actual_values)
+        params = (self.tolerance, self.confidence, self.time_budget, self.seed) if self.approximate else None
+
+        columns = []
+        for items in self.calculated_values:
+            calculated = np.array(items, dtype=np.float64)
+            key = (actual.key, CriteriaCache.hash(calculated), params)
+
+            column = criteria_cache.get_column(key)
+            if column is None:
+                column = self.column_calculation(actual, calculated, key[1])
+                criteria_cache.put_column(key, column)
+            columns.append(column)
+
+        for key in Criteria.RESULT_FIELDS:
+            setattr(self.results, key, [column[key] for column in columns])
+
+        if columns and columns[0]['intervals']:
+            self.results.intervals = {key: [column['intervals'][key] for column in columns]
+                                      for key in columns[0]['intervals']}
 
     def data_preparation(self):
         self.actual_values = []
@@ -87,141 +288,396 @@ class Criteria:
 
                     self.calculated_values[j - 1].append(self.data[i][j])
 
-    def get_approximation_error(self):
-        self.results.approximation_error = []
+    def column_calculation(self, actual: ActualValues, calculated: np.ndarray, key: str) -> dict:
+        """
+        Рассчитывает критерии одного столбца модели.
+        :param actual: фактические значения со структурами пар.
+        :param calculated: расчётные значения модели.
+        :param key: хеш столбца, задаёт зерно выборки пар при приближённом расчёте.
+        :return: значения критериев и доверительные интервалы приближённо рассчитанных.
+        """
+        n = actual.n
+        errors = np.abs(actual.values - calculated)
+        relative_errors = np.abs((actual.values - calculated) / actual.values)
+
+        column = {
+            'approximation_error': float(relative_errors.sum() / n * 100),
+            'sum_error_modules': float(errors.sum()),
+            'maximum_error': float(errors.max()),
+            'maximum_relative_error': float(100 * relative_errors.max()),
+            'sum_squared_errors': float((errors ** 2).sum()),
+            'intervals': None,
+        }
+
+        pairs = n * (n - 1) // 2
+        if self.approximate and pairs > Criteria.PAIR_SAMPLES * Criteria.PAIR_STRATA ** 2:
+            rng = np.random.default_rng([self.seed, int(key[:8], 16)])
+            ksp, continuous_ksp, relative_continuous_ksp, column['intervals'] = Criteria.get_approximate_pair_criteria(
+                actual, calculated, rng, self.tolerance, self.confidence, self.time_budget)
+        elif pairs <= Criteria.PAIR_CACHE_LIMIT:
+            ksp, continuous_ksp, relative_continuous_ksp = Criteria.get_pair_criteria(actual, calculated)
+        else:
+            # Структура пар заняла бы слишком много памяти, K и L считаются сортировкой, Ñ - блоками пар
+            # или по выборке пар.
+            count, continuous_ksp = ChunkedCriteria.discordant_pairs(actual.values, calculated)
+            ksp = pairs - count
+            relative_continuous_ksp, interval = ChunkedCriteria.relative_continuous_ksp_estimate(
+                actual, calculated, key, self.seed)
+            if interval is not None:
+                column['intervals'] = {'relative_continuous_ksp': interval}
+
+        column['ksp'] = ksp
+        column['relative_ksp'] = (200 * ksp) / (n * (n - 1))
+        column['continuous_ksp'] = continuous_ksp
+        column['relative_continuous_ksp'] = relative_continuous_ksp
+
+        return column
 
-        n = len(self.actual_values)
-        for items in self.calculated_values:
-            value = 0
+    @staticmethod
+    def get_pair_criteria(actual: ActualValues, calculated: np.ndarray) -> tuple:
+        """
+        Точные K, L и Ñ по всем парам на общей структуре пар фактических значений.
+        """
+        k, s, sign, sums = actual.pairs
+        difference = calculated[k] - calculated[s]
+        exp = sign * np.sign(difference)
+        discordant = exp < 0
+        module = np.abs(difference[discordant])
+        n = actual.n
+
+        return (int(np.count_nonzero(exp >= 0)),
+                float(module.sum()),
+                float((module / sums[discordant]).sum()) * (200 / (n * (n - 1))))
 
-            for index in range(n):
-                value += abs((self.actual_values[index] - items[index]) / self.actual_values[index])
+    @staticmethod
+    def get_approximate_pair_criteria(actual: ActualValues, calculated: np.ndarray, rng: np.random.Generator,
+                                      tolerance: float, confidence: float, time_budget: float) -> tuple:
+        """
+        Оценивает K, L и Ñ по случайной выборке пар со стратификацией по отсортированным фактическим значениям.
+        Строки делятся на страты равного размера, пары выбираются в каждой ячейке (страта, страта)
+        пропорционально её размеру. Выборка удваивается, пока полуширина интервалов всех критериев
+        не станет меньше tolerance от значения или не истечёт time_budget.
+        :return: (K, L, Ñ, доверительные интервалы).
+        """
+        n = actual.n
+        order, bounds, cells, cell_pairs = actual.strata
+
+        z = NormalDist().inv_cdf((1 + confidence) / 2)
+        start = time.perf_counter()
+
+        samples = [[] for _ in cells]
+        per_cell = Criteria.PAIR_SAMPLES
+
+        while True:
+            for index, (i, j) in enumerate(cells):
+                count = per_cell - sum(item.shape[1] for item in samples[index])
+                if cell_pairs[index] == 0 or count <= 0:
+                    continue
+
+                k = rng.integers(bounds[i], bounds[i + 1], count)
+                if i == j:
+                    # Второй индекс выбирается из той же страты без совпадения с первым.
+                    s = rng.integers(bounds[i], bounds[i + 1] - 1, count)
+                    s[s >= k] += 1
+                else:
+                    s = rng.integers(bounds[j], bounds[j + 1], count)
 
-            value /= n
+                samples[index].append(Criteria._pair_values(actual.values, calculated, order[k], order[s]))
 
-            value *= 100
+            estimates = Criteria._stratified_estimate(samples, cell_pairs, z)
 
-            self.results.approximation_error.append(value)
+            done = all(abs(high - low) / 2 <= tolerance * abs(value) for value, low, high in estimates)
+            if done or time.perf_counter() - start > time_budget or per_cell >= cell_pairs.max():
+                break
 
-    def get_ksp(self):
-        self.results.ksp = []
+            per_cell *= 2
 
-        n = len(self.actual_values)
-        for items in self.calculated_values:
-            value = 0
+        scale = 200 / (n * (n - 1))
+        (ksp, ksp_low, ksp_high), (l_, l_low, l_high), (n_, n_low, n_high) = estimates
 
-            for k in range(n - 1):
-                for s in range(k + 1, n):
-                    exp = (self.actual_values[k] - self.actual_values[s]) * (items[k] - items[s])
-                    if exp >= 0:
-                        value += 1
+        intervals = {
+            'ksp': (ksp_low, ksp_high),
+            'relative_ksp': (ksp_low * scale, ksp_high * scale),
+            'continuous_ksp': (l_low, l_high),
+            'relative_continuous_ksp': (n_low * scale, n_high * scale),
+        }
 
-            self.results.ksp.append(value)
+        return ksp, l_, n_ * scale, intervals
 
-    def get_relative_ksp(self):
-        self.results.relative_ksp = []
+    @staticmethod
+    def _pair_values(actual: np.ndarray, calculated: np.ndarray, k: np.ndarray, s: np.ndarray) -> np.ndarray:
+        """
+        Вклады пар в K, L и Ñ (без множителя 200 / n(n-1)).
+        """
+        exp = (actual[k] - actual[s]) * (calculated[k] - calculated[s])
+        module = np.abs(calculated[k] - calculated[s]) * (exp < 0)
 
-        n = len(self.actual_values)
-        for ksp_value in self.results.ksp:
-            value = (200 * ksp_value) / (n * (n - 1))
+        return np.vstack([exp >= 0, module, module / (actual[k] + actual[s])])
 
-            self.results.relative_ksp.append(value)
+    @staticmethod
+    def _stratified_estimate(samples: list, cell_pairs: np.ndarray, z: float) -> list:
+        """
+        Стратифицированная оценка сумм по всем парам и нормальные доверительные интервалы.
+        :return: [(оценка, нижняя граница, верхняя граница)] для K, L и Ñ.
+        """
+        total = np.zeros(3)
+        variance = np.zeros(3)
 
-    def get_continuous_ksp(self):
-        self.results.continuous_ksp = []
+        for index, items in enumerate(samples):
+            if not items:
+                continue
 
-        n = len(self.actual_values)
-        for items in self.calculated_values:
-            value = 0
+            values = np.hstack(items)
+            size = values.shape[1]
 
-            for k in range(n - 1):
-                for s in range(k + 1, n):
-                    if (self.actual_values[k] - self.actual_values[s]) * (items[k] - items[s]) < 0:
-                        value += abs(items[k] - items[s])
+            total += cell_pairs[index] * values.mean(axis=1)
+            if size > 1:
+                variance += cell_pairs[index] ** 2 * values.var(axis=1, ddof=1) / size
 
-            self.results.continuous_ksp.append(value)
+        half = z * np.sqrt(variance)
 
-    def get_relative_continuous_ksp(self):
-        self.results.relative_continuous_ksp = []
+        return list(zip(total.tolist(), (total - half).tolist(), (total + half).tolist()))
+
+    def get_multiple_determination_criterion(self):
+        self.results.multiple_determination_criterion = []
 
         n = len(self.actual_values)
         for items in self.calculated_values:
-            value = 0
-
-            for k in range(n - 1):
-                for s in range(k + 1, n):
-                    if (self.actual_values[k] - self.actual_values[s]) * (items[k] - items[s]) < 0:
-                        value += abs(items[k] - items[s]) / (self.actual_values[k] + self.actual_values[s])
+            y = 0
+            for index in range(n):
+                y += self.actual_values[index]
+            y /= n
 
-            value *= (200 / (n * (n - 1)))
+            numerator = 0
+            denominator = 0
 
-            self.results.relative_continuous_ksp.append(value)
+            for index in range(n):
+                numerator += math.pow(y - items[index], 2)
+                denominator += math.pow(self.actual_values[index] - items[index], 2)
 
-    def get_sum_error_modules(self):
-        self.results.sum_error_modules = []
+            value = numerator / denominator
 
-        n = len(self.actual_values)
-        for items in self.calculated_values:
-            value = 0
+            self.results.multiple_determination_criterion.append(value)
 
-            for index in range(n):
-                value += abs(self.actual_values[index] - items[index])
 
-            self.results.sum_error_modules.append(value)
+class ChunkedCriteria:
+    """
+    Потоковый расчёт критериев для больших файлов.
+    Файл читается блоками строк в столбцовое хранилище на диске (memory-map),
+    поэлементные критерии считаются накопительно при чтении, попарные - отдельным проходом
+    по сохранённым столбцам. В памяти не хранится копия файла целиком.
+    """
 
-    def get_maximum_error(self):
-        self.results.maximum_error = []
+    CHUNK_SIZE = 65536  # Количество строк файла, разбираемых за один раз.
+    TILE_SIZE = 2048  # Размер блока пар при расчёте относительного непрерывного КСП.
+    # Оценка Ñ по выборке пар при количестве пар больше CRITERIA_EXACT_PAIRS:
+    TOLERANCE = 0.01  # допустимая относительная полуширина доверительного интервала,
+    CONFIDENCE = 0.95  # уровень доверия,
+    TIME_BUDGET = 2.0  # ограничение времени на увеличение выборки на столбец, с.
 
-        n = len(self.actual_values)
-        for items in self.calculated_values:
-            errors = []
+    n: int
+    columns: int
+    results: Results
 
-            for index in range(n):
-                errors.append(abs(self.actual_values[index] - items[index]))
+    def __init__(self, stream, chunk_size: int = CHUNK_SIZE):
+        """
+        :param stream: бинарный поток с файлом: в первом столбце фактические значения,
+                       в остальных - расчётные значения моделей.
+        :param chunk_size: количество строк в блоке.
+        """
+        self.n = 0
+        self.columns = 0
+        self.results = Results()
 
-            self.results.maximum_error.append(max(errors))
+        path = tempfile.mkdtemp(prefix='nksp_criteria_')
+        try:
+            self._read(stream, path, chunk_size)
+            self._calculation_pairs(path)
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def _read(self, stream, path: str, chunk_size: int):
+        files = None
+        lines = []
+        for line in stream:
+            if not line.strip():
+                continue
+            lines.append(line)
+
+            if len(lines) >= chunk_size:
+                files = self._read_chunk(lines, path, files)
+                lines = []
+
+        if lines:
+            files = self._read_chunk(lines, path, files)
+
+        if files is None:
+            raise ValueError('Файл не содержит данных!')
+        if self.columns < 2 or self.n < 2:
+            raise ValueError('Файл должен содержать не менее двух строк и столбец расчётных значений!')
+
+        for file in files:
+            file.close()
+
+        self.results.approximation_error = (self._sum_relative_errors / self.n * 100).tolist()
+        self.results.sum_error_modules = self._sum_error_modules.tolist()
+        self.results.maximum_error = self._maximum_error.tolist()
+        self.results.maximum_relative_error = (self._maximum_relative_error * 100).tolist()
+        self.results.sum_squared_errors = self._sum_squared_errors.tolist()
+
+    def _read_chunk(self, lines: list, path: str, files: list | None) -> list:
+        if files is None:
+            self.columns = len(lines[0].split())
+            files = [open(os.path.join(path, f'{j}.bin'), 'wb') for j in range(self.columns)]
+
+            self._sum_relative_errors = np.zeros(self.columns - 1)
+            self._sum_error_modules = np.zeros(self.columns - 1)
+            self._maximum_error = np.zeros(self.columns - 1)
+            self._maximum_relative_error = np.zeros(self.columns - 1)
+            self._sum_squared_errors = np.zeros(self.columns - 1)
+
+        try:
+            chunk = np.array(b' '.join(lines).split(), dtype=np.float64).reshape(-1, self.columns)
+        except ValueError:
+            raise ValueError('Строки файла должны содержать одинаковое количество чисел!')
+
+        for j in range(self.columns):
+            files[j].write(np.ascontiguousarray(chunk[:, j]).tobytes())
+
+        actual = chunk[:, :1]
+        errors = np.abs(actual - chunk[:, 1:])
+        relative_errors = np.abs(errors / actual)
+
+        self._sum_relative_errors += relative_errors.sum(axis=0)
+        self._sum_error_modules += errors.sum(axis=0)
+        self._maximum_error = np.maximum(self._maximum_error, errors.max(axis=0))
+        self._maximum_relative_error = np.maximum(self._maximum_relative_error, relative_errors.max(axis=0))
+        self._sum_squared_errors += (errors ** 2).sum(axis=0)
+
+        self.n += chunk.shape[0]
+
+        return files
+
+    def _calculation_pairs(self, path: str):
+        self.results.ksp = []
+        self.results.relative_ksp = []
+        self.results.continuous_ksp = []
+        self.results.relative_continuous_ksp = []
 
-    def get_maximum_relative_error(self):
-        self.results.maximum_relative_error = []
+        pairs = self.n * (self.n - 1) // 2
+        actual = np.memmap(os.path.join(path, '0.bin'), dtype=np.float64, mode='r')
+        values = ActualValues(np.asarray(actual), '') if pairs > CRITERIA_EXACT_PAIRS else actual
+        intervals = []
 
-        n = len(self.actual_values)
-        for items in self.calculated_values:
-            errors = []
+        for j in range(1, self.columns):
+            calculated = np.memmap(os.path.join(path, f'{j}.bin'), dtype=np.float64, mode='r')
 
-            for index in range(n):
-                errors.append(abs((self.actual_values[index] - items[index]) / self.actual_values[index]))
+            count, value = ChunkedCriteria.discordant_pairs(actual, calculated)
+            relative_continuous_ksp, interval = ChunkedCriteria.relative_continuous_ksp_estimate(
+                values, calculated, CriteriaCache.hash(calculated))
 
-            self.results.maximum_relative_error.append(100 * max(errors))
+            self.results.ksp.append(pairs - count)
+            self.results.relative_ksp.append((200 * (pairs - count)) / (self.n * (self.n - 1)))
+            self.results.continuous_ksp.append(value)
+            self.results.relative_continuous_ksp.append(relative_continuous_ksp)
+            intervals.append(interval)
 
-    def get_sum_squared_errors(self):
-        self.results.sum_squared_errors = []
+            del calculated
 
-        n = len(self.actual_values)
-        for items in self.calculated_values:
-            value = 0
+        if pairs > CRITERIA_EXACT_PAIRS:
+            self.results.intervals = {'relative_continuous_ksp': intervals}
 
-            for index in range(n):
-                value += math.pow(self.actual_values[index] - items[index], 2)
+    @staticmethod
+    def discordant_pairs(actual: np.ndarray, calculated: np.ndarray) -> tuple:
+        """
+        Считает пары с (y_k - y_s)(ŷ_k - ŷ_s) < 0 и сумму |ŷ_k - ŷ_s| по ним.
+        Строки сортируются по фактическим значениям, после чего несогласованные пары - это инверсии
+        в расчётных значениях. Инверсии считаются сортировкой слиянием снизу вверх,
+        каждый уровень которой выполняется векторно.
+        """
+        order = np.lexsort((calculated, actual))
+        values = np.asarray(calculated)[order]
+        rank = np.unique(values, return_inverse=True)[1].astype(np.int64)
+
+        n = values.size
+        index = np.arange(n, dtype=np.int64)
+        count = 0
+        total = 0.0
+
+        width = 1
+        while width < n:
+            pair = index // (2 * width)
+            is_left = (index // width) % 2 == 0
+
+            key = pair * n + rank
+            left_key = key[is_left]
+            left_sum = np.concatenate([[0.0], np.cumsum(values[is_left])])
+            right_pair = pair[~is_left]
+            right_values = values[~is_left]
+
+            # Для каждого элемента правого блока - количество и сумма строго больших элементов левого блока.
+            start = np.searchsorted(left_key, key[~is_left], side='right')
+            end = np.searchsorted(left_key, (right_pair + 1) * n, side='left')
+            greater = end - start
+
+            count += int(greater.sum())
+            total += float((left_sum[end] - left_sum[start]).sum() - (greater * right_values).sum())
+
+            merge = np.lexsort((rank, pair))
+            rank = rank[merge]
+            values = values[merge]
+
+            width *= 2
+
+        return count, total
 
-            self.results.sum_squared_errors.append(value)
+    @staticmethod
+    def relative_continuous_ksp_estimate(actual: ActualValues | np.ndarray, calculated: np.ndarray, key: str,
+                                         seed: int = 0) -> tuple:
+        """
+        Относительный непрерывный КСП для большого количества строк. Точного расчёта быстрее перебора пар нет:
+        знаменатель зависит от обоих фактических значений пары. Поэтому при количестве пар больше
+        CRITERIA_EXACT_PAIRS Ñ оценивается по стратифицированной выборке пар, как в приближённом режиме
+        (Criteria.get_approximate_pair_criteria), с ограничением времени, иначе считается точно блоками пар.
+        :param actual: фактические значения, для оценки по выборке - со стратами (ActualValues).
+        :param key: хеш столбца расчётных значений, задаёт зерно выборки.
+        :return: (Ñ, доверительный интервал или None для точного значения).
+        """
+        values = actual.values if isinstance(actual, ActualValues) else actual
+        n = values.size
+        if n * (n - 1) // 2 <= CRITERIA_EXACT_PAIRS:
+            return ChunkedCriteria.relative_continuous_ksp(values, calculated), None
+
+        if not isinstance(actual, ActualValues):
+            actual = ActualValues(np.asarray(actual), '')
+        rng = np.random.default_rng([seed, int(key[:8], 16)])
+        _, _, value, intervals = Criteria.get_approximate_pair_criteria(
+            actual, np.asarray(calculated), rng, ChunkedCriteria.TOLERANCE, ChunkedCriteria.CONFIDENCE,
+            ChunkedCriteria.TIME_BUDGET)
+
+        return value, intervals['relative_continuous_ksp']
 
-    def get_multiple_determination_criterion(self):
-        self.results.multiple_determination_criterion = []
+    @staticmethod
+    def relative_continuous_ksp(actual: np.ndarray, calculated: np.ndarray, tile_size: int = TILE_SIZE) -> float:
+        """
+        Относительный непрерывный КСП. Знаменатель зависит от обоих фактических значений пары,
+        поэтому пары перебираются блоками tile_size x tile_size с ограниченной памятью.
+        """
+        n = actual.size
+        value = 0.0
 
-        n = len(self.actual_values)
-        for items in self.calculated_values:
-            y = 0
-            for index in range(n):
-                y += self.actual_values[index]
-            y /= n
+        for k_start in range(0, n, tile_size):
+            a_k = np.asarray(actual[k_start:k_start + tile_size])[:, None]
+            c_k = np.asarray(calculated[k_start:k_start + tile_size])[:, None]
 
-            numerator = 0
-            denominator = 0
+            for s_start in range(k_start, n, tile_size):
+                a_s = np.asarray(actual[s_start:s_start + tile_size])[None, :]
+                c_s = np.asarray(calculated[s_start:s_start + tile_size])[None, :]
 
-            for index in range(n):
-                numerator += math.pow(y - items[index], 2)
-                denominator += math.pow(self.actual_values[index] - items[index], 2)
+                mask = (a_k - a_s) * (c_k - c_s) < 0
+                if s_start == k_start:
+                    mask &= np.triu(np.ones(mask.shape, dtype=bool), 1)
 
-            value = numerator / denominator
+                value += float((np.abs(c_k - c_s) / (a_k + a_s))[mask].sum())
 
-            self.results.multiple_determination_criterion.append(value)
+        return value * (200 / (n * (n - 1)))
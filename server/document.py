@@ -1,14 +1,39 @@
 import io
 import os
-from typing import List
 
+import numpy as np
 from docxtpl import DocxTemplate
 
 from server.config import BASE_DIR
+from server.export import CRITERIA_HEADERS, TABLE_HEADERS
 from server.lp import Pod
 from server.meta_data import Mode
 
 
+TEMPLATES = ['result_table.docx', 'result_table_dot.docx', 'result_criteria.docx']
+
+_templates = {}
+
+
+def get_template(input_file_name: str) -> DocxTemplate:
+    """
+    Создаёт шаблон docx. Содержимое файла шаблона читается с диска один раз.
+    """
+    if input_file_name not in _templates:
+        with open(os.path.join(BASE_DIR, "", input_file_name), 'rb') as file:
+            _templates[input_file_name] = file.read()
+
+    return DocxTemplate(io.BytesIO(_templates[input_file_name]))
+
+
+def preload_templates():
+    """
+    Читает файлы шаблонов и разбирает их, чтобы первая выгрузка результатов не была медленной.
+    """
+    for input_file_name in TEMPLATES:
+        get_template(input_file_name)
+
+
 def escape_data(data: list):
     for i in range(len(data)):
         for j in range(len(data[0])):
@@ -17,18 +42,15 @@ def escape_data(data: list):
     return data
 
 
-def render_table_dot(data: list, pods: List[Pod]):
+def render_table_dot(data: list, pods: np.ndarray):
     data_dot = []
-    for pod in pods:
+    for pod in Pod.from_array(pods):
         data_dot.append([pod.r, f'{pod.r_dot}*' if pod.is_max else pod.r_dot])
 
-    input_file_name = "result_table_dot.docx"
-    path = os.path.join(BASE_DIR, "", input_file_name)
-
-    template = DocxTemplate(path)
+    template = get_template("result_table_dot.docx")
 
     context = {
-        'headers': ['α', 'lks', 'L (∑lks)', 'ε', 'E', 'КСП', 'M', 'Ñ'],
+        'headers': TABLE_HEADERS[Mode.IDEAL_DOT],
         'data': data,
         'headers_dot': ['r', ''],
         'data_dot': data_dot
@@ -43,26 +65,17 @@ def render_table_dot(data: list, pods: List[Pod]):
     return file_stream
 
 
-def render_table(mode: Mode, data: list, pods: List[Pod]):
+def render_table(mode: Mode, data: list, pods: np.ndarray):
     data = escape_data(data)
 
     if mode == Mode.IDEAL_DOT:
         return render_table_dot(data, pods)
 
-    input_file_name = "result_table.docx"
-    path = os.path.join(BASE_DIR, "", input_file_name)
-
-    template = DocxTemplate(path)
+    template = get_template("result_table.docx")
 
-    headers = []
-    if mode == Mode.MNM:
-        headers = ['α', 'lks', 'L (∑lks)', 'ε', 'E', 'КСП', 'M', 'Ñ']
-    elif mode == Mode.PIECEWISE_GIVEN:
-        headers = ['α', 'lks', 'L (∑lks)', 'ε', 'Вектор срабатываний', 'E', 'КСП', 'M', 'Ñ']
-    elif mode == Mode.HMMCAO:
-        headers = ['α', 'lks', 'L (∑lks)', 'ε', 'E', 'КСП', 'M', 'Ñ', 'P']
-    else:
+    if mode not in TABLE_HEADERS:
         raise Exception("Для используемого метода нет подходящего шаблона!")
+    headers = TABLE_HEADERS[mode]
 
     context = {
         'headers': headers,
@@ -79,15 +92,10 @@ def render_table(mode: Mode, data: list, pods: List[Pod]):
 
 
 def render_criteria(data: list):
-    input_file_name = "result_criteria.docx"
-    path = os.path.join(BASE_DIR, "", input_file_name)
-
-    template = DocxTemplate(path)
-
-    headers = ['Вариант модели', 'Е', 'K', 'Ǩ', 'L', 'Ñ', 'М', 'О', 'Z', 'H']
+    template = get_template("result_criteria.docx")
 
     context = {
-        'headers': headers,
+        'headers': CRITERIA_HEADERS,
         'data': data
     }
 
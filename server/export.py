@@ -0,0 +1,223 @@
+import csv
+import enum
+import io
+import json
+import math
+import zipfile
+from typing import Iterator, List
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+from server.lp import Result
+from server.meta_data import Mode
+
+# Заголовки таблицы результатов решения по режимам расчётов.
+TABLE_HEADERS = {
+    Mode.MNM: ['α', 'lks', 'L (∑lks)', 'ε', 'E', 'КСП', 'M', 'Ñ'],
+    Mode.IDEAL_DOT: ['α', 'lks', 'L (∑lks)', 'ε', 'E', 'КСП', 'M', 'Ñ'],
+    Mode.PIECEWISE_GIVEN: ['α', 'lks', 'L (∑lks)', 'ε', 'Вектор срабатываний', 'E', 'КСП', 'M', 'Ñ'],
+    Mode.HMMCAO: ['α', 'lks', 'L (∑lks)', 'ε', 'E', 'КСП', 'M', 'Ñ', 'P'],
+}
+
+POD_HEADERS = ['r', 'E', 'M', 'L', 'r_dot', 'is_max']
+
+CRITERIA_HEADERS = ['Вариант модели', 'Е', 'K', 'Ǩ', 'L', 'Ñ', 'М', 'О', 'Z', 'H']
+
+CHUNK_SIZE = 4096  # Количество строк, преобразуемых в python-значения за один раз.
+
+
+class ExportFormat(str, enum.Enum):
+    """Формат выгрузки таблиц."""
+
+    CSV = 'csv'
+    JSONL = 'jsonl'
+    XLSX = 'xlsx'
+
+    @staticmethod
+    def build(value):
+        if not value:
+            return ExportFormat.CSV
+        return ExportFormat(value)
+
+    @property
+    def mimetype(self) -> str:
+        return {
+            ExportFormat.CSV: 'text/csv',
+            ExportFormat.JSONL: 'application/x-ndjson',
+            ExportFormat.XLSX: 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        }[self]
+
+
+def result_rows(result: Result, mode: Mode) -> Iterator[list]:
+    """
+    Строки таблицы результатов решения, преобразуемые блоками по CHUNK_SIZE.
+    Строки обрезаются по заголовкам режима: столбец P есть только у HMMCAO.
+    """
+    width = len(TABLE_HEADERS[mode])
+    for start in range(0, getattr(result, 'count_rows', 0), CHUNK_SIZE):
+        yield from (row[:width] for row in result.print_rows(start, start + CHUNK_SIZE))
+
+
+def pod_rows(pods: np.ndarray) -> Iterator[list]:
+    """
+    Строки таблицы подзадач поиска идеальной точки.
+    """
+    if pods is None:
+        return
+
+    for start in range(0, pods.size, CHUNK_SIZE):
+        yield from (list(item) for item in pods[start:start + CHUNK_SIZE].tolist())
+
+
+def criteria_rows(criteria) -> Iterator[list]:
+    """
+    Строки таблицы критериев без округления значений.
+    """
+    if criteria is None:
+        return
+
+    results = criteria.results
+    fields = [getattr(results, key) for key in criteria.RESULT_FIELDS]
+    for index in range(len(results.ksp)):
+        yield [results.names[index] if results.names else f'y{index + 1}'] + [values[index] for values in fields]
+
+
+def stream(export_format: ExportFormat, headers: List[str], rows: Iterator[list]) -> Iterator[bytes]:
+    """
+    Отдаёт таблицу в заданном формате по частям, таблица целиком в памяти не формируется.
+    """
+    if export_format is ExportFormat.CSV:
+        return _stream_csv(headers, rows)
+    if export_format is ExportFormat.JSONL:
+        return _stream_jsonl(headers, rows)
+    return _stream_xlsx(headers, rows)
+
+
+def _chunks(rows: Iterator[list]) -> Iterator[List[list]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_SIZE:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
+def _stream_csv(headers: List[str], rows: Iterator[list]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+
+    for chunk in _chunks(rows):
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _stream_jsonl(headers: List[str], rows: Iterator[list]) -> Iterator[bytes]:
+    encoder = json.JSONEncoder(ensure_ascii=False)
+    for chunk in _chunks(rows):
+        yield ''.join(encoder.encode(dict(zip(headers, row))) + '\n' for row in chunk).encode()
+
+
+class _ChunkWriter(io.RawIOBase):
+    """
+    Несмещаемый поток, накапливающий записанные байты до выдачи клиенту.
+    zipfile пишет в такой поток архив с дескрипторами данных после каждого файла.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+_XLSX_FILES = {
+    '[Content_Types].xml':
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>',
+    '_rels/.rels':
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>',
+    'xl/workbook.xml':
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>',
+    'xl/_rels/workbook.xml.rels':
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>',
+}
+
+
+def _xlsx_cell(value) -> str:
+    if value is None:
+        return '<c/>'
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)) and math.isfinite(value):
+        return f'<c><v>{value!r}</v></c>'
+    return f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>'
+
+
+def _xlsx_row(row: list) -> str:
+    return '<row>' + ''.join(_xlsx_cell(value) for value in row) + '</row>'
+
+
+def _stream_xlsx(headers: List[str], rows: Iterator[list]) -> Iterator[bytes]:
+    """
+    Минимальная книга XLSX с одним листом. Лист пишется в архив по мере формирования строк.
+    """
+    writer = _ChunkWriter()
+
+    with zipfile.ZipFile(writer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_FILES.items():
+            archive.writestr(name, content)
+        yield writer.drain()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                         '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                         '<sheetData>' + _xlsx_row(headers)).encode())
+
+            for chunk in _chunks(rows):
+                sheet.write(''.join(_xlsx_row(row) for row in chunk).encode())
+                yield writer.drain()
+
+            sheet.write(b'</sheetData></worksheet>')
+
+    yield writer.drain()
@@ -0,0 +1,455 @@
+import math
+import time
+
+import numpy as np
+
+from server.config import FIRST_ORDER_TIME_LIMIT
+from server.lp import Data, Result
+from server.meta_data import Mode
+from server.progress import tasks
+from server.scheduler import ModelSize, scheduler
+
+
+class FirstOrderSolve:
+    """
+    Решение задач МНМ и HMMCAO методом первого порядка без построения задачи ЛП.
+
+    В переменных a задачи имеют вид
+        МНМ:    r ∑|ε_k| + (1 - r) ∑ max(0, -ω_ks (ŷ_k - ŷ_s)) + δ ∑|a_i|,
+        HMMCAO: r max|ε_k| + δ_2 ∑|ε_k| + (1 - r) ∑ max(0, -ω_ks (ŷ_k - ŷ_s)) + δ_1 ∑|a_i|,
+    где ε = y - Xa, ŷ = Xa. Модули и потери по парам сглаживаются (сглаживание Нестерова с параметром mu),
+    сглаженная задача решается ускоренным проксимальным градиентным методом (FISTA с перезапуском),
+    слагаемое δ ∑|a_i| учитывается точно через мягкий порог. Параметр mu уменьшается, когда ошибка
+    оптимизации становится меньше ошибки сглаживания.
+
+    Строки упорядочиваются по y, тогда для пары k < s с y_k < y_s потеря равна max(0, ŷ_k - ŷ_s),
+    а пары с равными y не учитываются. Суммы по парам считаются слиянием отсортированных блоков за O(n log² n),
+    массивы по всем парам не строятся, в том числе при восстановлении результата (Result.from_coefficients).
+    Из сглаженных множителей строится допустимое решение двойственной задачи, расчёт останавливается,
+    когда относительный разрыв двойственности становится не больше gap. Количество итераций и время одного
+    решения ограничены (max_iterations, time_limit): при достижении ограничения результатом становится лучшее
+    найденное решение, а в сведениях о сходимости указывается достигнутый разрыв и причина остановки.
+    Итерация требует O(n log² n) операций, но количество итераций до заданного разрыва растёт с n:
+    при разрыве 0.1% решение 2000 строк занимает порядка минуты, 3000 строк - нескольких минут.
+    """
+
+    mode: Mode
+    data: Data
+    result: Result
+    gap: float  # Допустимый относительный разрыв двойственности.
+    max_iterations: int
+    time_limit: float  # Ограничение времени одного решения, с.
+    size: ModelSize
+
+    GAP = 1e-3
+    MAX_ITERATIONS = 20000
+    SMOOTHING_DECAY = 0.5  # Множитель параметра сглаживания при переходе к следующему этапу.
+    INITIAL_CURVATURE = 1e-3  # Начальная оценка константы Липшица относительно её границы.
+    CURVATURE_DECAY = 0.8  # Множитель оценки константы Липшица после успешного шага.
+    REPORT_EVERY = 10  # Интервал итераций между проверкой отмены и публикацией хода расчёта.
+
+    def __init__(self, mode: Mode, data: Data, execute: bool = True, gap: float = GAP,
+                 max_iterations: int = MAX_ITERATIONS, time_limit: float = None):
+        """
+        :param mode: режим расчётов, МНМ или HMMCAO.
+        :param data: подготовленные исходные данные.
+        :param execute: сразу решить задачу.
+        :param gap: допустимый относительный разрыв двойственности.
+        :param max_iterations: наибольшее количество итераций одного решения.
+        :param time_limit: ограничение времени одного решения, с, по умолчанию FIRST_ORDER_TIME_LIMIT.
+        """
+        if mode not in (Mode.MNM, Mode.HMMCAO):
+            raise ValueError('Метод первого порядка применим только для МНМ и HMMCAO!')
+
+        self.mode = mode
+        self.data = data
+        self.result = Result(mode)
+        self.gap = gap
+        self.max_iterations = max_iterations
+        self.time_limit = FIRST_ORDER_TIME_LIMIT if time_limit is None else time_limit
+        self._z = None
+
+        self._prepare()
+
+        if execute:
+            self.solve()
+
+    @staticmethod
+    def estimate_size(n: int, m: int) -> ModelSize:
+        """
+        Оценка памяти решения для планировщика в элементах модели ЛП. Итерации занимают память O(n·m),
+        показатели результата по парам - вектор l (не больше RESULT_PAIRS_LIMIT пар) и блок пар при расчёте N.
+        """
+        pairs_memory = Result.coefficients_memory(n)
+
+        return ModelSize(n, m, n * m + -(-pairs_memory // ModelSize.BYTES_PER_NONZERO))
+
+    def _prepare(self):
+        """
+        Упорядочивает строки по y, масштабирует столбцы x и считает константы Липшица сглаженных слагаемых.
+        """
+        x = np.asarray(self.data.x, dtype=np.float64)
+        y = np.asarray(self.data.y, dtype=np.float64)
+        n, m = x.shape
+        self.size = FirstOrderSolve.estimate_size(n, m)
+
+        order = np.argsort(y, kind='stable')
+        self._y = y[order]
+        # Решается задача относительно z = a * scale, у столбцов x / scale единичная средняя квадратичная норма.
+        self._scale = np.sqrt((x ** 2).mean(axis=0)) if n else np.ones(m)
+        self._scale[self._scale == 0] = 1.0
+        self._x = x[order] / self._scale
+
+        gram = self._x.T @ self._x
+        self._gram_pinv = np.linalg.pinv(gram)
+        self._norm_x = float(np.linalg.eigvalsh(gram).max()) if m else 0.0
+
+        # X^T L X, где L - лапласиан графа пар с разными y: полный граф без клик равных значений.
+        _, group, counts = np.unique(self._y, return_inverse=True, return_counts=True)
+        self._group = group.astype(np.int64)
+        self._groups = counts.size
+        sums = np.zeros((counts.size, m))
+        np.add.at(sums, group, self._x)
+        total = self._x.sum(axis=0)
+        laplacian = n * gram - np.outer(total, total) - (self._x.T * counts[group]) @ self._x + sums.T @ sums
+        self._norm_pairs = float(np.linalg.eigvalsh(laplacian).max()) if m else 0.0
+
+    def solve(self) -> Result:
+        """
+        Решает задачу при текущих параметрах, начиная с предыдущего решения, если оно есть.
+        """
+        start = time.perf_counter()
+        r = self.data.r
+        if self.mode is Mode.MNM:
+            regularization = self.data.delta / self._scale
+        else:
+            regularization = self.data.delta_1 / self._scale
+
+        lipschitz = 0.0
+        if r > 0:
+            lipschitz += self._norm_x
+        if self.mode is Mode.HMMCAO and self.data.delta_2 > 0:
+            lipschitz += self._norm_x
+        if r < 1:
+            lipschitz += self._norm_pairs
+        lipschitz = lipschitz or 1.0
+
+        with scheduler.slot(self.size):
+            # Время ожидания в очереди планировщика не входит в ограничение времени решения.
+            convergence = self._minimize(regularization, lipschitz, time.perf_counter() + self.time_limit)
+            self.result = Result.from_coefficients(self.mode, self._z / self._scale, self.data)
+        self.result.convergence = dict(convergence, time=time.perf_counter() - start)
+
+        return self.result
+
+    def update_params(self, r: float, m: int = None) -> Result:
+        """
+        Повторно решает задачу с новым r, начиная с текущего решения.
+        """
+        self.data.r = r
+
+        return self.solve()
+
+    def set_delta(self, values: dict):
+        """
+        Заменяет малые величины delta, delta_1, delta_2. Следующее решение начинается с текущего.
+        """
+        for name, value in values.items():
+            setattr(self.data, name, value)
+
+    def _minimize(self, regularization: np.ndarray, lipschitz: float, deadline: float) -> dict:
+        """
+        Итерации FISTA с уменьшением параметра сглаживания, начиная с предыдущего решения.
+        Лучшее найденное решение сохраняется в self._z.
+        :param deadline: момент (time.perf_counter()), после которого итерации прекращаются.
+        """
+        if self._z is None:
+            self._z = np.linalg.lstsq(self._x, self._y, rcond=None)[0] if self._y.size else np.zeros(0)
+        mu = max(float(np.abs(self._y - self._x @ self._z).mean()) if self._y.size else 0.0, 1e-12)
+
+        task = tasks.current()
+        z = w = self._z
+        t = 1.0
+        best_z, best_primal, best_dual = z, math.inf, -math.inf
+        iteration = 0
+        relative_gap = math.inf
+        limit = 'iterations'
+        # Оценка константы Липшица подбирается возвратом: граница по всем парам сильно завышена,
+        # т.к. кривизну дают только пары с |ŷ_k - ŷ_s| < mu.
+        curvature = lipschitz * FirstOrderSolve.INITIAL_CURVATURE
+
+        def track(point, values):
+            nonlocal best_z, best_primal, best_dual
+            if values[0] < best_primal:
+                best_z, best_primal = point, values[0]
+            best_dual = max(best_dual, values[4])
+
+            return (best_primal - best_dual) / max(abs(best_primal), 1e-12)
+
+        values = self._evaluate(w, mu, regularization)
+        for iteration in range(1, self.max_iterations + 1):
+            relative_gap = track(w, values)
+
+            if task is not None and iteration % FirstOrderSolve.REPORT_EVERY == 0:
+                task.check()
+                task.report(done=iteration, gap=relative_gap)
+
+            if relative_gap <= self.gap:
+                limit = None
+                break
+            if time.perf_counter() > deadline:
+                limit = 'time'
+                break
+
+            _, smoothed, bias, grad, _ = values
+            while True:
+                step = mu / curvature
+                z_next = w - step * grad
+                z_next = np.sign(z_next) * np.maximum(np.abs(z_next) - step * regularization, 0.0)
+                values_next = self._evaluate(z_next, mu, regularization)
+                difference = z_next - w
+                if values_next[1] <= smoothed + grad @ difference + difference @ difference / (2 * step) * (1 + 1e-9) \
+                        or curvature >= lipschitz:
+                    break
+                curvature = min(2 * curvature, lipschitz)
+            curvature *= FirstOrderSolve.CURVATURE_DECAY
+
+            relative_gap = track(z_next, values_next)
+            if relative_gap <= self.gap:
+                limit = None
+                break
+
+            # Перезапуск ускорения, если шаг направлен против предыдущего.
+            if np.dot(w - z_next, z_next - z) > 0:
+                t = 1.0
+            t_next = (1 + math.sqrt(1 + 4 * t * t)) / 2
+            w = z_next + (t - 1) / t_next * (z_next - z)
+            z, t = z_next, t_next
+
+            # Ошибка оптимизации меньше ошибки сглаживания - сглаживание уменьшается.
+            if best_primal - best_dual < 2 * bias:
+                mu *= FirstOrderSolve.SMOOTHING_DECAY
+                w, t = z, 1.0
+
+            values = self._evaluate(w, mu, regularization)
+
+        self._z = best_z
+
+        return {
+            'iterations': iteration,
+            'gap': relative_gap,
+            'objective': best_primal,
+            'dual': best_dual,
+            'limit': limit,  # Причина остановки до достижения разрыва gap: 'time', 'iterations' или None.
+        }
+
+    def _evaluate(self, z: np.ndarray, mu: float, regularization: np.ndarray) -> tuple:
+        """
+        Значение функции цели, градиент сглаженных слагаемых и допустимое решение двойственной задачи в точке z.
+        :return: (значение функции цели, значение сглаженных слагаемых, оценка ошибки сглаживания, градиент,
+                  значение двойственной задачи).
+        """
+        r = self.data.r
+        yy = self._x @ z
+        eps = self._y - yy
+
+        # Слагаемые с ошибками: max по rho из множества C (rho, eps), сглаженный максимизатор rho.
+        if self.mode is Mode.MNM:
+            rho = np.clip(eps / mu, -r, r)
+            residual = r * float(np.abs(eps).sum())
+            smoothed = float(rho @ eps) - mu / 2 * float(rho @ rho)
+            squares = float(rho @ rho)
+        else:
+            delta_2 = self.data.delta_2
+            nu = FirstOrderSolve._project_l1(eps / mu, r)
+            kappa = np.clip(eps / mu, -delta_2, delta_2)
+            rho = nu + kappa
+            residual = r * float(np.abs(eps).max()) + delta_2 * float(np.abs(eps).sum())
+            smoothed = float(nu @ eps) + float(kappa @ eps) - mu / 2 * (float(nu @ nu) + float(kappa @ kappa))
+            squares = float(nu @ nu) + float(kappa @ kappa)
+
+        pairs, pairs_smoothed, pairs_squares, h = self._pairs(yy, mu, 1 - r)
+
+        grad = self._x.T @ (h - rho)
+        primal = residual + pairs + float((regularization * np.abs(z)).sum())
+        bias = (residual + pairs - smoothed - pairs_smoothed) + mu / 2 * (squares + pairs_squares)
+
+        return primal, smoothed + pairs_smoothed, bias, grad, self._dual(rho, h, grad, regularization)
+
+    def _pairs(self, yy: np.ndarray, mu: float, weight: float) -> tuple:
+        """
+        Потери по парам (1 - r) ∑ max(0, ŷ_k - ŷ_s) и их сглаженные множители без перебора пар.
+        Множитель пары t = ŷ_k - ŷ_s равен 0 при t <= 0, t / mu при 0 < t < c и (1 - r) при t >= c, c = mu (1 - r),
+        поэтому все суммы выражаются через количество, сумму и сумму квадратов ŷ по строкам с меньшим
+        (большим) y и ŷ из заданного диапазона.
+        :return: (потери, сглаженные потери, сумма квадратов множителей, вклад множителей в строки h = D^T lambda).
+        """
+        n = yy.size
+        h = np.zeros(n)
+        if weight <= 0 or n < 2:
+            return 0.0, 0.0, 0.0, h
+
+        bound = mu * weight
+        # Разности не зависят от сдвига, центрирование уменьшает потерю точности в суммах квадратов.
+        values = yy - yy.mean()
+        ordered = np.sort(values)
+        rank = np.searchsorted(ordered, values, side='left')
+        payload = np.vstack([np.ones(n), values, values * values])
+
+        # Для строки s по строкам k с меньшим y: ŷ_k > ŷ_s (t > 0) и ŷ_k >= ŷ_s + c (t >= c).
+        # Для строки k по строкам s с большим y: ŷ_s < ŷ_k и ŷ_s <= ŷ_k - c.
+        (positive, linear), (lower, lower_linear) = self._ordered_sums(rank, payload, [
+            np.searchsorted(ordered, values, side='right'),
+            np.searchsorted(ordered, values + bound, side='left'),
+        ], [
+            rank,
+            np.searchsorted(ordered, values - bound, side='right'),
+        ])
+
+        band = positive - linear
+        band_squares = float(np.maximum(band[2] - 2 * values * band[1] + band[0] * values * values, 0.0).sum())
+        lower_band = lower - lower_linear
+
+        exact = float((positive[1] - positive[0] * values).sum())
+        linear_count = float(linear[0].sum())
+        smoothed = weight * float((linear[1] - linear[0] * values).sum()) - mu / 2 * weight ** 2 * linear_count \
+            + band_squares / (2 * mu)
+        squares = weight ** 2 * linear_count + band_squares / mu ** 2
+        h += weight * (lower_linear[0] - linear[0]) + (lower_band[0] * values - lower_band[1]) / mu \
+            - (band[1] - band[0] * values) / mu
+
+        return weight * exact, smoothed, squares, h
+
+    def _ordered_sums(self, rank: np.ndarray, payload: np.ndarray, lows: list, highs: list) -> tuple:
+        """
+        Суммы payload по строкам с меньшим y и рангом не меньше low и по строкам с большим y и рангом меньше high.
+        Строки с равными y идут подряд, их вклад вычитается отдельным расчётом внутри групп.
+        """
+        earlier, later = _ordered_sums(rank, payload, lows, highs)
+        if self._groups < rank.size:
+            # Ранги сдвигаются на номер группы: границы отсекают все строки других групп.
+            offset = self._group * (rank.size + 1)
+            same_earlier, same_later = _ordered_sums(offset + rank, payload, [offset + low for low in lows],
+                                                     [offset + high for high in highs])
+            earlier = [total - inner for total, inner in zip(earlier, same_earlier)]
+            later = [total - inner for total, inner in zip(later, same_later)]
+
+        return earlier, later
+
+    def _dual(self, rho: np.ndarray, h: np.ndarray, grad: np.ndarray, regularization: np.ndarray) -> float:
+        """
+        Значение двойственной задачи max rho^T y при |X^T (h - rho)| <= δ, rho из C, lambda из [0, 1 - r].
+        Нарушение ограничения по столбцам x переносится на rho проекцией по методу наименьших квадратов,
+        затем rho и lambda сжимаются до допустимых. Проекция считается равномерной по строкам и взвешенной
+        по запасу до границы C, берётся лучшая из двух оценок.
+        """
+        r = self.data.r
+        excess = grad - np.clip(grad, -regularization, regularization)
+        if not excess.any():
+            return self._feasible_dual(rho, h, regularization)
+
+        if self.mode is Mode.MNM:
+            slack = np.maximum(r - np.abs(rho), 0.0)
+        else:
+            slack = np.maximum(self.data.delta_2 - np.abs(rho), 0.0)
+
+        dual = self._feasible_dual(rho + self._x @ (self._gram_pinv @ excess), h, regularization)
+        if slack.any():
+            weighted = self._x * slack[:, None]
+            corrected = rho + weighted @ (np.linalg.pinv(self._x.T @ weighted) @ excess)
+            dual = max(dual, self._feasible_dual(corrected, h, regularization))
+
+        return dual
+
+    def _feasible_dual(self, rho: np.ndarray, h: np.ndarray, regularization: np.ndarray) -> float:
+        """
+        Сжимает rho и lambda множителем theta до допустимых и возвращает значение двойственной задачи.
+        """
+        r = self.data.r
+        if self.mode is Mode.MNM:
+            size = float(np.abs(rho).max()) if rho.size else 0.0
+        else:
+            size = float(np.maximum(np.abs(rho) - self.data.delta_2, 0.0).sum())
+        theta = 1.0 if size <= r else r / size
+
+        violation = np.abs(self._x.T @ (h - rho))
+        over = violation > regularization
+        if over.any():
+            theta = min(theta, float((regularization[over] / violation[over]).min()))
+
+        return theta * float(rho @ self._y)
+
+    @staticmethod
+    def _project_l1(values: np.ndarray, radius: float) -> np.ndarray:
+        """
+        Проекция на шар ∑|v| <= radius.
+        """
+        if radius <= 0:
+            return np.zeros_like(values)
+
+        modules = np.abs(values)
+        if modules.sum() <= radius:
+            return values
+
+        ordered = np.sort(modules)[::-1]
+        cumulative = np.cumsum(ordered) - radius
+        index = np.nonzero(ordered * np.arange(1, ordered.size + 1) > cumulative)[0][-1]
+        threshold = cumulative[index] / (index + 1)
+
+        return np.sign(values) * np.maximum(modules - threshold, 0.0)
+
+
+def _ordered_sums(rank: np.ndarray, payload: np.ndarray, lows: list, highs: list) -> tuple:
+    """
+    Для каждого элемента i и каждой границы - суммы payload[:, j] по элементам j < i с rank[j] >= low[i]
+    и по элементам j > i с rank[j] < high[i].
+    Слияние снизу вверх, как в ChunkedCriteria.discordant_pairs: на уровне width элементы каждого блока ищут
+    границу в упорядоченном по рангу соседнем блоке своей пары, суммы берутся по накопленным суммам блоков.
+    Длина дополняется до степени двойки элементами с нулевым payload.
+    """
+    n = rank.size
+    rows = payload.shape[0]
+    size = 1 << max(n - 1, 0).bit_length()
+    earlier = [np.zeros((rows, size)) for _ in lows]
+    later = [np.zeros((rows, size)) for _ in highs]
+    span = int(max(rank.max(), *(low.max() for low in lows), *(high.max() for high in highs))) + 2
+    rank = np.concatenate([rank.astype(np.int64), np.full(size - n, -1, dtype=np.int64)])
+    payload = np.concatenate([payload, np.zeros((rows, size - n))], axis=1)
+    ids = np.arange(size)
+    lows = [np.concatenate([low, np.zeros(size - n, dtype=np.int64)]) for low in lows]
+    highs = [np.concatenate([high, np.zeros(size - n, dtype=np.int64)]) for high in highs]
+    width = 1
+
+    while width < size:
+        blocks = size // (2 * width)
+        offset = (np.arange(blocks, dtype=np.int64) * span)[:, None]
+        halves = rank.reshape(blocks, 2, width)
+        sides = ids.reshape(blocks, 2, width)
+        parts = payload.reshape(rows, blocks, 2, width)
+
+        left_key = (halves[:, 0] + offset).ravel()
+        right_key = (halves[:, 1] + offset).ravel()
+        left_sum = np.zeros((rows, blocks * width + 1))
+        right_sum = np.zeros((rows, blocks * width + 1))
+        np.cumsum(parts[:, :, 0].reshape(rows, -1), axis=1, out=left_sum[:, 1:])
+        np.cumsum(parts[:, :, 1].reshape(rows, -1), axis=1, out=right_sum[:, 1:])
+        left_ids = sides[:, 0].ravel()
+        right_ids = sides[:, 1].ravel()
+        left_end = np.repeat(np.arange(1, blocks + 1) * width, width)
+        right_begin = left_end - width
+
+        # Правая половина: суммы по левой половине с рангом не меньше границы.
+        for low, result in zip(lows, earlier):
+            found = np.searchsorted(left_key, (low[sides[:, 1]] + offset).ravel(), side='left')
+            result[:, right_ids] += left_sum[:, left_end] - left_sum[:, found]
+        # Левая половина: суммы по правой половине с рангом меньше границы.
+        for high, result in zip(highs, later):
+            found = np.searchsorted(right_key, (high[sides[:, 0]] + offset).ravel(), side='left')
+            result[:, left_ids] += right_sum[:, found] - right_sum[:, right_begin]
+
+        merge = np.argsort(rank.reshape(blocks, 2 * width), axis=1, kind='stable')
+        merge = (merge + np.arange(blocks)[:, None] * 2 * width).ravel()
+        rank, payload, ids = rank[merge], payload[:, merge], ids[merge]
+        width *= 2
+
+    return [result[:, :n] for result in earlier], [result[:, :n] for result in later]
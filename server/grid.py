@@ -0,0 +1,309 @@
+import hashlib
+import itertools
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import wait
+from typing import Dict, List
+
+import numpy as np
+
+from server.config import GRID_CACHE_SIZE, GRID_MAX_POINTS, WORKERS
+from server.first_order import FirstOrderSolve
+from server.lp import Data, LpSolve
+from server.meta_data import MetaData, Mode, Solver
+from server.pool import PoolRun
+from server.progress import Task, tasks
+
+# Малые величины функции цели, по которым строится сетка, по режимам расчётов.
+DELTAS = {
+    Mode.MNM: ['delta'],
+    Mode.HMMCAO: ['delta_1', 'delta_2'],
+}
+
+# Поверхности сетки: показатели результата решения в каждой точке.
+SURFACES = ['e', 'm', 'L', 'osp', 'N']
+
+# Количество решений в блоке, после которого проверяется, окупается ли расчёт интервала устойчивости.
+RANGING_TRIAL = 4
+
+
+class GridSurfaces:
+    """
+    Поверхности E, M, L, ОСП и N на сетке параметров.
+    Массивы поверхностей имеют размерность (значения delta..., значения r).
+    """
+
+    __slots__ = ('mode', 'r', 'axes', 'e', 'm', 'L', 'osp', 'N', 'solves', 'time')
+
+    mode: Mode
+    r: np.ndarray
+    axes: Dict[str, np.ndarray]  # Значения малых величин по осям сетки, в порядке осей массивов.
+    e: np.ndarray
+    m: np.ndarray
+    L: np.ndarray
+    osp: np.ndarray
+    N: np.ndarray
+    solves: int  # Количество решений, остальные точки взяты из интервала устойчивости соседнего решения.
+    time: float
+
+    def __init__(self, mode: Mode, r: np.ndarray, axes: Dict[str, np.ndarray]):
+        self.mode = mode
+        self.r = r
+        self.axes = axes
+        self.solves = 0
+        self.time = 0.0
+
+        shape = tuple(values.size for values in axes.values()) + (r.size,)
+        for name in SURFACES:
+            setattr(self, name, np.full(shape, np.nan))
+
+    def best(self) -> dict:
+        """
+        Точка сетки с наибольшей оценкой, как при поиске идеальной точки: (1 - E) + (1 - M) + (1 - L)
+        по значениям, нормированным на максимум по сетке.
+        """
+        score = np.zeros(self.e.shape)
+        for values in [self.e, self.m, self.L]:
+            maximum = np.nanmax(values)
+            score += 1 - values / (maximum if maximum else 1)
+
+        index = np.unravel_index(np.nanargmax(score), score.shape)
+        point = {name: float(values[index[axis]]) for axis, (name, values) in enumerate(self.axes.items())}
+        point['r'] = float(self.r[index[-1]])
+        point.update({name: float(getattr(self, name)[index]) for name in SURFACES})
+        point['score'] = float(score[index])
+
+        return point
+
+    def to_dict(self) -> dict:
+        return {
+            'mode': self.mode.value,
+            'r': self.r.tolist(),
+            'axes': {name: values.tolist() for name, values in self.axes.items()},
+            **{name: getattr(self, name).tolist() for name in SURFACES},
+            'solves': self.solves,
+            'time': self.time,
+            'best': self.best(),
+        }
+
+
+class GridCache:
+    """
+    Кеш поверхностей сетки в памяти процесса по набору данных и параметрам сетки,
+    старые записи вытесняются (LRU).
+    """
+
+    max_size: int
+    _surfaces: OrderedDict
+    _lock: threading.Lock
+
+    def __init__(self, max_size: int = GRID_CACHE_SIZE):
+        self.max_size = max_size
+        self._surfaces = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> GridSurfaces | None:
+        with self._lock:
+            surfaces = self._surfaces.get(key)
+            if surfaces is not None:
+                self._surfaces.move_to_end(key)
+
+            return surfaces
+
+    def put(self, key: str, surfaces: GridSurfaces):
+        with self._lock:
+            self._surfaces[key] = surfaces
+            self._surfaces.move_to_end(key)
+            while len(self._surfaces) > self.max_size:
+                self._surfaces.popitem(last=False)
+
+    @staticmethod
+    def build_key(meta_data: MetaData, mode: Mode, r: np.ndarray, axes: Dict[str, np.ndarray]) -> str:
+        return hashlib.sha1(pickle.dumps((
+            meta_data.get_load_data_hash(),
+            mode.value,
+            meta_data.var_y,
+            meta_data.free_chlen,
+            getattr(meta_data, 'scaling', None),
+            getattr(meta_data, 'pairs_window', None),
+            getattr(meta_data, 'pairs_sample', None),
+            getattr(meta_data, 'solver', None),
+            getattr(meta_data, 'gap', None),
+            r.tolist(),
+            [(name, values.tolist()) for name, values in axes.items()],
+        ))).hexdigest()
+
+
+grid_cache = GridCache()
+
+
+def grid_axis(form, name: str, default: float) -> np.ndarray:
+    """
+    Значения параметра сетки из полей формы {name}_from, {name}_to и {name}_step.
+    Если начало диапазона не задано, параметр фиксируется на значении по умолчанию.
+    """
+    start = MetaData.get_value(form, f'{name}_from')
+    if not start:
+        return np.array([default], dtype=np.float64)
+
+    stop = float(MetaData.get_value(form, f'{name}_to') or start)
+    step = float(MetaData.get_value(form, f'{name}_step') or 0.1)
+    if step <= 0 or stop < float(start):
+        raise ValueError(f'Неверный диапазон параметра {name}!')
+
+    return np.round(np.arange(float(start), stop + step / 2, step), 10)
+
+
+def _solve_rows(path: str, block: int, mode: Mode, data: Data, solver: Solver, gap: float, r: np.ndarray,
+                rows: List[tuple]) -> list:
+    """
+    Решает строки сетки (наборы значений delta). Выполняется в воркере пула.
+    Задача строится один раз (задача ЛП загружается из кеша на диске), для каждой точки меняется только
+    функция цели. Строки обходятся змейкой: в чётных r возрастает, в нечётных убывает, поэтому каждое
+    решение соседствует с предыдущим. Для задачи ЛП точки внутри интервала устойчивости предыдущего решения
+    не решаются, пока это окупается: если задачи интервала занимают больше времени, чем сэкономлено на
+    пропущенных точках, интервал больше не вычисляется. Метод первого порядка начинает с предыдущего решения.
+    Ход расчёта передаётся через файл path (memory-map): в ячейку block записывается количество
+    решённых точек блока. Отмена расчёта проверяется перед каждой точкой.
+    :return: список (номер строки, значения поверхностей по r, количество решений).
+    """
+    progress = np.memmap(path, dtype=np.int64, mode='r+')
+    task = tasks.current()
+
+    if solver is Solver.FIRST_ORDER:
+        lp = FirstOrderSolve(mode, data, execute=False, gap=gap)
+    else:
+        lp = LpSolve(mode, data, execute=False, ranging=True, cache=True)
+
+    values = []
+    solves = 0
+    skipped = 0
+    solve_time = 0.0
+    for position, (row, deltas) in enumerate(rows):
+        lp.set_delta(deltas)
+
+        surfaces = np.empty((len(SURFACES), r.size))
+        row_solves = 0
+        for index in (range(r.size) if position % 2 == 0 else reversed(range(r.size))):
+            if task is not None:
+                task.check()
+
+            previous = lp.result
+            start = time.perf_counter()
+            result = lp.update_params(float(r[index]))
+            if result is previous:
+                skipped += 1
+            else:
+                row_solves += 1
+                solves += 1
+                solve_time += time.perf_counter() - start
+            surfaces[:, index] = [getattr(result, name) for name in SURFACES]
+            progress[block] += 1
+
+            if getattr(lp, 'ranging', False) and solves >= RANGING_TRIAL \
+                    and skipped * (solve_time - lp.ranging_time) / solves < lp.ranging_time:
+                lp.ranging = False
+
+        values.append((row, surfaces, row_solves))
+
+    return values
+
+
+class LpGrid:
+    """
+    Исследование сетки параметров: r × delta для МНМ, r × delta_1 × delta_2 для HMMCAO.
+    Малые величины входят только в функцию цели, поэтому все точки решаются на одной системе ограничений:
+    задача ЛП строится один раз и через кеш моделей на диске передаётся воркерам.
+    Строки сетки (наборы delta) делятся на непрерывные блоки по числу воркеров и решаются параллельно.
+    Поверхности сохраняются в кеше по набору данных и параметрам сетки.
+    """
+
+    mode: Mode
+    surfaces: GridSurfaces
+
+    def __init__(self, meta_data: MetaData, r: np.ndarray, axes: Dict[str, np.ndarray]):
+        # Для поиска идеальной точки исследуется МНМ.
+        self.mode = Mode.MNM if meta_data.mode is Mode.IDEAL_DOT else meta_data.mode
+        if self.mode not in DELTAS:
+            raise ValueError('Сетка параметров строится только для МНМ и HMMCAO!')
+
+        points = r.size * int(np.prod([values.size for values in axes.values()]))
+        if points > GRID_MAX_POINTS:
+            raise ValueError(f'Сетка из {points} точек больше допустимой ({GRID_MAX_POINTS})!')
+
+        key = GridCache.build_key(meta_data, self.mode, r, axes)
+        surfaces = grid_cache.get(key)
+        if surfaces is None:
+            surfaces = self._calculation(meta_data, r, axes)
+            grid_cache.put(key, surfaces)
+
+        self.surfaces = surfaces
+
+    @staticmethod
+    def from_form(meta_data: MetaData, form) -> 'LpGrid':
+        """
+        Сетка по диапазонам из формы. Не заданные диапазоны фиксируются на текущих значениях параметров.
+        """
+        mode = Mode.MNM if meta_data.mode is Mode.IDEAL_DOT else meta_data.mode
+        r = grid_axis(form, 'r', meta_data.r)
+        axes = {name: grid_axis(form, name, getattr(meta_data, name, 0.1)) for name in DELTAS.get(mode, [])}
+
+        return LpGrid(meta_data, r, axes)
+
+    def _calculation(self, meta_data: MetaData, r: np.ndarray, axes: Dict[str, np.ndarray]) -> GridSurfaces:
+        start = time.perf_counter()
+        surfaces = GridSurfaces(self.mode, r, axes)
+
+        data = Data(meta_data)
+        solver = getattr(meta_data, 'solver', Solver.LP)
+        if solver is Solver.LP:
+            # Задача строится один раз и сохраняется в кеш моделей, воркеры загружают её из кеша.
+            size = LpSolve(self.mode, data, execute=False, cache=True).size
+        else:
+            size = FirstOrderSolve.estimate_size(*data.x.shape)
+
+        shape = surfaces.e.shape[:-1]
+        rows = [(row, dict(zip(axes, values))) for row, values in enumerate(itertools.product(*axes.values()))]
+        blocks = [block for block in np.array_split(np.arange(len(rows)), min(WORKERS, len(rows))) if block.size]
+
+        # Ход расчёта по блокам: воркеры открывают файл через memory-map.
+        path = tempfile.mkdtemp(prefix='nksp_grid_')
+        progress_path = os.path.join(path, 'progress')
+        progress = np.memmap(progress_path, dtype=np.int64, mode='w+', shape=(len(blocks),))
+        points = len(rows) * r.size
+
+        task = tasks.current()
+        try:
+            # Блок решает точки по очереди и занимает одно место планировщика на всё время решения.
+            # При отмене блоки прерывают решение текущей точки (PoolRun).
+            with PoolRun() as run:
+                for block, indexes in enumerate(blocks):
+                    run.submit(size, _solve_rows, progress_path, block, self.mode, data, solver,
+                               getattr(meta_data, 'gap', None), r, [rows[index] for index in indexes])
+
+                pending = set(run.futures)
+                while pending:
+                    finished, pending = wait(pending, timeout=Task.PUBLISH_INTERVAL)
+                    for future in finished:
+                        for row, values, solves in future.result():
+                            index = np.unravel_index(row, shape)
+                            for position, name in enumerate(SURFACES):
+                                getattr(surfaces, name)[index] = values[position]
+                            surfaces.solves += solves
+
+                    if task is not None:
+                        task.check()
+                        done = int(progress.sum())
+                        task.report(done=done, remaining=points - done)
+        finally:
+            del progress
+            shutil.rmtree(path, ignore_errors=True)
+
+        surfaces.time = time.perf_counter() - start
+
+        return surfaces
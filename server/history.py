@@ -0,0 +1,238 @@
+import datetime
+import pickle
+import uuid
+import zlib
+from typing import List
+
+import numpy as np
+
+from server.config import HISTORY_MEMORY, HISTORY_SIZE
+from server.criteria import Criteria, Results
+from server.lp import Result
+from server.meta_data import MetaData, Mode, Solver
+from server.session import Session
+
+# Подписи режимов расчётов в истории решений.
+MODES = {
+    Mode.MNM: 'МНМ',
+    Mode.HMMCAO: 'HMMCAO',
+    Mode.PIECEWISE_GIVEN: 'Кусочно-заданная',
+}
+
+# Параметры метаданных, от которых зависит решение. Загруженные данные учитываются по хешу.
+PARAMS = ['mode', 'var_y', 'free_chlen', 'r', 'm', 'delta', 'delta_1', 'delta_2', 'scaling',
+          'pairs_window', 'pairs_sample', 'solver', 'gap']
+
+COMPRESS_LEVEL = 1  # Уровень сжатия zlib: данные в основном числовые, сильное сжатие почти ничего не даёт.
+
+
+class RunRecord:
+    """
+    Запись истории решений сессии. Хранится в индексе истории, сам результат хранится отдельно.
+    """
+
+    id: str
+    key: str  # Хеш параметров решения, по нему находится ранее полученное решение.
+    params: dict
+    load_data_hash: str
+    time: float  # Время решения в секундах.
+    created: datetime.datetime
+    hash: str  # Хеш результата решения.
+    size: int  # Размер упакованного результата в байтах.
+    e: float
+    osp: int
+    m: float
+    N: float
+    L: float
+
+    def __init__(self, params: dict, load_data_hash: str, result: Result, _time: float, size: int):
+        self.id = uuid.uuid4().hex
+        self.key = RunRecord.build_key(params, load_data_hash)
+        self.params = params
+        self.load_data_hash = load_data_hash
+        self.time = _time
+        self.created = datetime.datetime.now()
+        self.hash = result.get_hash()
+        self.size = size
+        self.e = result.e
+        self.osp = result.osp
+        self.m = result.m
+        self.N = result.N
+        self.L = result.L
+
+    @staticmethod
+    def build_key(params: dict, load_data_hash: str) -> str:
+        return MetaData.get_hash((load_data_hash, sorted(params.items(), key=lambda item: item[0])))
+
+    @property
+    def mode(self) -> Mode:
+        return self.params['mode']
+
+    @property
+    def label(self) -> str:
+        """
+        Краткая подпись решения: режим и параметры, которые меняются на странице результатов.
+        """
+        label = f'{MODES.get(self.mode, self.mode.value)}, r={self.params["r"]:g}'
+        if self.mode is Mode.PIECEWISE_GIVEN:
+            label += f', M={self.params["m"]}'
+        if self.params.get('solver') is Solver.FIRST_ORDER:
+            label += ', первый порядок'
+        return label
+
+    def to_print(self) -> list:
+        return [self.label,
+                Results.formatting(self.e),
+                self.osp,
+                Results.formatting(self.m),
+                Results.formatting(self.N),
+                Results.formatting(self.L),
+                Results.formatting(self.time),
+                self.hash[:8]]
+
+
+def run_params(meta_data: MetaData) -> dict:
+    """
+    Параметры решения из метаданных. Параметры, не относящиеся к режиму, не сохраняются.
+    """
+    params = {name: getattr(meta_data, name, None) for name in PARAMS}
+    if meta_data.mode is not Mode.PIECEWISE_GIVEN:
+        params['m'] = None
+    return params
+
+
+def encode(result: Result) -> bytes:
+    """
+    Упаковывает результат решения. Вектор l размера O(n²) в основном состоит из нулей
+    и хранится в разреженном виде: индексы ненулевых элементов и их значения.
+    """
+    data = {name: getattr(result, name, None) for name in Result.__slots__}
+
+    index = np.flatnonzero(result.l)
+    data['l'] = None
+    data['l_size'] = result.l.size
+    data['l_index'] = index.astype(np.uint32 if result.l.size <= np.iinfo(np.uint32).max else np.uint64)
+    data['l_values'] = result.l[index]
+
+    return zlib.compress(pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL), COMPRESS_LEVEL)
+
+
+def decode(blob: bytes) -> Result:
+    data = pickle.loads(zlib.decompress(blob))
+
+    l_ = np.zeros(data.pop('l_size'))
+    l_[data.pop('l_index')] = data.pop('l_values')
+    data['l'] = l_
+
+    result = Result.new_result(data)
+    # new_result не переносит p.
+    if data.get('p') is not None:
+        result.p = data['p']
+
+    return result
+
+
+class RunHistory:
+    """
+    История решений сессии. Индекс с параметрами и показателями решений и упакованные результаты
+    хранятся в Redis до истечения сессии. Повторное решение с теми же параметрами заменяет запись.
+    Старые записи вытесняются по количеству и по суммарному размеру упакованных результатов.
+    """
+
+    session: Session
+    max_size: int
+    max_memory: int
+    _records: List[RunRecord] | None
+
+    def __init__(self, session: Session, max_size: int = HISTORY_SIZE, max_memory: int = HISTORY_MEMORY * 2 ** 20):
+        self.session = session
+        self.max_size = max_size
+        self.max_memory = max_memory
+        self._records = None
+
+    def records(self) -> List[RunRecord]:
+        """
+        Записи истории, последние решения в начале. Индекс загружается из Redis один раз.
+        """
+        if self._records is None:
+            self._records = self.session.history
+        return self._records
+
+    def find(self, meta_data: MetaData) -> Result | None:
+        """
+        Ранее полученное решение с параметрами из метаданных.
+        """
+        key = RunRecord.build_key(run_params(meta_data), meta_data.get_load_data_hash())
+        for record in self.records():
+            if record.key == key:
+                return self.get(record.id)
+        return None
+
+    def get(self, run_id: str) -> Result | None:
+        blob = self.session.get_history_run(run_id)
+        return decode(blob) if blob else None
+
+    def record(self, run_id: str) -> RunRecord | None:
+        return next((record for record in self.records() if record.id == run_id), None)
+
+    def add(self, meta_data: MetaData, result: Result, _time: float) -> RunRecord | None:
+        """
+        Добавляет решение в историю. Решение, упакованный результат которого больше допустимого
+        суммарного размера истории, не сохраняется.
+        """
+        blob = encode(result)
+        if len(blob) > self.max_memory:
+            return None
+        record = RunRecord(run_params(meta_data), meta_data.get_load_data_hash(), result, _time, len(blob))
+
+        def update(records: List[RunRecord]) -> tuple:
+            kept = [record]
+            dropped = []
+            memory = record.size
+            for item in records:
+                if item.key == record.key or len(kept) >= self.max_size or memory + item.size > self.max_memory:
+                    dropped.append(item.id)
+                else:
+                    kept.append(item)
+                    memory += item.size
+            return kept, {record.id: blob}, dropped
+
+        self._records = self.session.update_history(update)
+
+        return record
+
+    def compare(self, run_ids: List[str], meta_data: MetaData) -> tuple:
+        """
+        Сравнение решений из истории без повторного расчёта.
+        :return: (строки таблицы решений, таблица критериев или None).
+                 Критерии считаются, только если решения получены для текущих данных и одной зависимой переменной.
+        """
+        records = [record for record in self.records() if record.id in run_ids]
+
+        criteria = None
+        if records and all(record.load_data_hash == meta_data.get_load_data_hash() for record in records) \
+                and len({record.params['var_y'] for record in records}) == 1:
+            y = np.asarray(meta_data.load_data, dtype=np.float64)[:, records[0].params['var_y'] - 1]
+            results = [self.get(record.id) for record in records]
+            if all(result is not None for result in results):
+                criteria = Criteria(np.column_stack([y] + [result.yy for result in results]).tolist())
+                criteria.results.names = [record.label for record in records]
+
+        return [record.to_print() for record in records], criteria
+
+    def restore(self, run_id: str, meta_data: MetaData) -> bool:
+        """
+        Переносит параметры решения из истории в метаданные.
+        Параметры не переносятся, если решение получено для других загруженных данных.
+        """
+        record = self.record(run_id)
+        if record is None or record.load_data_hash != meta_data.get_load_data_hash():
+            return False
+
+        for name, value in record.params.items():
+            if value is not None:
+                setattr(meta_data, name, value)
+            elif name != 'm':
+                # Параметр не задан для решения, например, delta другого режима.
+                meta_data.__dict__.pop(name, None)
+        return True
@@ -1,15 +1,23 @@
+import hashlib
 import json
-import math
+import time
 from typing import List, Any
 
 import numpy as np
 import pulp
-
-from functools import reduce
+import pulp.apis.coin_api
 
 from pulp import PULP_CBC_CMD
 
-from server.meta_data import MetaData, Mode
+from server.config import RESULT_PAIRS_LIMIT
+from server.criteria import ChunkedCriteria
+from server.meta_data import MetaData, Mode, Scaling
+from server.model_cache import ModelCache, model_cache
+from server.progress import tasks, track_processes
+from server.scheduler import ModelSize, scheduler
+
+# Процессы CBC привязываются к расчёту сессии, чтобы при отмене их можно было завершить.
+track_processes(pulp.apis.coin_api)
 
 
 class Data:
@@ -24,75 +32,416 @@ class Data:
     delta: float
     delta_1: float
     delta_2: float
-    omega: np.ndarray
-
-    def __init__(self, meta_data: MetaData):
+    _omega: np.ndarray | None  # Знаки разностей y по всем парам, строятся при первом обращении к omega.
+    scaling: Scaling
+    scale_x: np.ndarray  # Множители столбцов x: в задаче используется x / scale_x.
+    scale_y: float  # Множитель y: в задаче используется y / scale_y.
+    pairs_window: int
+    pairs_sample: int
+
+    def __init__(self, meta_data: MetaData, var_y: int = None, matrix: np.ndarray = None):
+        """
+        :param meta_data: метаданные сессии.
+        :param var_y: индекс столбца зависимой переменной, по умолчанию берётся из метаданных.
+        :param matrix: уже подготовленная матрица исходных данных,
+                       позволяет не преобразовывать load_data повторно.
+        """
         self.delta = meta_data.delta if 'delta' in dir(meta_data) else None
         self.delta_1 = meta_data.delta_1 if 'delta_1' in dir(meta_data) else None
         self.delta_2 = meta_data.delta_2 if 'delta_2' in dir(meta_data) else None
         self.r = meta_data.r
-        self._set_y(meta_data)
-        self._set_x(meta_data)
+        self.scaling = meta_data.scaling if 'scaling' in dir(meta_data) else Scaling.NONE
+        self.pairs_window = meta_data.pairs_window if 'pairs_window' in dir(meta_data) else 0
+        self.pairs_sample = meta_data.pairs_sample if 'pairs_sample' in dir(meta_data) else 0
+
+        if matrix is None:
+            matrix = Data.prepare_matrix(meta_data)
+        if var_y is None:
+            var_y = meta_data.var_y
+
+        self._set_y(matrix, var_y)
+        self._set_x(matrix, var_y, meta_data.free_chlen)
         self._calculation_omega()
+        self.scale_x = np.ones(self.x.shape[1])
+        self.scale_y = 1.0
 
         if meta_data.mode is Mode.PIECEWISE_GIVEN:
             self.m = meta_data.m
 
-    def _set_x(self, meta_data: MetaData):
-        x = []
-        for array in meta_data.load_data:
-            index = 0
-            arr = []
-            for item in array:
-                if index != meta_data.var_y - 1:
-                    arr.append(item)
-                index += 1
-            x.append(arr)
-
-        if meta_data.free_chlen:
-            _x = []
-            for items in x:
-                line = [1]
-                line.extend(items)
-                _x.append(line)
-            x = _x
-
-        self.x = np.array(x)
-
-    def _set_y(self, meta_data: MetaData):
-        y = []
-        for array in meta_data.load_data:
-            index = 0
-            for item in array:
-                if index == meta_data.var_y - 1:
-                    y.append(item)
-                index += 1
-
-        self.y = np.array(y)
+    def subset(self, indices: np.ndarray) -> 'Data':
+        """
+        Формирует данные по подмножеству строк (строки могут повторяться).
+        Параметры задачи копируются, омега строится заново при обращении.
+        """
+        data = Data.__new__(Data)
+        data.__dict__.update(self.__dict__)
+        data.x = self.x[indices]
+        data.y = self.y[indices]
+        data._calculation_omega()
+
+        return data
+
+    @staticmethod
+    def prepare_matrix(meta_data: MetaData) -> np.ndarray:
+        return np.array(meta_data.load_data, dtype=np.float64)
+
+    def _set_x(self, matrix: np.ndarray, var_y: int, free_chlen: bool):
+        x = np.delete(matrix, var_y - 1, axis=1)
+
+        if free_chlen:
+            x = np.hstack([np.ones((x.shape[0], 1)), x])
+
+        self.x = x
+
+    def _set_y(self, matrix: np.ndarray, var_y: int):
+        self.y = matrix[:, var_y - 1].copy()
 
     def _calculation_omega(self):
-        omega = []
+        self._omega = None
+
+    @property
+    def omega(self) -> np.ndarray:
+        """
+        Знаки разностей y по всем парам k < s. Массив размера O(n²) строится при первом обращении:
+        приближённый режим и метод первого порядка без него обходятся.
+        """
+        if self._omega is None:
+            k, s = np.triu_indices(self.y.size, 1)
+            self._omega = np.sign(self.y[k] - self.y[s]).astype(int)
+        return self._omega
+
+    def scale(self):
+        """
+        Масштабирует столбцы x и y способом self.scaling. Множители округляются до степеней двойки,
+        поэтому масштабирование и обратный переход выполняются без ошибок округления.
+        Знаки разностей y не меняются, омега остаётся прежней.
+        """
+        self.scale_x = Data._scale_factors(self.x, self.scaling)
+        self.scale_y = float(Data._scale_factors(self.y.reshape(-1, 1), self.scaling)[0])
+        self.x = self.x / self.scale_x
+        self.y = self.y / self.scale_y
+
+    def condition(self) -> dict:
+        """
+        Показатели обусловленности: отношение максимального модуля ненулевых значений x и y к минимальному
+        и число обусловленности матрицы x.
+        """
+        values = np.abs(np.column_stack([self.y, self.x]))
+        values = values[values > 0]
+
+        return {
+            'range': float(values.max() / values.min()) if values.size else 1.0,
+            'cond': float(np.linalg.cond(self.x)) if self.x.size else 1.0,
+        }
+
+    @staticmethod
+    def _scale_factors(matrix: np.ndarray, scaling: Scaling) -> np.ndarray:
+        if scaling is Scaling.NONE or matrix.shape[0] == 0:
+            return np.ones(matrix.shape[1])
+
+        values = np.abs(matrix)
+        nonzero = values > 0
+        factors = np.where(nonzero, values, 0.0).max(axis=0)
+        if scaling is Scaling.GEOMETRIC:
+            factors = np.sqrt(factors * np.where(nonzero, values, np.inf).min(axis=0))
+        factors = np.where(nonzero.any(axis=0), factors, 1.0)
+
+        return np.exp2(np.round(np.log2(factors)))
+
+
+class Presolve:
+    """
+    Предобработка данных перед построением задачи ЛП.
+    Совпадающие строки (x, y) заменяются одной строкой с весом, равным числу совпадений,
+    пары с omega = 0 исключаются (для них l = 0), нулевые столбцы X исключаются для МНМ и HMMCAO (для них a = 0).
+    Уменьшенные данные масштабируются (Data.scale), решение уменьшенной задачи переносится обратно
+    на исходные строки, пары и столбцы с обратным масштабированием.
+
+    В приближённом режиме (Data.pairs_window > 0, только МНМ и HMMCAO) ограничения строятся не для всех пар,
+    а для соседей в окне по упорядоченным y и случайной выборки дальних пар. Веса выбранных дальних пар
+    увеличиваются так, чтобы сумма l оценивала сумму по всем парам.
+    """
 
-        n = self.y.size
-        for k in range(n - 1):
-            for s in range(k + 1, n):
-                exp = self.y[k] - self.y[s]
-                if exp > 0:
-                    omega.append(1)
-                elif exp < 0:
-                    omega.append(-1)
-                else:  # == 0
-                    omega.append(0)
+    SEED = 0  # Зерно выборки дальних пар, одинаковые данные дают одинаковую задачу.
 
-        self.omega = np.array(omega)
+    source: Data
+    data: Data
+    rows: np.ndarray  # Индекс строки уменьшенной задачи для каждой исходной строки.
+    columns: np.ndarray  # Исходные индексы оставленных столбцов X.
+    weights: np.ndarray  # Число исходных строк, заменённых строкой уменьшенной задачи.
+    k: np.ndarray
+    s: np.ndarray
+    omega: np.ndarray
+    pair_weights: np.ndarray
+    sparse: bool  # Приближённый режим с разреженным графом пар.
+    conditioning: dict  # Показатели обусловленности до и после масштабирования.
+
+    def __init__(self, mode: Mode, data: Data):
+        self.source = data
+
+        _, first, inverse, counts = np.unique(np.column_stack([data.y, data.x]), axis=0, return_index=True,
+                                              return_inverse=True, return_counts=True)
+        # Строки уменьшенной задачи идут в порядке первого появления в исходных данных.
+        order = np.argsort(first)
+        rank = np.empty_like(order)
+        rank[order] = np.arange(order.size)
+        self.rows = rank[inverse.reshape(-1)]
+        self.weights = counts[order]
+
+        if mode in (Mode.MNM, Mode.HMMCAO):
+            self.columns = np.flatnonzero(np.any(data.x != 0, axis=0))
+        else:
+            self.columns = np.arange(data.x.shape[1])
+
+        self.data = data.subset(first[order])
+        self.data.x = self.data.x[:, self.columns]
+
+        self.sparse = mode in (Mode.MNM, Mode.HMMCAO) and data.pairs_window > 0
+        if self.sparse:
+            k, s, pair_weights = self._sparse_pairs(data.pairs_window, data.pairs_sample)
+            omega = np.sign(self.data.y[k] - self.data.y[s]).astype(int)
+        else:
+            k, s = np.triu_indices(self.data.y.size, 1)
+            omega = self.data.omega
+            pair_weights = np.ones(k.size)
+
+        mask = omega != 0
+        self.k = k[mask]
+        self.s = s[mask]
+        self.omega = omega[mask]
+        self.pair_weights = self.weights[self.k] * self.weights[self.s] * pair_weights[mask]
+
+        before = self.data.condition()
+        self.data.scale()
+        after = self.data.condition()
+        self.conditioning = {'scaling': self.data.scaling.value,
+                             'range': [before['range'], after['range']],
+                             'cond': [before['cond'], after['cond']]}
+
+    def _sparse_pairs(self, window: int, sample: int) -> tuple:
+        """
+        Выбирает пары строк уменьшенной задачи: все пары соседей на расстоянии до window в порядке возрастания y
+        и около sample случайных пар на строку из остальных. Остальные пары выбираются равновероятно,
+        поэтому вес каждой из них равен отношению числа невыбранных в окно пар к числу выбранных.
+        :return: индексы пар (k < s) и веса пар.
+        """
+        n = self.data.y.size
+        order = np.argsort(self.data.y, kind='stable')
+
+        near = [(order[:-d], order[d:]) for d in range(1, min(window, n - 1) + 1)]
+        if near:
+            k, s = np.concatenate([item[0] for item in near]), np.concatenate([item[1] for item in near])
+            near = np.unique(np.minimum(k, s) * n + np.maximum(k, s))
+        else:
+            near = np.empty(0, dtype=np.int64)
+
+        rng = np.random.default_rng(Presolve.SEED)
+        k = rng.integers(0, n, sample * n)
+        s = rng.integers(0, max(n - 1, 1), sample * n)
+        s += s >= k
+        far = np.unique(np.minimum(k, s) * n + np.maximum(k, s))
+        far = far[(far // n != far % n) & ~np.isin(far, near)]
+
+        rest = n * (n - 1) // 2 - near.size
+        codes = np.concatenate([near, far])
+        weights = np.concatenate([np.ones(near.size), np.full(far.size, rest / far.size if far.size else 0.0)])
+
+        return codes // n, codes % n, weights
+
+    def update(self, data: Data, edited: np.ndarray, appended: int) -> dict | None:
+        """
+        Переносит предобработку на изменённые исходные данные: строки edited изменены, appended строк добавлены
+        в конец. Изменённые и новые строки сопоставляются со строками уменьшенной задачи по значениям,
+        остальные строки не рассматриваются.
+        Строки уменьшенной задачи не удаляются: строка, все исходные строки которой изменены, получает вес 0,
+        и её пары исключаются. Если изменена единственная исходная строка, значения строки заменяются на месте.
+        Множители масштабирования сохраняются: после обратного перехода решение от них не зависит.
+        :return: изменения задачи (см. ниже) или None, если изменение требует новой предобработки:
+                 приближённый режим или ненулевые значения в исключённых нулевых столбцах X.
+                 patched - строки, значения которых заменены; added - новые строки;
+                 retired и revived - строки, вес которых стал нулевым или перестал быть нулевым;
+                 positions - номер каждой новой пары среди прежних пар или -1; removed - номера удалённых
+                 прежних пар; replaced - номера новых пар, коэффициенты ограничений которых изменились.
+        """
+        if self.sparse or data.x.shape[1] != self.source.x.shape[1]:
+            return None
+
+        n_source = self.source.y.size
+        changed = np.concatenate([edited, np.arange(n_source, data.y.size)]).astype(np.int64)
+        dropped = np.setdiff1d(np.arange(data.x.shape[1]), self.columns)
+        if np.any(data.x[np.ix_(changed, dropped)] != 0):
+            return None
+
+        scale_x, scale_y = self.data.scale_x, self.data.scale_y
+        values = np.column_stack([data.y, data.x[:, self.columns]])
+        # Множители - степени двойки, поэтому исходные значения строк восстанавливаются точно.
+        reduced = np.column_stack([self.data.y * scale_y, self.data.x * scale_x])
+        n_reduced = reduced.shape[0]
+
+        lookup = {row.tobytes(): index for index, row in enumerate(reduced)}
+        rows = np.concatenate([self.rows, np.full(data.y.size - n_source, -1)])
+        weights = np.concatenate([self.weights, np.zeros(changed.size, dtype=self.weights.dtype)])
+        np.subtract.at(weights, self.rows[edited], 1)
+
+        patched = []
+        added = []
+        for j in changed.tolist():
+            key = values[j].tobytes()
+            index = lookup.get(key)
+            if index is None:
+                old = int(self.rows[j]) if j < n_source else -1
+                if old >= 0 and weights[old] == 0 and old not in patched:
+                    del lookup[reduced[old].tobytes()]
+                    reduced[old] = values[j]
+                    patched.append(old)
+                    index = old
+                else:
+                    index = n_reduced + len(added)
+                    added.append(values[j])
+                lookup[key] = index
+            rows[j] = index
+            weights[index] += 1
+
+        if added:
+            reduced = np.vstack([reduced, np.array(added)])
+        n = reduced.shape[0]
+        weights = weights[:n]
+
+        model = Data.__new__(Data)
+        model.__dict__.update(self.data.__dict__)
+        model.y = reduced[:, 0] / scale_y
+        model.x = reduced[:, 1:] / scale_x
+        model._calculation_omega()
+
+        k, s = np.triu_indices(n, 1)
+        omega = model.omega
+        pair_weights = weights[k] * weights[s]
+        mask = (omega != 0) & (pair_weights > 0)
+        k, s, omega, pair_weights = k[mask], s[mask], omega[mask], pair_weights[mask]
+
+        # Пары упорядочены по (k, s), поэтому прежние пары находятся бинарным поиском.
+        old_codes = self.k * n + self.s
+        codes = k * n + s
+        if old_codes.size:
+            positions = np.minimum(np.searchsorted(old_codes, codes), old_codes.size - 1)
+            positions = np.where(old_codes[positions] == codes, positions, -1)
+        else:
+            positions = np.full(codes.size, -1)
+        kept = positions >= 0
+        removed = np.setdiff1d(np.arange(old_codes.size), positions[kept])
+
+        is_patched = np.zeros(n, dtype=bool)
+        is_patched[patched] = True
+        replaced = np.flatnonzero(kept & (is_patched[k] | is_patched[s]))
+
+        old_weights = self.weights
+        retired = np.flatnonzero((old_weights > 0) & (weights[:n_reduced] == 0))
+        revived = np.flatnonzero((old_weights == 0) & (weights[:n_reduced] > 0))
+
+        self.source = data
+        self.rows = rows
+        self.weights = weights
+        self.data = model
+        self.k, self.s, self.omega, self.pair_weights = k, s, omega, pair_weights
+
+        return {
+            'patched': patched,
+            'added': list(range(n_reduced, n)),
+            'retired': retired.tolist(),
+            'revived': revived.tolist(),
+            'positions': positions,
+            'removed': removed,
+            'replaced': replaced,
+        }
+
+    def pairs(self):
+        """
+        Пары строк уменьшенной задачи, для которых строятся ограничения: (k, s, omega, вес).
+        """
+        return zip(self.k.tolist(), self.s.tolist(), self.omega.tolist(), self.pair_weights.tolist())
+
+    def restore_a(self, a: np.ndarray) -> np.ndarray:
+        values = np.zeros(self.source.x.shape[1])
+        values[self.columns] = a * self.data.scale_y / self.data.scale_x
+        return values
+
+    def restore_rows(self, values: np.ndarray) -> np.ndarray:
+        return values[self.rows] * self.data.scale_y
+
+    def restore_value(self, value: float) -> float:
+        return value * self.data.scale_y
+
+    def restore_pairs(self, values: np.ndarray) -> np.ndarray:
+        """
+        Переносит значения по парам уменьшенной задачи на все пары исходных строк (k < s).
+        Значения l симметричны: при перестановке строк пары меняют знак и omega, и разность прогнозов.
+        Пары с omega = 0 и пары строк, заменённых одной строкой, не входят в уменьшенную задачу, для них l = 0.
+        Номер пары уменьшенной задачи вычисляется по номерам её строк, исходные пары обходятся по строкам k.
+        """
+        n = self.data.y.size
+        pairs = np.zeros(n * (n - 1) // 2)
+        pairs[Presolve._pair_index(self.k, self.s, n)] = values
+
+        size = self.source.y.size
+        restored = np.empty(size * (size - 1) // 2)
+        start = 0
+        for k in range(size - 1):
+            rows = self.rows[k + 1:]
+            low, high = np.minimum(self.rows[k], rows), np.maximum(self.rows[k], rows)
+            restored[start:start + rows.size] = np.where(low != high, pairs[Presolve._pair_index(low, high, n)], 0.0)
+            start += rows.size
+
+        restored *= self.data.scale_y
+        return restored
+
+    @staticmethod
+    def _pair_index(k: np.ndarray, s: np.ndarray, n: int) -> np.ndarray:
+        """
+        Номер пары (k < s) в порядке np.triu_indices(n, 1).
+        """
+        return k * (2 * n - k - 1) // 2 + s - k - 1
+
+
+POD_DTYPE = np.dtype([
+    ('r', np.float64),
+    ('E', np.float64),
+    ('M', np.float64),
+    ('L', np.float64),
+    ('r_dot', np.float64),
+    ('is_max', np.bool_),
+])
+"""Структура записи подзадачи LpIdealDot в массиве подзадач."""
+
+
+def _slots_state(state) -> dict:
+    """
+    Атрибуты объекта с __slots__ из состояния pickle: (словарь или None, словарь слотов) для текущих объектов
+    или словарь атрибутов для объектов, сохранённых до перехода на __slots__.
+    """
+    if isinstance(state, tuple):
+        attributes, slots = state
+        return {**(attributes or {}), **(slots or {})}
+    return dict(state or {})
+
+
+def _pods_array(pods) -> np.ndarray:
+    """
+    Массив подзадач POD_DTYPE, в том числе из списка Pod, сохранённого до перехода на массивы.
+    """
+    if pods is None or isinstance(pods, np.ndarray):
+        return pods
+    return np.array([(pod.r, pod.E, pod.M, pod.L, pod.r_dot, pod.is_max) for pod in pods], dtype=POD_DTYPE)
 
 
 class Pod:
     """
     Подзадача LpIdealDot.
     Хранит агрегированный результат решения задачи ЛП.
+    Используется только для вывода, сами подзадачи хранятся в массиве с типом POD_DTYPE.
     """
 
+    __slots__ = ('r', 'E', 'M', 'L', 'r_dot', 'is_max')
+
     r: float
     E: float
     M: float
@@ -117,71 +466,176 @@ class Pod:
     def __str__(self):
         return f'r: {self.r}, E: {self.E}, M: {self.M}, L: {self.L}, r_dot: {self.r_dot}'
 
+    def __setstate__(self, state):
+        self.is_max = False
+        for name, value in _slots_state(state).items():
+            if name in Pod.__slots__:
+                setattr(self, name, value)
+
     def copy(self):
         return Pod(self.r, self.E, self.M, self.L, self.r_dot, self.is_max)
 
+    @staticmethod
+    def from_array(pods: np.ndarray) -> List['Pod']:
+        """
+        Преобразует массив подзадач в список Pod с python-значениями.
+        """
+        if pods is None:
+            return []
+
+        return [Pod(*item) for item in pods.tolist()]
+
+    @staticmethod
+    def empty_array() -> np.ndarray:
+        return np.empty(0, dtype=POD_DTYPE)
+
 
 class Result:
+    __slots__ = ('mode', 'a', 'eps', 'l', 'yy', 'e', 'osp', 'count_rows', 'N', 'L', 'resp_vector', 'p', 'pods',
+                 'r_range', 'conditioning', 'approximation', 'convergence')
+
     mode: Mode
 
-    a: list
-    eps: list
-    l: list
-    yy: list
+    a: np.ndarray
+    eps: np.ndarray
+    l: np.ndarray
+    yy: np.ndarray
     e: float
     osp: float
     count_rows: int
     N: float
-    resp_vector: list
+    L: float
+    resp_vector: np.ndarray
     p: float
 
-    pods: List[Pod]
+    pods: np.ndarray
+    r_range: np.ndarray | None  # Интервал r, на котором коэффициенты a остаются оптимальными.
+    conditioning: dict | None  # Показатели обусловленности задачи до и после масштабирования.
+    approximation: dict | None  # Сведения о решении с разреженным графом пар.
+    convergence: dict | None  # Сведения о сходимости метода первого порядка.
+
+    PAIR_BYTES = 64  # Память на пару при построении вектора l: индексы пар, разности ŷ и сам l.
+    TILE_PAIR_BYTES = 18  # Память на пару блока при расчёте N (ChunkedCriteria.relative_continuous_ksp).
 
     def __init__(self, mode: Mode):
         self.mode = mode
 
-        self.a = []
-        self.eps = []
-        self.l = []
-        self.yy = []
-        self.resp_vector = []
-        self.pods = []
+        self.a = np.empty(0)
+        self.eps = np.empty(0)
+        self.l = np.empty(0)
+        self.yy = np.empty(0)
+        self.resp_vector = np.empty(0, dtype=np.int64)
+        self.pods = Pod.empty_array()
+        self.r_range = None
+        self.conditioning = None
+        self.approximation = None
+        self.convergence = None
+
+    def __setstate__(self, state):
+        """
+        Восстанавливает результат из pickle, в том числе сохранённый в сессии до перехода на __slots__ и массивы:
+        списки значений преобразуются в массивы, отсутствовавшие атрибуты получают значения по умолчанию.
+        """
+        state = _slots_state(state)
+        Result.__init__(self, state.get('mode'))
+        for name, value in state.items():
+            if name in Result.__slots__:
+                setattr(self, name, value)
+
+        for name in ['a', 'eps', 'l', 'yy']:
+            setattr(self, name, Result.to_array(getattr(self, name)))
+        self.resp_vector = np.asarray(self.resp_vector, dtype=np.int64)
+        self.pods = _pods_array(self.pods)
 
     @staticmethod
     def new_result(data=None):
         result = Result(Mode.build(Result.get_value(data, 'mode')))
         if data is not None:
-            result.a = Result.get_value(data, 'a')
-            result.eps = Result.get_value(data, 'eps')
-            result.l = Result.get_value(data, 'l')
-            result.yy = Result.get_value(data, 'yy')
+            result.a = Result.to_array(Result.get_value(data, 'a'))
+            result.eps = Result.to_array(Result.get_value(data, 'eps'))
+            result.l = Result.to_array(Result.get_value(data, 'l'))
+            result.yy = Result.to_array(Result.get_value(data, 'yy'))
             result.e = Result.get_value(data, 'e')
             result.osp = Result.get_value(data, 'osp')
             result.count_rows = Result.get_value(data, 'count_rows')
             result.N = Result.get_value(data, 'N')
             result.L = Result.get_value(data, 'L')
-            result.resp_vector = Result.get_value(data, 'resp_vector')
-            result.resp_vector = Result.get_value(data, 'pods')
+            if Result.get_value(data, 'resp_vector') is not None:
+                result.resp_vector = np.asarray(Result.get_value(data, 'resp_vector'), dtype=np.int64)
+            if Result.get_value(data, 'pods') is not None:
+                result.pods = np.asarray(Result.get_value(data, 'pods'), dtype=POD_DTYPE)
+            if Result.get_value(data, 'r_range') is not None:
+                result.r_range = Result.to_array(Result.get_value(data, 'r_range'))
+            result.conditioning = Result.get_value(data, 'conditioning')
+            result.approximation = Result.get_value(data, 'approximation')
+            result.convergence = Result.get_value(data, 'convergence')
+
+        return result
+
+    @staticmethod
+    def from_coefficients(mode: Mode, a: np.ndarray, data: Data) -> 'Result':
+        """
+        Восстанавливает результат решения МНМ или HMMCAO по коэффициентам a.
+        В оптимуме eps = y - Xa, а l_ks = max(0, -omega_ks * (ŷ_k - ŷ_s)).
+        L, ОСП и N считаются по ŷ сортировкой (ChunkedCriteria) без массивов по всем парам,
+        сам вектор l сохраняется, только если пар не больше RESULT_PAIRS_LIMIT.
+        """
+        result = Result(mode)
+        result.a = a
+
+        result.yy = result.predict(data.x)
+        result.eps = data.y - result.yy
+        if mode is Mode.HMMCAO:
+            result.p = float(np.abs(result.eps).max())
+
+        n = data.y.size
+        if n * (n - 1) // 2 <= RESULT_PAIRS_LIMIT:
+            k, s = np.triu_indices(n, 1)
+            result.l = np.maximum(0.0, -np.sign(data.y[k] - data.y[s]) * (result.yy[k] - result.yy[s]))
+
+        result._epsilon_e(data.y)
+        result._set_max_rows()
+        result._set_pair_criteria(data.y)
 
         return result
 
+    @staticmethod
+    def coefficients_memory(n: int) -> int:
+        """
+        Оценка памяти Result.from_coefficients в байтах для n строк: вектор l, если он сохраняется,
+        и блок пар при расчёте N.
+        """
+        pairs = n * (n - 1) // 2
+        stored = pairs if pairs <= RESULT_PAIRS_LIMIT else 0
+
+        return stored * Result.PAIR_BYTES + min(n, ChunkedCriteria.TILE_SIZE) ** 2 * Result.TILE_PAIR_BYTES
+
     @staticmethod
     def get_value(data, key):
         try:
             return data[key]
-        except KeyError:
+        except (KeyError, TypeError):
             return None
 
+    @staticmethod
+    def to_array(values) -> np.ndarray:
+        if values is None:
+            return np.empty(0)
+        return np.asarray(values, dtype=np.float64)
+
     @property
     def m(self) -> float:
         """
         Получает сумму модулей ошибок.
         """
-        m = 0
-        for item in self.eps:
-            m += abs(item)
+        return float(np.abs(self.eps).sum())
 
-        return m
+    def is_optimal_for(self, r: float) -> bool:
+        """
+        Проверяет, что решение остаётся оптимальным при уровне приоритета r без повторного решения.
+        """
+        r_range = getattr(self, 'r_range', None)
+        return r_range is not None and r_range[0] <= r <= r_range[1]
 
     def calculation(self, _x: np.ndarray, _y: np.ndarray):
         """
@@ -201,40 +655,34 @@ class Result:
         """
         Рассчитывает вектор срабатываний.
         """
-        self.resp_vector = []
+        self.resp_vector = np.argmin(self.a * _x, axis=1) + 1
 
-        for i in range(len(self.yy)):
-            min_x = self.a[0] * _x[i][0]
-            min_index = 0
-            for j in range(1, len(self.a)):
-                if min_x > self.a[j] * _x[i][j]:
-                    min_x = self.a[j] * _x[i][j]
-                    min_index = j
-            self.resp_vector.append(min_index + 1)
+    def predict(self, _x: np.ndarray) -> np.ndarray:
+        """
+        Рассчитывает значения модели для строк _x.
+        """
+        if self.mode == Mode.PIECEWISE_GIVEN:
+            return np.min(self.a * _x, axis=1)
+        return np.asarray(_x, dtype=np.float64) @ self.a
 
     def _set_osp(self, y: np.ndarray):
         """
         Обобщенный критерий согласованности поведения.
         """
-        a = []
-        for i in range(len(y) - 1):
-            for j in range(i + 1, len(y)):
-                a.append(self._sign((self.yy[i] - self.yy[j]) * (y[i] - y[j])))
-
-        self.osp = sum(a)
+        k, s = np.triu_indices(len(y), 1)
+        self.osp = int(np.count_nonzero((self.yy[k] - self.yy[s]) * (y[k] - y[s]) > 0))
 
     def _set_yy(self, _x: np.ndarray):
-        self.yy = list(map(lambda item: sum(list(map(lambda x, a: x * a, item, self.a))), _x))
+        self.yy = np.asarray(_x, dtype=np.float64) @ self.a
 
     def _epsilon_e(self, _y: np.ndarray):
         """
         Расчёт оценки ошибки аппроксимации.
         """
-        self.e = 1 / len(_y) * reduce(
-            lambda x, y: x + y, list(map(lambda x, y: math.fabs(x / y), self.eps, _y))) * 100
+        self.e = float(np.abs(self.eps / _y).sum() / len(_y) * 100)
 
     def _set_L(self):
-        self.L = sum(self.l)
+        self.L = float(self.l.sum())
 
     def _set_max_rows(self):
         self.count_rows = max(len(self.l), len(self.a), len(self.yy), len(self.eps))
@@ -243,32 +691,64 @@ class Result:
         """
         Расчёт оценки непрерывного критерия согласованности поведения.
         """
+        k, s = np.triu_indices(_y.size, 1)
+        _sum = (self.l / (_y[k] + _y[s])).sum()
 
-        _sum = 0
-        index_l = 0
-        for k in range(_y.size - 1):
-            for s in range(k + 1, _y.size):
-                _sum += (self.l[index_l] / (_y[k] + _y[s]))
-                index_l += 1
+        self.N = float(_sum * ((2 * 100) / (_y.size * (_y.size - 1))))
 
-        self.N = _sum * ((2 * 100) / (_y.size * (_y.size - 1)))
+    def _set_pair_criteria(self, y: np.ndarray):
+        """
+        ОСП, N и L по ŷ без перебора пар: несогласованные пары и сумма |ŷ_k - ŷ_s| по ним считаются
+        сортировкой слиянием, ОСП - вычитанием из числа пар несогласованных пар и пар с равными y или ŷ,
+        N - блоками пар с ограниченной памятью.
+        """
+        n = y.size
+        discordant, self.L = ChunkedCriteria.discordant_pairs(y, self.yy)
+        self.osp = n * (n - 1) // 2 - discordant - Result._tied_pairs(y) - Result._tied_pairs(self.yy) \
+            + Result._tied_pairs(y, self.yy)
+        self.N = ChunkedCriteria.relative_continuous_ksp(y, self.yy)
+
+    @staticmethod
+    def _tied_pairs(*columns: np.ndarray) -> int:
+        """
+        Количество пар строк, совпадающих по всем столбцам columns.
+        Строки сравниваются по рангам значений, поэтому -0.0 и 0.0 совпадают, как при сравнении разностей.
+        """
+        codes = np.zeros(columns[0].size, dtype=np.int64)
+        for values in columns:
+            rank = np.unique(values, return_inverse=True)[1].reshape(-1)
+            codes = codes * (int(rank.max()) + 1 if rank.size else 1) + rank
+        counts = np.unique(codes, return_counts=True)[1]
+        return int((counts * (counts - 1) // 2).sum())
 
     def get_max_rows(self):
         return list(map(int, range(self.count_rows)))
 
     def print(self) -> list:
+        return self.print_rows(0, self.count_rows)
+
+    def print_rows(self, start: int, stop: int) -> list:
+        """
+        Формирует строки таблицы результатов с start по stop (не включая).
+        В python-значения преобразуются только запрошенные строки.
+        """
         arr = []
 
-        for index in range(self.count_rows):
+        a = self.a.tolist()
+        l_ = self.l[start:stop].tolist()
+        eps = self.eps[start:stop].tolist()
+        resp_vector = np.asarray(self.resp_vector)[start:stop].tolist()
+
+        for index in range(start, min(stop, self.count_rows)):
             line = []
 
-            if index < len(self.a):
-                line.append(self.a[index])
+            if index < len(a):
+                line.append(a[index])
             else:
                 line.append(None)
 
-            if index < len(self.l):
-                line.append(self.l[index])
+            if index - start < len(l_):
+                line.append(l_[index - start])
             else:
                 line.append(None)
 
@@ -277,14 +757,14 @@ class Result:
             else:
                 line.append(None)
 
-            if index < len(self.eps):
-                line.append(self.eps[index])
+            if index - start < len(eps):
+                line.append(eps[index - start])
             else:
                 line.append(None)
 
             if self.mode == Mode.PIECEWISE_GIVEN:
-                if index < len(self.resp_vector):
-                    line.append(self.resp_vector[index])
+                if index - start < len(resp_vector):
+                    line.append(resp_vector[index - start])
                 else:
                     line.append(None)
 
@@ -316,9 +796,34 @@ class Result:
             arr.append(line)
         return arr
 
-    @staticmethod
-    def _sign(x) -> int:
-        return 1 if x > 0 else 0
+    def get_hash(self) -> str:
+        """
+        Хеш содержимого результата, используется для ETag и сравнения результатов.
+        """
+        _hash = hashlib.sha1()
+        _hash.update(str(self.mode.value).encode())
+        for values in [self.a, self.l, self.eps, self.resp_vector]:
+            _hash.update(np.ascontiguousarray(values).tobytes())
+        _hash.update(repr([getattr(self, name, None) for name in ['e', 'osp', 'N', 'L', 'p']]).encode())
+        _hash.update(self.pods.tobytes())
+        if getattr(self, 'r_range', None) is not None:
+            _hash.update(self.r_range.tobytes())
+        _hash.update(repr(getattr(self, 'conditioning', None)).encode())
+        _hash.update(repr(getattr(self, 'approximation', None)).encode())
+        _hash.update(repr(getattr(self, 'convergence', None)).encode())
+
+        return _hash.hexdigest()
+
+    def to_dict(self) -> dict:
+        data = {}
+        for name in self.__slots__:
+            if not hasattr(self, name):
+                continue
+            value = getattr(self, name)
+            if isinstance(value, np.ndarray):
+                value = value.tolist()
+            data[name] = value
+        return data
 
     class DataEncoder(json.JSONEncoder):
         """
@@ -327,7 +832,7 @@ class Result:
 
         def default(self, obj):
             if isinstance(obj, Result):
-                return obj.__dict__
+                return obj.to_dict()
             return json.JSONEncoder.default(self, obj)
 
 
@@ -341,12 +846,79 @@ class LpSolve:
     result: Result
     _vars: dict
     _problem: pulp.LpProblem
-
-    def __init__(self, mode: Mode, data: Data):
+    _restrictions_m: list  # Ограничения, содержащие большое число M.
+    _warm_start: bool
+    ranging: bool  # Вычислять интервал устойчивости решения по r.
+    ranging_time: float  # Суммарное время решения задач интервала устойчивости в секундах.
+    presolve: Presolve
+    _model: Data  # Данные уменьшенной задачи, по которым строятся переменные и ограничения.
+    _names: dict | None  # Номера ограничений строк и пар, нужны только для изменения данных (update_rows).
+    size: ModelSize
+
+    RANGING_TOLERANCE = 1e-6  # Относительная точность определения нулевых значений в решении.
+
+    def __init__(self, mode: Mode, data: Data, execute: bool = True, ranging: bool = False, cache: bool = False):
+        """
+        :param mode: режим расчётов.
+        :param data: подготовленные исходные данные.
+        :param execute: сразу решить задачу.
+        :param ranging: вычислять интервал устойчивости решения по r.
+        :param cache: брать построенную задачу из кеша на диске и сохранять её туда.
+        """
         self.mode = mode
         self.data = data
         self.result = Result(mode)
         self._vars = {}
+        self._restrictions_m = []
+        self._warm_start = False
+        self._names = None
+        self.ranging_time = 0.0
+        self.presolve = Presolve(mode, data)
+        self._model = self.presolve.data
+        # Интервал устойчивости считается по всем парам, для приближённого решения он не определён.
+        self.ranging = ranging and mode in (Mode.MNM, Mode.HMMCAO) and not self.presolve.sparse
+
+        self.size = ModelSize.estimate(mode, self._model.y.size, len(self._model.x[0]), self.presolve.k.size)
+        scheduler.admit(self.size)
+
+        # Множители масштабирования входят в ключ: данные, отличающиеся в степень двойки раз, после масштабирования
+        # совпадают, а коэффициенты при M в ограничениях зависят от scale_y.
+        key = ModelCache.build_key(mode, self._model.x, self._model.y, self._model.scale_x.tolist(),
+                                   self._model.scale_y, self.presolve.sparse, data.pairs_window,
+                                   data.pairs_sample) if cache else None
+        cached = model_cache.get(key) if cache else None
+        if cached is not None:
+            self._problem, self._vars, self._restrictions_m, m = cached
+            self._build_function_c()
+            if self.mode is Mode.PIECEWISE_GIVEN and m != self.data.m:
+                self._set_m(self.data.m)
+        else:
+            self._build()
+            if cache:
+                model_cache.put(key, (self._problem, self._vars, self._restrictions_m, getattr(self.data, 'm', None)))
+
+        if execute:
+            self.solve()
+
+    @staticmethod
+    def estimate_size(mode: Mode, data: Data) -> ModelSize:
+        """
+        Оценка размера задачи до предобработки, например, для места в планировщике при решении в воркере пула.
+        Пары с равными y не входят в задачу, совпадающие строки и нулевые столбцы не учитываются (оценка сверху).
+        """
+        n, m = data.x.shape
+        if mode in (Mode.MNM, Mode.HMMCAO) and data.pairs_window > 0:
+            window = min(data.pairs_window, max(n - 1, 0))
+            pairs = min(n * (n - 1) // 2, window * n - window * (window + 1) // 2 + data.pairs_sample * n)
+        else:
+            pairs = n * (n - 1) // 2 - Result._tied_pairs(data.y) if n else 0
+
+        return ModelSize.estimate(mode, n, m, pairs)
+
+    def _build(self):
+        """
+        Строит переменные, функцию цели и ограничения задачи.
+        """
         self._problem = pulp.LpProblem('0', pulp.const.LpMinimize)
         self._create_variable_u_v()
         self._create_variable_l()
@@ -370,42 +942,190 @@ class LpSolve:
         elif self.mode is Mode.HMMCAO:
             self._build_restrictions_for_hmmcao()
 
-        self._execute()
-        self._set_result()
+    def solve(self) -> Result:
+        """
+        Решает построенную задачу и формирует новый результат.
+        Задачи ЛП интервала устойчивости решаются в том же месте планировщика, что и основная задача.
+        """
+        self.result = Result(self.mode)
+
+        task = tasks.current()
+        if task is not None:
+            task.check()
+
+        with scheduler.slot(self.size):
+            # При повторном решении MILP предыдущее решение передаётся CBC как начальное.
+            LpSolve._execute(self._problem, warm_start=self._warm_start and self._problem.isMIP())
+            self._set_result()
+
+            if self.ranging:
+                start = time.perf_counter()
+                self.result.r_range = self._calculation_r_range()
+                self.ranging_time += time.perf_counter() - start
+
+        self._warm_start = True
+
+        return self.result
+
+    def update_params(self, r: float, m: int = None) -> Result:
+        """
+        Повторно решает уже построенную задачу с новыми r и M.
+        Ограничения не перестраиваются: пересобирается только функция цели
+        и коэффициенты при sigma в ограничениях с M.
+        Если r лежит в интервале устойчивости текущего решения, задача не решается.
+        """
+        self.data.r = r
+        self._build_function_c()
+
+        if self.result.is_optimal_for(r):
+            return self.result
+
+        if self.mode is Mode.PIECEWISE_GIVEN and m is not None and m != self.data.m:
+            self.data.m = m
+            self._set_m(m)
+
+        return self.solve()
+
+    def update_rows(self, data: Data, edited: list, appended: int) -> bool:
+        """
+        Переносит построенную задачу МНМ или HMMCAO на исходные данные, в которых изменены строки edited
+        и добавлены appended строк в конец. Строятся только ограничения новых строк и их пар со всеми строками,
+        у изменённых строк заменяются ограничения самой строки и её пар, ограничения пар исключённых строк
+        удаляются. Функция цели пересобирается при следующем update_params.
+        :return: False, если изменение требует построения задачи заново.
+        """
+        if self.mode not in (Mode.MNM, Mode.HMMCAO):
+            return False
+
+        names = self._constraint_names()
+        change = self.presolve.update(data, np.asarray(edited, dtype=np.int64), appended)
+        if change is None:
+            return False
+
+        self.data = data
+        self._model = self.presolve.data
+        self.result.r_range = None
+
+        self.size = ModelSize.estimate(self.mode, self._model.y.size, len(self._model.x[0]), self.presolve.k.size)
+        scheduler.admit(self.size)
+
+        self._create_variable_u_v()
+        for index in change['patched']:
+            self._replace_restriction(names['fit'][index], self._fit_restriction(index))
+        for index in change['added']:
+            names['fit'].append(self._add_restriction(self._fit_restriction(index)))
+
+        for position in change['removed'].tolist():
+            del self._problem.constraints[names['pairs'][position]]
+        if change['removed'].size:
+            # pulp не удаляет переменные из задачи, а переменные l удалённых пар не должны попасть в решение:
+            # у копии задачи список переменных собирается заново по функции цели и ограничениям.
+            self._problem = self._problem.copy()
+
+        pairs = []
+        k, s, omega = self.presolve.k.tolist(), self.presolve.s.tolist(), self.presolve.omega.tolist()
+        for index, position in enumerate(change['positions'].tolist()):
+            if position >= 0:
+                pairs.append(names['pairs'][position])
+                continue
+            var_name = f'l{k[index]}_{s[index]}'
+            self._vars.setdefault(var_name, pulp.LpVariable(var_name, lowBound=0))
+            pairs.append(self._add_restriction(self._pair_restriction(k[index], s[index], omega[index])))
+        for index in change['replaced'].tolist():
+            self._replace_restriction(pairs[index], self._pair_restriction(k[index], s[index], omega[index]))
+        names['pairs'] = pairs
+
+        if self.mode is Mode.HMMCAO:
+            # Ошибка строки с нулевым весом не входит в p.
+            for index in change['retired']:
+                del self._problem.constraints[names['max'][index]]
+                names['max'][index] = None
+            names['max'] += [None] * len(change['added'])
+            for index in change['revived'] + change['added']:
+                names['max'][index] = self._add_restriction(self._max_restriction(index))
+
+        return True
+
+    def _constraint_names(self) -> dict:
+        """
+        Имена ограничений строк (fit), пар (pairs, в порядке пар предобработки) и ограничений HMMCAO на p (max).
+        При построении ограничения нумеруются подряд: строки, пары, затем ограничения на p.
+        """
+        if self._names is None:
+            n = self._model.y.size
+            pairs = self.presolve.k.size
+            self._names = {
+                'fit': [str(index) for index in range(n)],
+                'pairs': [str(n + index) for index in range(pairs)],
+                'max': [str(n + pairs + index) for index in range(n)] if self.mode is Mode.HMMCAO else [],
+                'next': n + pairs + (n if self.mode is Mode.HMMCAO else 0),
+            }
+
+        return self._names
+
+    def _add_restriction(self, restriction: pulp.LpConstraint) -> str:
+        name = str(self._names['next'])
+        self._names['next'] += 1
+        self._problem += restriction, name
+
+        return name
+
+    def _replace_restriction(self, name: str, restriction: pulp.LpConstraint):
+        del self._problem.constraints[name]
+        self._problem += restriction, name
+
+    def set_delta(self, values: dict):
+        """
+        Заменяет малые величины delta, delta_1, delta_2. Они входят только в функцию цели,
+        поэтому ограничения не перестраиваются, функция цели пересобирается при следующем update_params.
+        Интервал устойчивости текущего решения по r найден при прежних delta и сбрасывается.
+        """
+        for name, value in values.items():
+            setattr(self.data, name, value)
+        self.result.r_range = None
+
+    def _set_m(self, m: int):
+        """
+        Заменяет большое число M в построенных ограничениях.
+        """
+        m = m / self._model.scale_y
+        for name, sigma in self._restrictions_m:
+            restriction = self._problem.constraints[name]
+            restriction[sigma] = m
+            restriction.constant = -m
 
     def _create_variable_u_v(self):
-        for index in range(self.data.y.size):
+        for index in range(self._model.y.size):
             var_name_u = f'u{index}'
             var_name_v = f'v{index}'
             self._vars.setdefault(var_name_u, pulp.LpVariable(var_name_u, lowBound=0))
             self._vars.setdefault(var_name_v, pulp.LpVariable(var_name_v, lowBound=0))
 
     def _create_variable_l(self):
-        for k in range(self.data.y.size - 1):
-            for s in range(k + 1, self.data.y.size):
-                var_name = f'l{k}{s}'
-                self._vars.setdefault(var_name, pulp.LpVariable(var_name, lowBound=0))
+        for k, s, _, _ in self.presolve.pairs():
+            var_name = f'l{k}_{s}'
+            self._vars.setdefault(var_name, pulp.LpVariable(var_name, lowBound=0))
 
     def _create_variable_beta_gamma(self):
-        for index in range(len(self.data.x[0])):
+        for index in range(len(self._model.x[0])):
             var_name_beta = f'b{index}'
             var_name_gamma = f'g{index}'
             self._vars.setdefault(var_name_beta, pulp.LpVariable(var_name_beta, lowBound=0))
             self._vars.setdefault(var_name_gamma, pulp.LpVariable(var_name_gamma, lowBound=0))
 
     def _create_variable_z(self):
-        for index in range(self.data.y.size):
+        for index in range(self._model.y.size):
             var_name = f'z{index}'
             self._vars.setdefault(var_name, pulp.LpVariable(var_name, lowBound=0))
 
     def _create_variable_sigma(self):
-        for k in range(self.data.x.size):
-            for i in range(len(self.data.x[0])):
-                var_name = f'sigma{k}{i}'
+        for k in range(self._model.x.size):
+            for i in range(len(self._model.x[0])):
+                var_name = f'sigma{k}_{i}'
                 self._vars.setdefault(var_name, pulp.LpVariable(var_name, cat=pulp.const.LpBinary))
 
     def _create_variable_alfa(self):
-        for i in range(self.data.x.size):
+        for i in range(self._model.x.size):
             var_name = f'alfa{i}'
             self._vars.setdefault(var_name, pulp.LpVariable(var_name))
 
@@ -415,222 +1135,426 @@ class LpSolve:
     def _build_function_c(self):
         params = []
 
+        # Коэффициенты умножаются на число совпадающих строк, которые заменены одной строкой при предобработке.
+        weights = self.presolve.weights.tolist()
+        # При масштабировании столбца x на c коэффициент при |a| делится на c (вся функция цели делится на scale_y).
+        scale_x = self._model.scale_x.tolist()
+
         if self.mode is not Mode.HMMCAO:
-            for index in range(self.data.y.size):
-                params.append((self._vars.get(f'u{index}'), self.data.r))
-            for index in range(self.data.y.size):
-                params.append((self._vars.get(f'v{index}'), self.data.r))
+            for index in range(self._model.y.size):
+                params.append((self._vars.get(f'u{index}'), self.data.r * weights[index]))
+            for index in range(self._model.y.size):
+                params.append((self._vars.get(f'v{index}'), self.data.r * weights[index]))
 
-        for k in range(self.data.y.size - 1):
-            for s in range(k + 1, self.data.y.size):
-                params.append((self._vars.get(f'l{k}{s}'), 1 - self.data.r))
+        for k, s, _, weight in self.presolve.pairs():
+            params.append((self._vars.get(f'l{k}_{s}'), (1 - self.data.r) * weight))
 
         if self.mode is Mode.MNM:
-            for index in range(len(self.data.x[0])):
-                params.append((self._vars.get(f'b{index}'), self.data.delta))
-                params.append((self._vars.get(f'g{index}'), self.data.delta))
+            for index in range(len(self._model.x[0])):
+                params.append((self._vars.get(f'b{index}'), self.data.delta / scale_x[index]))
+                params.append((self._vars.get(f'g{index}'), self.data.delta / scale_x[index]))
 
         if self.mode is Mode.HMMCAO:
             params.append((self._vars.get('p'), self.data.r))
 
-            for index in range(len(self.data.x[0])):
-                params.append((self._vars.get(f'b{index}'), self.data.delta_1))
-                params.append((self._vars.get(f'g{index}'), self.data.delta_1))
+            for index in range(len(self._model.x[0])):
+                params.append((self._vars.get(f'b{index}'), self.data.delta_1 / scale_x[index]))
+                params.append((self._vars.get(f'g{index}'), self.data.delta_1 / scale_x[index]))
 
-            for index in range(self.data.y.size):
-                params.append((self._vars.get(f'u{index}'), self.data.delta_2))
-                params.append((self._vars.get(f'v{index}'), self.data.delta_2))
+            for index in range(self._model.y.size):
+                params.append((self._vars.get(f'u{index}'), self.data.delta_2 * weights[index]))
+                params.append((self._vars.get(f'v{index}'), self.data.delta_2 * weights[index]))
 
-        self._problem += pulp.LpAffineExpression(params), 'Функция цели'
+        self._problem.setObjective(pulp.LpAffineExpression(params, name='Функция цели'))
 
     def _build_restrictions_for_mnm(self):
         index_restriction = 0
-        for index in range(self.data.y.size):
-            params = []
-            for index_x in range(len(self.data.x[0])):
-                params.append((self._vars.get(f'b{index_x}'), self.data.x[index][index_x]))
-                params.append((self._vars.get(f'g{index_x}'), -1 * self.data.x[index][index_x]))
-            params.append((self._vars.get(f'u{index}'), 1))
-            params.append((self._vars.get(f'v{index}'), -1))
+        for index in range(self._model.y.size):
+            self._problem += self._fit_restriction(index), str(index_restriction)
+            index_restriction += 1
 
-            self._problem += pulp.LpAffineExpression(params) == self.data.y[index], str(index_restriction)
+        for k, s, omega, _ in self.presolve.pairs():
+            self._problem += self._pair_restriction(k, s, omega), str(index_restriction)
             index_restriction += 1
 
-        index_omega = 0
-        for k in range(self.data.y.size - 1):
-            for s in range(k + 1, self.data.y.size):
-                params = []
-                for index in range(len(self.data.x[0])):
-                    x = self.data.x[k][index] - self.data.x[s][index]
-                    params.append((self._vars.get(f'b{index}'), x * self.data.omega[index_omega]))
-                    params.append((self._vars.get(f'g{index}'), -1 * x * self.data.omega[index_omega]))
-                params.append((self._vars.get(f'l{k}{s}'), 1))
+    def _fit_restriction(self, index: int) -> pulp.LpConstraint:
+        """
+        Уравнение строки index: x_index * (b - g) + u_index - v_index = y_index.
+        """
+        params = []
+        for index_x in range(len(self._model.x[0])):
+            params.append((self._vars.get(f'b{index_x}'), self._model.x[index][index_x]))
+            params.append((self._vars.get(f'g{index_x}'), -1 * self._model.x[index][index_x]))
+        params.append((self._vars.get(f'u{index}'), 1))
+        params.append((self._vars.get(f'v{index}'), -1))
 
-                self._problem += pulp.LpAffineExpression(params) >= 0, str(index_restriction)
-                index_restriction += 1
+        return pulp.LpAffineExpression(params) == self._model.y[index]
+
+    def _pair_restriction(self, k: int, s: int, omega: int) -> pulp.LpConstraint:
+        """
+        Ограничение пары строк k, s: omega * (x_k - x_s) * (b - g) + l_ks >= 0.
+        """
+        params = []
+        for index in range(len(self._model.x[0])):
+            x = self._model.x[k][index] - self._model.x[s][index]
+            params.append((self._vars.get(f'b{index}'), x * omega))
+            params.append((self._vars.get(f'g{index}'), -1 * x * omega))
+        params.append((self._vars.get(f'l{k}_{s}'), 1))
+
+        return pulp.LpAffineExpression(params) >= 0
+
+    def _max_restriction(self, index: int) -> pulp.LpConstraint:
+        """
+        Ограничение HMMCAO на модуль ошибки строки index: u_index + v_index <= p.
+        """
+        params = [(self._vars.get(f'u{index}'), 1), (self._vars.get(f'v{index}'), 1), (self._vars.get(f'p'), -1)]
 
-                index_omega += 1
+        return pulp.LpAffineExpression(params) <= 0
 
     def _build_restrictions_for_mao(self):
         index_restriction = 0
-        for i in range(self.data.y.size):
+        m = self.data.m / self._model.scale_y
+        for i in range(self._model.y.size):
             params = [(self._vars.get(f'z{i}'), 1), (self._vars.get(f'u{i}'), 1), (self._vars.get(f'v{i}'), -1)]
-            self._problem += pulp.LpAffineExpression(params) == self.data.y[i], str(index_restriction)
+            self._problem += pulp.LpAffineExpression(params) == self._model.y[i], str(index_restriction)
 
             index_restriction += 1
 
-        for k in range(self.data.y.size):
-            for i in range(len(self.data.x[0])):
-                params = [(self._vars.get(f'alfa{i}'), self.data.x[k][i]),
+        for k in range(self._model.y.size):
+            for i in range(len(self._model.x[0])):
+                params = [(self._vars.get(f'alfa{i}'), self._model.x[k][i]),
                           (self._vars.get(f'z{k}'), -1)]
                 self._problem += pulp.LpAffineExpression(params) >= 0, str(index_restriction)
 
                 index_restriction += 1
 
-        for k in range(self.data.y.size):
-            for i in range(len(self.data.x[0])):
-                params = [(self._vars.get(f'alfa{i}'), self.data.x[k][i]),
+        for k in range(self._model.y.size):
+            for i in range(len(self._model.x[0])):
+                params = [(self._vars.get(f'alfa{i}'), self._model.x[k][i]),
                           (self._vars.get(f'z{k}'), -1),
-                          (self._vars.get(f'sigma{k}{i}'), self.data.m)]
-                self._problem += pulp.LpAffineExpression(params) <= self.data.m, str(index_restriction)
+                          (self._vars.get(f'sigma{k}_{i}'), m)]
+                self._problem += pulp.LpAffineExpression(params) <= m, str(index_restriction)
+                self._restrictions_m.append((str(index_restriction), self._vars.get(f'sigma{k}_{i}')))
 
                 index_restriction += 1
 
-        for k in range(self.data.y.size):
+        for k in range(self._model.y.size):
             params = []
-            for i in range(len(self.data.x[0])):
-                params.append((self._vars.get(f'sigma{k}{i}'), 1))
+            for i in range(len(self._model.x[0])):
+                params.append((self._vars.get(f'sigma{k}_{i}'), 1))
             self._problem += pulp.LpAffineExpression(params) == 1, str(index_restriction)
 
             index_restriction += 1
 
-        index_omega = 0
-        for k in range(self.data.y.size - 1):
-            for s in range(k + 1, self.data.y.size):
-                params = [(self._vars.get(f'z{k}'), self.data.omega[index_omega]),
-                          (self._vars.get(f'z{s}'), -1 * self.data.omega[index_omega]),
-                          (self._vars.get(f'l{k}{s}'), 1)]
-                self._problem += pulp.LpAffineExpression(params) >= 0, str(index_restriction)
-                index_omega += 1
+        for k, s, omega, _ in self.presolve.pairs():
+            params = [(self._vars.get(f'z{k}'), omega),
+                      (self._vars.get(f'z{s}'), -1 * omega),
+                      (self._vars.get(f'l{k}_{s}'), 1)]
+            self._problem += pulp.LpAffineExpression(params) >= 0, str(index_restriction)
 
-                index_restriction += 1
+            index_restriction += 1
 
     def _build_restrictions_for_hmmcao(self):
         index_restriction = 0
 
-        for index in range(self.data.y.size):
-            params = []
-            for index_x in range(len(self.data.x[0])):
-                params.append((self._vars.get(f'b{index_x}'), self.data.x[index][index_x]))
-                params.append((self._vars.get(f'g{index_x}'), -1 * self.data.x[index][index_x]))
-            params.append((self._vars.get(f'u{index}'), 1))
-            params.append((self._vars.get(f'v{index}'), -1))
-
-            self._problem += pulp.LpAffineExpression(params) == self.data.y[index], str(index_restriction)
+        for index in range(self._model.y.size):
+            self._problem += self._fit_restriction(index), str(index_restriction)
             index_restriction += 1
 
-        index_omega = 0
-        for k in range(self.data.y.size - 1):
-            for s in range(k + 1, self.data.y.size):
-                params = []
-                for index in range(len(self.data.x[0])):
-                    x = self.data.x[k][index] - self.data.x[s][index]
-                    params.append((self._vars.get(f'b{index}'), x * self.data.omega[index_omega]))
-                    params.append((self._vars.get(f'g{index}'), -1 * x * self.data.omega[index_omega]))
-                params.append((self._vars.get(f'l{k}{s}'), 1))
-
-                self._problem += pulp.LpAffineExpression(params) >= 0, str(index_restriction)
-                index_restriction += 1
-
-                index_omega += 1
+        for k, s, omega, _ in self.presolve.pairs():
+            self._problem += self._pair_restriction(k, s, omega), str(index_restriction)
+            index_restriction += 1
 
-        for index in range(self.data.y.size):
-            params = [(self._vars.get(f'u{index}'), 1), (self._vars.get(f'v{index}'), 1), (self._vars.get(f'p'), -1)]
-            self._problem += pulp.LpAffineExpression(params) <= 0, str(index_restriction)
+        for index in range(self._model.y.size):
+            self._problem += self._max_restriction(index), str(index_restriction)
             index_restriction += 1
 
-    def _execute(self):
+    @staticmethod
+    def _execute(problem: pulp.LpProblem, warm_start: bool = False):
         # PULP_CBC_CMD(msg=0) так библиотека в лог будет писать только ошибки.
-        self._problem.solve(PULP_CBC_CMD(msg=0))
+        # Если расчёт сессии отменён, процесс CBC завершается и решение прерывается.
+        task = tasks.current()
+        try:
+            problem.solve(PULP_CBC_CMD(msg=0, warmStart=warm_start))
+        except pulp.PulpSolverError:
+            if task is not None:
+                task.check()
+            raise
+
+        if task is not None:
+            task.check()
 
     def _set_result(self):
-        b, g, u, v = [], [], [], []
-
-        for var in self._problem.variables():
-            if 'b' in var.name:
-                b.append(var.varValue)
-            elif 'alfa' in var.name:
-                self.result.a.append(var.varValue)
-            elif 'g' in var.name:
-                g.append(var.varValue)
-            elif 'l' in var.name:
-                self.result.l.append(var.varValue)
-            elif 'u' in var.name:
-                u.append(var.varValue)
-            elif 'v' in var.name:
-                v.append(var.varValue)
-            elif 'p' in var.name:
-                self.result.p = var.varValue
-
-        for index in range(len(b)):
-            self.result.a.append(b[index] - g[index])
+        """
+        Формирует результат по значениям переменных.
+        Значения берутся по индексам, т.к. problem.variables() упорядочены по имени (u10 раньше u2).
+        Решение уменьшенной задачи переносится на исходные строки, пары и столбцы.
+        """
+        n = self._model.y.size
+        m = len(self._model.x[0])
 
         if self.mode == Mode.PIECEWISE_GIVEN:
-            for i in range(len(self.data.y)):
-                self.result.eps.append(
-                    self.data.y[i] - min(list(map(lambda a, x: a * x, self.result.a, self.data.x[i]))))
+            a = Result.to_array([self._value(f'alfa{i}') for i in range(m)])
         else:
-            for index in range(len(u)):
-                self.result.eps.append(u[index] - v[index])
+            a = Result.to_array([self._value(f'b{i}') - self._value(f'g{i}') for i in range(m)])
+        self.result.a = self.presolve.restore_a(a)
+
+        if self.presolve.sparse:
+            self._set_approximate_result()
+            return
+
+        self.result.l = self.presolve.restore_pairs(
+            Result.to_array([self._value(f'l{k}_{s}') for k, s, _, _ in self.presolve.pairs()]))
+
+        if self.mode == Mode.HMMCAO:
+            self.result.p = self.presolve.restore_value(self._value('p'))
 
+        if self.mode == Mode.PIECEWISE_GIVEN:
+            self.result.eps = self.data.y - self.result.predict(self.data.x)
+        else:
+            self.result.eps = self.presolve.restore_rows(
+                Result.to_array([self._value(f'u{i}') - self._value(f'v{i}') for i in range(n)]))
+
+        self.result.conditioning = self.presolve.conditioning
         self.result.calculation(self.data.x, self.data.y)
 
+    def _set_approximate_result(self):
+        """
+        Формирует результат приближённого решения: по коэффициентам a считаются ошибки, а L, ОСП и N -
+        по полному набору пар без их перебора (Result.from_coefficients). Для оценки потерь от приближения
+        сохраняется значение функции цели полной задачи и его оценка по разреженному графу пар.
+        """
+        result = Result.from_coefficients(self.mode, self.result.a, self.data)
+
+        if self.mode is Mode.HMMCAO:
+            objective = self.data.r * result.p + (1 - self.data.r) * result.L + \
+                        self.data.delta_1 * float(np.abs(result.a).sum()) + self.data.delta_2 * result.m
+        else:
+            objective = self.data.r * result.m + (1 - self.data.r) * result.L + \
+                        self.data.delta * float(np.abs(result.a).sum())
+
+        n = self.data.y.size
+        result.approximation = {
+            'pairs': int(self.presolve.k.size),
+            'total': n * (n - 1) // 2,
+            'window': self.data.pairs_window,
+            'sample': self.data.pairs_sample,
+            'estimate': self.presolve.restore_value(float(pulp.value(self._problem.objective))),
+            'objective': objective,
+        }
+        result.conditioning = self.presolve.conditioning
+
+        self.result = result
+
+    def _calculation_r_range(self) -> np.ndarray | None:
+        """
+        Вычисляет интервал значений r, на котором текущее решение остаётся оптимальным.
+        Решение оптимально при r тогда и только тогда, когда существует допустимое решение двойственной задачи,
+        удовлетворяющее условиям дополняющей нежёсткости. Двойственные переменные при ненулевых ошибках и
+        потерях l фиксируются (через r), свободными остаются только переменные строк с нулевыми значениями,
+        поэтому границы интервала находятся из двух небольших задач ЛП: min r и max r.
+        :return: массив [r_min, r_max] или None, если интервал не удалось найти.
+        """
+        x = np.asarray(self.data.x, dtype=np.float64)
+        n = self.data.y.size
+        tol = LpSolve.RANGING_TOLERANCE * max(1.0, float(np.abs(self.data.y).max()))
+        tol_a = LpSolve.RANGING_TOLERANCE * max(1.0, float(np.abs(self.result.a).max()))
+
+        problem = pulp.LpProblem('r_range', pulp.const.LpMinimize)
+        r = pulp.LpVariable('r', lowBound=0, upBound=1)
+        eps = self.result.eps
+
+        # Вклад строк уравнений: (константа, коэффициент при r, свободные переменные) для каждого столбца X.
+        if self.mode is Mode.MNM:
+            delta = self.data.delta
+            free = np.flatnonzero(np.abs(eps) <= tol)
+            fixed = np.where(np.abs(eps) > tol, np.sign(eps), 0.0)
+            constant = np.zeros(x.shape[1])
+            coefficient = x.T @ fixed
+            pi = {}
+            for i in free.tolist():
+                pi[i] = pulp.LpVariable(f'pi{i}')
+                problem += pi[i] - r <= 0
+                problem += pi[i] + r >= 0
+        else:
+            delta = self.data.delta_1
+            delta_2 = self.data.delta_2
+            tight = np.abs(eps) >= self.result.p - tol
+            nonzero = np.abs(eps) > tol
+            fixed = np.where(nonzero & ~tight, np.sign(eps) * delta_2, 0.0)
+            constant = x.T @ fixed
+            coefficient = np.zeros(x.shape[1])
+            pi = {}
+            nu = []
+            for i in np.flatnonzero(~(nonzero & ~tight)).tolist():
+                pi[i] = pulp.LpVariable(f'pi{i}')
+                if not tight[i]:
+                    problem += pi[i] <= delta_2
+                    problem += pi[i] >= -delta_2
+                    continue
+                nu_i = pulp.LpVariable(f'nu{i}', upBound=0)
+                nu.append(nu_i)
+                if nonzero[i]:
+                    problem += float(np.sign(eps[i])) * pi[i] + nu_i == delta_2
+                else:
+                    problem += pi[i] + nu_i <= delta_2
+                    problem += -1 * pi[i] + nu_i <= delta_2
+            problem += pulp.lpSum(nu) + r == 0
+
+        # Вклад ограничений на пары: при l > 0 двойственная переменная равна 1 - r,
+        # при строгом выполнении ограничения равна 0, на границе свободна в [0, 1 - r].
+        k, s = np.triu_indices(n, 1)
+        omega = np.asarray(self.data.omega, dtype=np.float64)
+        margin = omega * (self.result.yy[k] - self.result.yy[s])
+        active = self.result.l > tol
+        weights = np.where(active, omega, 0.0)
+        rows = np.bincount(k, weights, minlength=n) - np.bincount(s, weights, minlength=n)
+        pairs = x.T @ rows
+        constant += pairs
+        coefficient -= pairs
+
+        mu = []
+        for q in np.flatnonzero((omega != 0) & ~active & (np.abs(margin) <= tol)).tolist():
+            mu_q = pulp.LpVariable(f'mu{q}', lowBound=0)
+            problem += mu_q + r <= 1
+            mu.append((mu_q, omega[q] * (x[k[q]] - x[s[q]])))
+
+        for j in range(x.shape[1]):
+            params = [(r, float(coefficient[j]))]
+            params += [(pi_i, float(x[i][j])) for i, pi_i in pi.items()]
+            params += [(mu_q, float(d[j])) for mu_q, d in mu]
+            expression = pulp.LpAffineExpression(params, constant=float(constant[j]))
+
+            if self.result.a[j] > tol_a:
+                problem += expression == delta
+            elif self.result.a[j] < -tol_a:
+                problem += expression == -delta
+            else:
+                problem += expression <= delta
+                problem += expression >= -delta
+
+        bounds = []
+        for sense in [pulp.const.LpMinimize, pulp.const.LpMaximize]:
+            problem.setObjective(pulp.LpAffineExpression([(r, 1)]))
+            problem.sense = sense
+            LpSolve._execute(problem)
+            if pulp.LpStatus[problem.status] != 'Optimal':
+                return None
+            bounds.append(r.varValue)
+
+        return Result.to_array(bounds)
+
+    def _value(self, name: str) -> float:
+        """
+        Значение переменной в решении. Переменные, не вошедшие в задачу, считаются равными 0.
+        """
+        value = self._vars[name].varValue
+        return value if value is not None else 0.0
+
+
+class SolutionTable:
+    """
+    Таблица решений задачи МНМ по значениям r.
+    Для каждой точки хранятся только коэффициенты a, остальные поля Result
+    однозначно восстанавливаются по исходным данным.
+    """
+
+    __slots__ = ('r', 'a')
+
+    r: np.ndarray
+    a: np.ndarray
+
+    def __init__(self):
+        self.r = np.empty(0)
+        self.a = np.empty((0, 0))
+
+    def add(self, r: float, result: Result):
+        self.r = np.append(self.r, r)
+        self.a = np.vstack([self.a.reshape(-1, result.a.size), result.a])
+
+    def find(self, r: float) -> int | None:
+        indexes = np.flatnonzero(self.r == r)
+        return int(indexes[0]) if indexes.size else None
+
+    def get_result(self, r: float, data: Data) -> Result | None:
+        """
+        Восстанавливает полный результат решения для r из таблицы.
+        :return: результат или None, если точка не решалась.
+        """
+        index = self.find(r)
+        if index is None:
+            return None
+
+        return Result.from_coefficients(Mode.MNM, self.a[index].copy(), data)
+
 
 class IdealDotResult:
     """
     Результаты поиска идеальной точки.
     Так же используется для хранения промежуточных результатов вычислений.
+    Подзадачи хранятся в структурированных массивах с типом POD_DTYPE.
     """
 
-    pods: List[Pod]
+    __slots__ = ('pods', 'result', 'pods_', 'r', 'table', 'key')
+
+    pods: np.ndarray
     result: Result
-    pods_: List[Pod]
+    pods_: np.ndarray
     r: float
+    table: SolutionTable  # Решения всех точек перебора r.
+    key: str  # Ключ набора данных и параметров, для которых выполнен поиск.
 
     def __init__(self):
-        self.pods = []
+        self.pods = Pod.empty_array()
+        self.pods_ = Pod.empty_array()
+        self.table = SolutionTable()
+        self.key = None
 
-    def get_pod_by_max_r_dot(self) -> Pod | None:
-        """Возвращает Pod с максимальным значением r_dot."""
-        if not self.pods_:
-            return None
+    def __setstate__(self, state):
+        """
+        Восстанавливает результаты из pickle, в том числе сохранённые до перехода на __slots__ и массивы подзадач.
+        У таких результатов нет таблицы решений и ключа, поэтому поиск выполняется заново.
+        """
+        IdealDotResult.__init__(self)
+        for name, value in _slots_state(state).items():
+            if name in IdealDotResult.__slots__:
+                setattr(self, name, value)
 
-        pod = self.pods_[0]
-        for i in range(len(self.pods_)):
-            if pod.r_dot < self.pods_[i].r_dot:
-                pod = self.pods_[i]
+        self.pods = _pods_array(self.pods)
+        self.pods_ = _pods_array(self.pods_)
 
-        return pod
+    def get_pod_by_max_r_dot(self) -> np.void | None:
+        """Возвращает запись подзадачи с максимальным значением r_dot."""
+        if not self.pods_.size:
+            return None
 
-    def copy(self) -> List[Pod]:
-        pods = []
-        for item in self.pods:
-            pods.append(item.copy())
+        return self.pods_[np.argmax(self.pods_['r_dot'])]
 
-        return pods
+    def copy(self) -> np.ndarray:
+        return self.pods.copy()
 
 
 class LpIdealDot:
-    """Задача поиска идеальной точки."""
+    """
+    Задача поиска идеальной точки.
+    Модель МНМ строится один раз, для каждой точки r пересобирается только функция цели.
+    Каждое значение r решается один раз, решения сохраняются в таблице pre_result.table.
+    """
 
     result: []
     pre_result: IdealDotResult
     data: Data
+    _lp: LpSolve
+    _results: dict  # Результаты решённых точек на время поиска.
+    _r_left: float | None  # Первое нетривиальное r, с которого начинается второй этап.
 
     def __init__(self, data: Data):
         self.result = []
         self.pre_result = IdealDotResult()
         self.data = data
+        self._lp = None
+        self._results = {}
+        self._r_left = None
 
         self._calculation()
 
@@ -640,94 +1564,112 @@ class LpIdealDot:
         if not r:
             raise Exception("Все решения тривиальны!")
 
+        self._r_left = float('{:.2f}'.format(r))
         self._second_iteration(r)
 
         self.get_result_pods()
 
-        self.data.r = self.pre_result.get_pod_by_max_r_dot().r
+        self.data.r = float(self.pre_result.get_pod_by_max_r_dot()['r'])
         self.pre_result.r = self.data.r
-        self.pre_result.result = LpSolve(Mode.MNM, self.data).result
+        self.pre_result.result = self._solve(self.data.r)
         self.pre_result.result.pods = self.pre_result.pods_
 
+    def _solve(self, r: float) -> Result:
+        """
+        Решает задачу МНМ для r, округлённого до сотых, или берёт уже полученное решение.
+        """
+        r = float('{:.2f}'.format(r))
+        if r in self._results:
+            return self._results[r]
+
+        if self._lp is None:
+            self._lp = LpSolve(Mode.MNM, self.data, execute=False, cache=True)
+
+        result = self._lp.update_params(r)
+        self._results[r] = result
+        self.pre_result.table.add(r, result)
+        self._report(r)
+
+        return result
+
+    def _report(self, r: float):
+        """
+        Публикует ход поиска: r решаются по возрастанию от 0.01 до 1.00,
+        лучшая оценка r_dot считается по уже решённым точкам второго этапа.
+        """
+        task = tasks.current()
+        if task is None:
+            return
+
+        best_r_dot = None
+        if self._r_left is not None:
+            points = [(item.e, item.m, item.L) for key, item in self._results.items() if key >= self._r_left]
+            if points:
+                values = np.array(points)
+                maximum = values.max(axis=0)
+                maximum[maximum == 0] = 1
+                best_r_dot = float((1 - values / maximum).sum(axis=1).max())
+
+        task.report(done=len(self._results), remaining=max(0, int(round((1 - r) * 100))), r=r,
+                    best_r_dot=best_r_dot)
+
     def get_result_pods(self):
-        self.pre_result.pods.sort(key=lambda x: x.r)
+        self.pre_result.pods.sort(order='r', kind='stable')
 
         pods = self._calculate_score()
         ideal_r_dot = self._find_index_ideal_dot(pods)
 
-        for i in range(len(pods)):
-            pods[i].r = float('{:.2f}'.format(pods[i].r))
-
-        result: List[Pod] = []
+        pods['r'] = [float('{:.2f}'.format(r)) for r in pods['r'].tolist()]
 
         added_indexes = []
         for i in range(len(pods)):
             if i in ideal_r_dot:
-                pods[i].is_max = True
-                result.append(pods[i])
+                pods['is_max'][i] = True
                 added_indexes.append(i)
             elif i == 0:
-                result.append(pods[i])
                 added_indexes.append(i)
             elif i == len(pods) - 1:
-                result.append(pods[i])
                 added_indexes.append(i)
-            elif pods[i].r in [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9]:
-                result.append(pods[i])
+            elif pods['r'][i] in [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9]:
                 added_indexes.append(i)
 
         if ideal_r_dot[0] - 1 not in added_indexes and ideal_r_dot[0] - 1 >= 0:
-            result.append(pods[ideal_r_dot[0] - 1])
             added_indexes.append(ideal_r_dot[0] - 1)
         if len(ideal_r_dot) > 1 and ideal_r_dot[len(ideal_r_dot) - 1] + 1 not in added_indexes \
-                and 0 <= ideal_r_dot[0] + 1 < len(pods):
-            result.append(pods[ideal_r_dot[len(ideal_r_dot) - 1] + 1])
+                and 0 <= ideal_r_dot[len(ideal_r_dot) - 1] + 1 < len(pods):
             added_indexes.append(ideal_r_dot[len(ideal_r_dot) - 1] + 1)
         elif ideal_r_dot[0] + 1 not in added_indexes and 0 <= ideal_r_dot[0] + 1 < len(pods):
-            result.append(pods[ideal_r_dot[0] + 1])
             added_indexes.append(ideal_r_dot[0] + 1)
 
-        result.sort(key=lambda x: x.r)
+        result = pods[added_indexes]
+        result.sort(order='r', kind='stable')
         self.pre_result.pods_ = result
 
     def _second_iteration(self, r_left):
+        pods = []
         for r in np.arange(r_left, 1.01, 0.01):
             if float('{:.2f}'.format(r)) == 1.01:
                 continue
-            data = self.data
-            data.r = r
-            result = LpSolve(Mode.MNM, data).result
-            self.pre_result.pods.append(Pod(r, result.e, result.m, result.L, None))
+            result = self._solve(r)
+            pods.append((r, result.e, result.m, result.L, np.nan, False))
+
+        self.pre_result.pods = np.concatenate([self.pre_result.pods, np.array(pods, dtype=POD_DTYPE)])
 
     @staticmethod
-    def _find_index_ideal_dot(pods: List[Pod]) -> List[int]:
+    def _find_index_ideal_dot(pods: np.ndarray) -> List[int]:
         """Ищет индексы с идеальной точкой."""
-        ideal_indexes = []
-        ideal_index = 0
-        for i in range(len(pods)):
-            if pods[ideal_index].r_dot < pods[i].r_dot:
-                ideal_index = i
-
-        for i in range(len(pods)):
-            if pods[ideal_index].r_dot == pods[i].r_dot:
-                ideal_indexes.append(i)
-
-        return ideal_indexes
+        r_dot = pods['r_dot']
+        return np.flatnonzero(r_dot == r_dot[np.argmax(r_dot)]).tolist()
 
-    def _calculate_score(self) -> List[Pod]:
+    def _calculate_score(self) -> np.ndarray:
         """Вычисляет оценки параметров и считает антиточку."""
         pods = self.pre_result.copy()
 
-        divider_E = max(list(map(lambda item: item.E, pods)))
-        divider_M = max(list(map(lambda item: item.M, pods)))
-        divider_L = max(list(map(lambda item: item.L, pods)))
-
-        for i in range(len(pods)):
-            pods[i].E /= divider_E
-            pods[i].M /= divider_M
-            pods[i].L /= divider_L
+        pods['E'] /= pods['E'].max()
+        pods['M'] /= pods['M'].max()
+        pods['L'] /= pods['L'].max()
 
-            pods[i].r_dot = (1 - pods[i].E) + (1 - pods[i].M) + (1 - pods[i].L)
+        pods['r_dot'] = (1 - pods['E']) + (1 - pods['M']) + (1 - pods['L'])
 
         return pods
 
@@ -735,9 +1677,7 @@ class LpIdealDot:
         """Ищет не тривиальное решение."""
 
         for r in np.arange(0.01, 1, 0.01):
-            data = self.data
-            data.r = r
-            result = LpSolve(Mode.MNM, data).result
+            result = self._solve(r)
             if result.L != 0:
                 return r
 
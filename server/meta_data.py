@@ -1,7 +1,11 @@
 import enum
+import hashlib
 import json
+import pickle
+from typing import TYPE_CHECKING
 
-from server.criteria import Criteria
+if TYPE_CHECKING:
+    from server.criteria import Criteria
 
 
 class MenuTypes(enum.Enum):
@@ -32,6 +36,66 @@ class Mode(str, enum.Enum):
         return Mode(value)
 
 
+class Scaling(str, enum.Enum):
+    """Масштабирование столбцов x и y перед построением задачи ЛП."""
+
+    NONE = 'NONE'
+    GEOMETRIC = 'GEOMETRIC'  # Среднее геометрическое минимального и максимального модулей столбца.
+    EQUILIBRATION = 'EQUILIBRATION'  # Максимальный модуль столбца.
+
+    @staticmethod
+    def build(value):
+        if not value:
+            return Scaling.NONE
+        return Scaling(value)
+
+
+class Solver(str, enum.Enum):
+    """Метод решения задач МНМ и HMMCAO."""
+
+    LP = 'LP'  # Задача ЛП, решатель CBC.
+    FIRST_ORDER = 'FIRST_ORDER'  # Метод первого порядка без построения задачи ЛП, server.first_order.
+
+    @staticmethod
+    def build(value):
+        if not value:
+            return Solver.LP
+        return Solver(value)
+
+
+class LoadDataDiff:
+    """
+    Отличие загруженной матрицы от предыдущей загрузки сессии: изменённые строки и строки, добавленные в конец.
+    По нему построенная задача ЛП дополняется, а не строится заново (server.context).
+    """
+
+    base_hash: str  # Хеш предыдущей матрицы.
+    edited: list  # Индексы изменённых строк, начинаются с 0.
+    appended: int  # Количество строк, добавленных в конец.
+
+    def __init__(self, base_hash: str, edited: list, appended: int):
+        self.base_hash = base_hash
+        self.edited = edited
+        self.appended = appended
+
+    @property
+    def changed(self) -> int:
+        return len(self.edited) + self.appended
+
+    @staticmethod
+    def build(old: list | None, new: list | None, base_hash: str) -> 'LoadDataDiff | None':
+        """
+        :param base_hash: хеш предыдущей матрицы old.
+        :return: отличие или None, если строки удалены или изменилось количество столбцов.
+        """
+        if not old or not new or len(new) < len(old) or len(new[0]) != len(old[0]):
+            return None
+
+        edited = [index for index in range(len(old)) if old[index] != new[index]]
+
+        return LoadDataDiff(base_hash, edited, len(new) - len(old))
+
+
 class MetaData:
     """
     Сущность для хранения и взаимодействия с клиентскими метаданными.
@@ -48,8 +112,10 @@ class MetaData:
     menu_active_criteria: bool
 
     load_data: list
+    load_data_hash: str
+    load_data_diff: LoadDataDiff | None  # Отличие от предыдущей загрузки.
     criteria_data: list
-    criteria: Criteria
+    criteria: 'Criteria'
 
     mode: Mode
 
@@ -60,10 +126,42 @@ class MetaData:
     delta_2: float
     var_y: int  # Индекс столбца, зависимой переменной. Начинается с 1.
     m: int  # Большое положительное число.
+    scaling: Scaling
+    pairs_window: int  # Окно соседей по y в приближённом режиме с разреженным графом пар, 0 - все пары.
+    pairs_sample: int  # Количество случайных дальних пар на одно наблюдение в приближённом режиме.
+    solver: Solver
+    gap: float  # Допустимый относительный разрыв двойственности метода первого порядка.
 
     def __init__(self):
         self.mode = Mode.MNM
 
+    def set_load_data(self, load_data: list):
+        self.load_data_diff = LoadDataDiff.build(self.load_data if 'load_data' in self.__dict__ else None, load_data,
+                                                 self.get_load_data_hash())
+        self.load_data = load_data
+        self.load_data_hash = MetaData.get_hash(load_data)
+
+    def get_load_data_hash(self) -> str:
+        """
+        Получает хеш загруженной матрицы. Для сессий, созданных до появления хеша, считает его.
+        """
+        if 'load_data_hash' not in self.__dict__:
+            self.load_data_hash = MetaData.get_hash(self.load_data if 'load_data' in self.__dict__ else None)
+        return self.load_data_hash
+
+    def get_state_hash(self) -> str:
+        """
+        Хеш состояния клиента без самих загруженных данных, используется для ETag страниц.
+        """
+        state = {key: value for key, value in self.__dict__.items()
+                 if key not in ['load_data', 'criteria_data', 'criteria']}
+        state['load_data_hash'] = self.get_load_data_hash()
+        return MetaData.get_hash(sorted(state.items(), key=lambda item: item[0]))
+
+    @staticmethod
+    def get_hash(data) -> str:
+        return hashlib.sha1(pickle.dumps(data)).hexdigest()
+
     def get_load_data_len(self):
         """
         Получает массив индексов столбцов загруженной матрицы.
@@ -123,18 +221,38 @@ class MetaData:
     def set_data(self, form):
         self.var_y = int(self.get_value(form, 'var_y')) if self.get_value(form, 'var_y') else 1
         self.r = float(self.get_value(form, 'r')) if self.get_value(form, 'r') else 0.1
+        self.scaling = Scaling.build(self.get_value(form, 'scaling'))
 
+        self.solver = Solver.LP
         if self.mode in [Mode.MNM, Mode.IDEAL_DOT]:
             self.set_free_chlen(form)
+            self.set_sparse_pairs(form)
+            if self.mode is Mode.MNM:
+                self.set_solver(form)
             self.delta = float(self.get_value(form, 'delta')) if self.get_value(form, 'delta') else 0.1
         if self.mode is Mode.PIECEWISE_GIVEN:
             self.free_chlen = False
             self.m = int(self.get_value(form, 'M')) if self.get_value(form, 'M') else 100000
         if self.mode is Mode.HMMCAO:
             self.set_free_chlen(form)
+            self.set_sparse_pairs(form)
+            self.set_solver(form)
             self.delta_1 = float(self.get_value(form, 'delta_1')) if self.get_value(form, 'delta_1') else 0.1
             self.delta_2 = float(self.get_value(form, 'delta_2')) if self.get_value(form, 'delta_2') else 0.1
 
+    def set_sparse_pairs(self, form):
+        if self.get_value(form, 'sparse_pairs'):
+            self.pairs_window = int(self.get_value(form, 'pairs_window')) if self.get_value(form, 'pairs_window') else 10
+            self.pairs_sample = int(self.get_value(form, 'pairs_sample')) if self.get_value(form, 'pairs_sample') else 5
+        else:
+            self.pairs_window = 0
+            self.pairs_sample = 0
+
+    def set_solver(self, form):
+        self.solver = Solver.build(self.get_value(form, 'solver'))
+        # Разрыв задаётся на форме в процентах.
+        self.gap = float(self.get_value(form, 'gap')) / 100 if self.get_value(form, 'gap') else 1e-3
+
     def update_params(self, form):
         self.r = float(self.get_value(form, 'r')) if self.get_value(form, 'r') else 0.1
         if self.mode is Mode.PIECEWISE_GIVEN:
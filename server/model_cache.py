@@ -0,0 +1,159 @@
+import hashlib
+import logging
+import os
+import pickle
+import stat
+import tempfile
+import threading
+from typing import Any
+
+import numpy as np
+import pulp
+
+from server.config import MODEL_CACHE_DIR, MODEL_CACHE_SIZE
+from server.meta_data import Mode
+
+
+class ModelCache:
+    """
+    Кеш построенных задач ЛП на локальном диске.
+    Ограничения задачи не зависят от r и M, поэтому построенная модель сохраняется один раз
+    для набора данных и режима, а при повторном решении загружается и в ней заменяются только
+    функция цели и коэффициенты при M. Старые модели вытесняются по времени последнего обращения (LRU).
+
+    Модели хранятся в pickle: загрузка из MPS или словаря pulp не быстрее построения задачи заново.
+    Поэтому кеш используется, только если каталог принадлежит пользователю процесса и закрыт для остальных
+    (0o700), а загружаются только файлы этого пользователя.
+    """
+
+    FORMAT_VERSION = 1  # Увеличивается при изменении способа построения задачи.
+
+    path: str
+    max_size: int
+    _lock: threading.Lock
+
+    def __init__(self, path: str = MODEL_CACHE_DIR, max_size: int = MODEL_CACHE_SIZE * 1024 * 1024):
+        """
+        :param path: каталог кеша.
+        :param max_size: максимальный суммарный размер файлов кеша в байтах, 0 отключает кеш.
+        """
+        self.path = path
+        self.max_size = max_size
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def get(self, key: str) -> Any | None:
+        """
+        Загружает модель из кеша.
+        :return: сохранённый объект или None, если модели нет или файл повреждён.
+        """
+        if not self.enabled or not self._trusted():
+            return None
+
+        file_name = self._file_name(key)
+        try:
+            descriptor = os.open(file_name, os.O_RDONLY | getattr(os, 'O_NOFOLLOW', 0))
+        except OSError:
+            return None
+
+        try:
+            with os.fdopen(descriptor, 'rb') as file:
+                if not ModelCache._owned(os.fstat(file.fileno()), stat.S_ISREG):
+                    logging.warning('Файл кеша моделей %s не принадлежит пользователю процесса', file_name)
+                    return None
+                value = pickle.load(file)
+            os.utime(file_name)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            self._remove(file_name)
+            return None
+
+        return value
+
+    def put(self, key: str, value: Any):
+        """
+        Сохраняет модель в кеш. Файл записывается во временный и затем переименовывается,
+        чтобы параллельные процессы не прочитали его частично.
+        """
+        if not self.enabled or not self._trusted():
+            return
+
+        descriptor, temp_name = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_name, self._file_name(key))
+        except OSError:
+            self._remove(temp_name)
+            return
+
+        self._evict()
+
+    def _evict(self):
+        """
+        Удаляет давно не использованные модели, пока размер кеша превышает допустимый.
+        """
+        with self._lock:
+            files = []
+            for entry in os.scandir(self.path):
+                if entry.name.endswith('.pkl'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+
+            total = sum(size for _, size, _ in files)
+            for _, size, file_name in sorted(files):
+                if total <= self.max_size:
+                    break
+                self._remove(file_name)
+                total -= size
+
+    def _trusted(self) -> bool:
+        """
+        Создаёт каталог кеша с правами 0o700 и проверяет, что он принадлежит пользователю процесса
+        и недоступен остальным. Иначе кеш не используется: в чужой каталог могут подложить файл модели.
+        """
+        try:
+            os.makedirs(self.path, mode=0o700, exist_ok=True)
+            info = os.lstat(self.path)
+        except OSError:
+            return False
+
+        if not ModelCache._owned(info, stat.S_ISDIR) or info.st_mode & 0o077:
+            logging.warning('Кеш моделей отключён: каталог %s должен принадлежать пользователю процесса '
+                            'и иметь права 0o700', self.path)
+            return False
+        return True
+
+    @staticmethod
+    def _owned(info: os.stat_result, is_type) -> bool:
+        return is_type(info.st_mode) and (not hasattr(os, 'getuid') or info.st_uid == os.getuid())
+
+    def _file_name(self, key: str) -> str:
+        return os.path.join(self.path, f'{key}.pkl')
+
+    @staticmethod
+    def _remove(file_name: str):
+        try:
+            os.remove(file_name)
+        except OSError:
+            pass
+
+    @staticmethod
+    def build_key(mode: Mode, x: np.ndarray, y: np.ndarray, *params) -> str:
+        """
+        Формирует ключ структуры задачи: режим, данные уменьшенной задачи и параметры, влияющие на ограничения.
+        """
+        _hash = hashlib.sha1()
+        _hash.update(repr((ModelCache.FORMAT_VERSION, pulp.__version__, mode.value, x.shape, params)).encode())
+        _hash.update(np.ascontiguousarray(x, dtype=np.float64).tobytes())
+        _hash.update(np.ascontiguousarray(y, dtype=np.float64).tobytes())
+
+        return _hash.hexdigest()
+
+
+model_cache = ModelCache()
@@ -0,0 +1,107 @@
+import math
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import numpy as np
+
+from server.config import WORKERS
+from server.progress import TaskCancelledError, WorkerTask, tasks
+from server.scheduler import ModelSize, scheduler
+
+_executor: ProcessPoolExecutor | None = None
+_lock = threading.Lock()
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """
+    Получает общий для процесса пул воркеров для параллельного решения задач ЛП.
+    Пул создаётся при первом обращении. Процессы запускаются через spawn,
+    т.к. fork из многопоточного waitress небезопасен.
+    """
+    global _executor
+
+    with _lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context('spawn'))
+
+        return _executor
+
+
+def _run(flag_path: str, fn, *args):
+    """
+    Выполняет задачу расчёта в воркере пула. Пока задача выполняется, флаг отмены проверяется в отдельном потоке,
+    при отмене запущенный задачей процесс CBC завершается, а решатели прерываются на ближайшей проверке
+    tasks.current().check().
+    """
+    try:
+        flag = np.memmap(flag_path, dtype=np.uint8, mode='r')
+    except FileNotFoundError:
+        # Расчёт завершился до начала задачи.
+        raise TaskCancelledError('Расчёт отменён')
+
+    task = WorkerTask(flag, getattr(fn, '__name__', ''))
+    with tasks.bind(task), task.watching():
+        task.check()
+        return fn(*args)
+
+
+class PoolRun:
+    """
+    Задачи одного расчёта в общем пуле воркеров.
+    Каждая задача занимает место в планировщике процесса приложения от отправки в пул до завершения,
+    поэтому решения в воркерах входят в общее ограничение количества процессов CBC и памяти
+    и видны в /status/solver. Задача отправляется, когда для неё освобождается место; пока выполняются
+    задачи этого же расчёта, ожидание не ограничено временем - места освободятся без участия других сессий.
+    Отмена передаётся воркерам через файл (memory-map), как ход расчёта сетки: ещё не начатые задачи
+    не выполняются, выполняющиеся завершают процесс CBC и прерываются. При выходе из блока с ошибкой
+    расчёт отменяется.
+    """
+
+    futures: list
+    _path: str
+    _flag_path: str
+    _flag: np.memmap
+
+    def __init__(self):
+        self.futures = []
+        self._path = tempfile.mkdtemp(prefix='nksp_pool_')
+        self._flag_path = os.path.join(self._path, 'cancel')
+        self._flag = np.memmap(self._flag_path, dtype=np.uint8, mode='w+', shape=(1,))
+
+    def __enter__(self) -> 'PoolRun':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is not None:
+                self.cancel()
+        finally:
+            # Воркеры, уже открывшие флаг, читают его и после удаления файла.
+            del self._flag
+            shutil.rmtree(self._path, ignore_errors=True)
+
+    def submit(self, size: ModelSize, fn, *args) -> Future:
+        """
+        Занимает место планировщика для задачи размера size и отправляет fn(*args) в пул.
+        """
+        running = any(not future.done() for future in self.futures)
+        scheduler.acquire(size, max_wait=math.inf if running else None)
+        try:
+            future = get_executor().submit(_run, self._flag_path, fn, *args)
+        except BaseException:
+            scheduler.release(size)
+            raise
+        future.add_done_callback(lambda _: scheduler.release(size))
+        self.futures.append(future)
+
+        return future
+
+    def cancel(self):
+        self._flag[0] = 1
+        self._flag.flush()
+        for future in self.futures:
+            future.cancel()
@@ -0,0 +1,261 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from server.session import Session
+
+
+class TaskCancelledError(Exception):
+    """
+    Расчёт отменён пользователем или более новым запросом той же сессии.
+    """
+
+
+class Task:
+    """
+    Длительный расчёт сессии: поиск идеальной точки или решение MILP.
+    Состояние публикуется в Redis и опрашивается клиентом, отмена останавливает расчёт
+    между решениями и завершает запущенные процессы CBC.
+    """
+
+    token: str
+    name: str
+    started: float
+    done: int  # Количество выполненных решений.
+    remaining: int | None  # Оценка количества оставшихся решений.
+    r: float | None
+    best_r_dot: float | None
+    gap: float | None  # Относительный разрыв двойственности метода первого порядка, done - номер итерации.
+    state: str
+    _cancelled: threading.Event
+    _processes: list
+    _lock: threading.Lock
+    _published: float
+
+    PUBLISH_INTERVAL = 0.2  # Минимальный интервал между записями состояния в Redis, в секундах.
+
+    def __init__(self, token: str, name: str):
+        self.token = token
+        self.name = name
+        self.started = time.monotonic()
+        self.done = 0
+        self.remaining = None
+        self.r = None
+        self.best_r_dot = None
+        self.gap = None
+        self.state = 'running'
+        self._cancelled = threading.Event()
+        self._processes = []
+        self._lock = threading.Lock()
+        self._published = 0.0
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def report(self, **values):
+        """
+        Обновляет состояние расчёта (done, remaining, r, best_r_dot, gap) и публикует его.
+        """
+        for name, value in values.items():
+            setattr(self, name, value)
+
+        if time.monotonic() - self._published >= Task.PUBLISH_INTERVAL:
+            self.publish()
+
+    def publish(self):
+        self._published = time.monotonic()
+        Session.set_progress(self.token, self.to_dict())
+
+    def check(self):
+        """
+        Прерывает расчёт, если он отменён.
+        """
+        if self.cancelled:
+            raise TaskCancelledError(f'Расчёт {self.name} отменён')
+
+    def cancel(self):
+        """
+        Отменяет расчёт и завершает запущенные им процессы CBC.
+        """
+        self._cancelled.set()
+        with self._lock:
+            for process in self._processes:
+                if process.poll() is None:
+                    process.kill()
+
+    def attach(self, process):
+        """
+        Привязывает запущенный процесс решателя к расчёту.
+        """
+        with self._lock:
+            self._processes = [item for item in self._processes if item.poll() is None]
+            self._processes.append(process)
+
+        if self.cancelled:
+            process.kill()
+
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'state': self.state,
+            'done': self.done,
+            'remaining': self.remaining,
+            'r': self.r,
+            'best_r_dot': self.best_r_dot,
+            'gap': self.gap,
+            'elapsed': time.monotonic() - self.started,
+        }
+
+
+class WorkerTask(Task):
+    """
+    Часть расчёта сессии, выполняющаяся в воркере пула (server.pool.PoolRun).
+    Отмена передаётся через флаг в файле (memory-map): поток-наблюдатель проверяет флаг и завершает
+    запущенные процессы CBC воркера. Состояние публикует расчёт в процессе приложения.
+    """
+
+    _flag: Any  # Флаг отмены: ненулевой элемент 0 означает отмену.
+    _finished: threading.Event
+
+    def __init__(self, flag, name: str):
+        super().__init__('', name)
+        self._flag = flag
+        self._finished = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set() or bool(self._flag[0])
+
+    def publish(self):
+        pass
+
+    @contextmanager
+    def watching(self) -> Iterator['WorkerTask']:
+        """
+        Проверяет флаг отмены в отдельном потоке на время выполнения блока.
+        """
+        thread = threading.Thread(target=self._watch, daemon=True)
+        thread.start()
+        try:
+            yield self
+        finally:
+            self._finished.set()
+            thread.join()
+
+    def _watch(self):
+        while not self._finished.wait(Task.PUBLISH_INTERVAL):
+            if self._flag[0]:
+                self.cancel()
+                return
+
+
+class TaskRegistry:
+    """
+    Выполняющиеся расчёты процесса приложения, не больше одного на сессию.
+    Новый расчёт сессии (например, после перезагрузки страницы) отменяет предыдущий.
+    """
+
+    _tasks: dict
+    _lock: threading.Lock
+    _local: threading.local
+
+    def __init__(self):
+        self._tasks = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def run(self, token: str, name: str) -> Iterator[Task]:
+        """
+        Регистрирует расчёт сессии на время выполнения блока и делает его текущим для потока.
+        """
+        task = Task(token, name)
+        with self._lock:
+            previous = self._tasks.get(token)
+            self._tasks[token] = task
+        if previous is not None:
+            previous.cancel()
+
+        self._local.task = task
+        task.publish()
+        try:
+            yield task
+            task.state = 'done'
+        except TaskCancelledError:
+            task.state = 'cancelled'
+            raise
+        except Exception:
+            task.state = 'cancelled' if task.cancelled else 'error'
+            raise
+        finally:
+            self._local.task = None
+            with self._lock:
+                if self._tasks.get(token) is task:
+                    del self._tasks[token]
+            task.publish()
+
+    @contextmanager
+    def bind(self, task: Task) -> Iterator[Task]:
+        """
+        Делает расчёт текущим для потока без регистрации и публикации, например, расчёт воркера пула.
+        """
+        self._local.task = task
+        try:
+            yield task
+        finally:
+            self._local.task = None
+
+    def cancel(self, token: str) -> bool:
+        """
+        Отменяет расчёт сессии.
+        :return: True, если расчёт выполнялся.
+        """
+        with self._lock:
+            task = self._tasks.get(token)
+        if task is None:
+            return False
+
+        task.cancel()
+        return True
+
+    def current(self) -> Task | None:
+        """
+        Расчёт, выполняющийся в текущем потоке.
+        """
+        return getattr(self._local, 'task', None)
+
+
+tasks = TaskRegistry()
+
+
+class _ProcessTracker:
+    """
+    Замена модуля subprocess в модуле решателя: запущенные процессы привязываются к расчёту текущего потока,
+    чтобы отмена могла их завершить. Остальные атрибуты берутся из исходного модуля.
+    """
+
+    def __init__(self, module):
+        self._module = module
+
+    def __getattr__(self, name):
+        return getattr(self._module, name)
+
+    def Popen(self, *args, **kwargs):
+        process = self._module.Popen(*args, **kwargs)
+
+        task = tasks.current()
+        if task is not None:
+            task.attach(process)
+
+        return process
+
+
+def track_processes(module):
+    """
+    Привязывает процессы, запускаемые модулем решателя, к расчётам сессий.
+    :param module: модуль, вызывающий subprocess.Popen (pulp.apis.coin_api).
+    """
+    if not isinstance(module.subprocess, _ProcessTracker):
+        module.subprocess = _ProcessTracker(module.subprocess)
@@ -0,0 +1,247 @@
+import enum
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Iterator, List
+
+import numpy as np
+
+from server.config import WORKERS
+from server.criteria import Criteria
+from server.lp import Data, LpSolve
+from server.meta_data import Mode
+from server.pool import PoolRun
+from server.progress import Task, TaskCancelledError, tasks
+
+
+class ResamplingMethod(str, enum.Enum):
+    """Способ формирования выборок."""
+
+    BOOTSTRAP = 'BOOTSTRAP'
+    K_FOLD = 'K_FOLD'
+
+    @staticmethod
+    def build(value):
+        if not value:
+            return ResamplingMethod.BOOTSTRAP
+        return ResamplingMethod(value)
+
+
+QUANTILES = [0.025, 0.25, 0.5, 0.75, 0.975]
+
+_arrays = {}
+
+
+def _load_arrays(path: str):
+    """
+    Открывает подготовленные x и y в воркере без чтения в память (memory-map).
+    Открытые массивы кешируются на время жизни воркера.
+    """
+    if path not in _arrays:
+        _arrays.clear()
+        _arrays[path] = (np.load(os.path.join(path, 'x.npy'), mmap_mode='r'),
+                         np.load(os.path.join(path, 'y.npy'), mmap_mode='r'))
+
+    return _arrays[path]
+
+
+def _solve_replicate(path: str, mode: Mode, data: Data, index: int, train: np.ndarray, test: np.ndarray) -> dict:
+    """
+    Решает задачу на обучающих строках и оценивает модель на отложенных.
+    Выполняется в воркере пула.
+    """
+    start = time.perf_counter()
+
+    data.x, data.y = _load_arrays(path)
+    train_data = data.subset(train)
+    result = LpSolve(mode, train_data).result
+
+    replicate = {
+        'type': 'replicate',
+        'index': index,
+        'a': result.a.tolist(),
+        'e': result.e,
+        'osp': result.osp,
+        'm': result.m,
+        'n': result.N,
+        'test': None,
+    }
+
+    if test.size > 1:
+        y = np.asarray(data.y[test])
+        criteria = Criteria(np.column_stack([y, result.predict(data.x[test])]).tolist())
+        replicate['test'] = {key: getattr(criteria.results, key)[0] for key in Criteria.RESULT_FIELDS}
+
+    replicate['time'] = time.perf_counter() - start
+
+    return replicate
+
+
+class Resampling:
+    """
+    Оценка устойчивости коэффициентов и критериев методами бутстрепа и k-кратной кросс-валидации.
+    Исходные x и y записываются один раз во временные файлы и открываются воркерами через memory-map,
+    каждая выборка передаётся только массивом индексов строк.
+    """
+
+    mode: Mode
+    data: Data
+    method: ResamplingMethod
+    count: int
+    seed: int
+
+    def __init__(self, mode: Mode, data: Data, method: ResamplingMethod, count: int, seed: int = None):
+        """
+        :param mode: режим расчётов.
+        :param data: подготовленные исходные данные.
+        :param method: способ формирования выборок.
+        :param count: количество бутстреп-выборок или число блоков k.
+        :param seed: зерно генератора случайных чисел.
+        """
+        n = data.y.size
+        if method is ResamplingMethod.K_FOLD and not 2 <= count <= n // 2:
+            raise ValueError(f'Число блоков k должно быть от 2 до {n // 2}!')
+        if method is ResamplingMethod.BOOTSTRAP and count < 1:
+            raise ValueError('Количество выборок должно быть положительным!')
+
+        self.mode = mode
+        self.data = data
+        self.method = method
+        self.count = count
+        self.seed = seed
+
+    def index_sets(self) -> Iterator[tuple]:
+        """
+        Формирует пары (обучающие индексы, отложенные индексы).
+        Для бутстрепа отложенными считаются строки, не попавшие в выборку.
+        """
+        n = self.data.y.size
+        rng = np.random.default_rng(self.seed)
+
+        if self.method is ResamplingMethod.BOOTSTRAP:
+            for _ in range(self.count):
+                train = rng.integers(0, n, n)
+                mask = np.ones(n, dtype=bool)
+                mask[train] = False
+                yield train, np.flatnonzero(mask)
+        else:
+            folds = np.array_split(rng.permutation(n), self.count)
+            for i in range(self.count):
+                train = np.concatenate([folds[j] for j in range(self.count) if j != i])
+                yield np.sort(train), np.sort(folds[i])
+
+    def run(self) -> Iterator[dict]:
+        """
+        Решает выборки в пуле воркеров и отдаёт результаты по мере готовности,
+        последним отдаётся сводка по решённым выборкам. Ошибка решения выборки отдаётся записью с полем error
+        и не прерывает остальные. При отмене расчёта новые выборки не отправляются, отдаётся сводка
+        по уже решённым с признаком cancelled, после чего отмена передаётся дальше.
+        """
+        path = tempfile.mkdtemp(prefix='nksp_resampling_')
+        replicates = []
+        try:
+            np.save(os.path.join(path, 'x.npy'), self.data.x)
+            np.save(os.path.join(path, 'y.npy'), self.data.y)
+
+            params = Data.__new__(Data)
+            params.__dict__.update({key: value for key, value in self.data.__dict__.items()
+                                    if key not in ('x', 'y', '_omega')})
+            # Выборка не больше исходных данных: оценка по всем строкам ограничивает размер каждой задачи.
+            size = LpSolve.estimate_size(self.mode, self.data)
+
+            task = tasks.current()
+            with PoolRun() as run:
+                # В пуле не больше WORKERS выборок: следующая отправляется после готовности предыдущей,
+                # и результаты отдаются, не дожидаясь отправки всех выборок.
+                indexes = {}
+                pending = set()
+                for index, (train, test) in enumerate(self.index_sets()):
+                    while len(pending) >= WORKERS:
+                        finished, pending = wait(pending, timeout=Task.PUBLISH_INTERVAL, return_when=FIRST_COMPLETED)
+                        yield from self._collect(finished, indexes, replicates)
+                    if task is not None:
+                        task.check()
+                    future = run.submit(size, _solve_replicate, path, self.mode, params, index, train, test)
+                    indexes[future] = index
+                    pending.add(future)
+
+                while pending:
+                    finished, pending = wait(pending, timeout=Task.PUBLISH_INTERVAL, return_when=FIRST_COMPLETED)
+                    yield from self._collect(finished, indexes, replicates)
+        except TaskCancelledError:
+            yield dict(self.summary(replicates), cancelled=True)
+            raise
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+        yield self.summary(replicates)
+
+    def _collect(self, futures, indexes: dict, replicates: List[dict]) -> Iterator[dict]:
+        """
+        Отдаёт результаты готовых выборок, ошибки решения - записями с полем error, и публикует ход расчёта.
+        """
+        task = tasks.current()
+        for future in futures:
+            try:
+                replicate = future.result()
+            except TaskCancelledError:
+                raise
+            except Exception as error:
+                replicate = {'type': 'replicate', 'index': indexes[future], 'error': str(error) or type(error).__name__}
+            replicates.append(replicate)
+            replicate['done'] = len(replicates)
+            replicate['total'] = self.count
+            yield replicate
+
+        if task is not None:
+            task.check()
+            task.report(done=len(replicates), remaining=self.count - len(replicates))
+
+    def stream(self) -> Iterator[str]:
+        """
+        Отдаёт результаты в формате JSON Lines.
+        """
+        for item in self.run():
+            yield json.dumps(item, ensure_ascii=False) + '\n'
+
+    def summary(self, replicates: List[dict]) -> dict:
+        """
+        Агрегирует результаты решённых выборок: средние, стандартные отклонения и квантили.
+        """
+        failed = sum('error' in item for item in replicates)
+        replicates = [item for item in replicates if 'error' not in item]
+        data = {
+            'type': 'summary',
+            'method': self.method.value,
+            'count': len(replicates),
+            'failed': failed,
+            'quantiles': QUANTILES,
+        }
+        if not replicates:
+            data.update({'a': None, 'train': None, 'time': None, 'test': None})
+            return data
+
+        a = np.array([item['a'] for item in replicates])
+        data.update({
+            'a': Resampling._statistics(a),
+            'train': {key: Resampling._statistics(np.array([item[key] for item in replicates]))
+                      for key in ['e', 'osp', 'm', 'n']},
+            'time': Resampling._statistics(np.array([item['time'] for item in replicates])),
+        })
+
+        scored = [item['test'] for item in replicates if item['test'] is not None]
+        data['test'] = {key: Resampling._statistics(np.array([item[key] for item in scored]))
+                        for key in Criteria.RESULT_FIELDS} if scored else None
+
+        return data
+
+    @staticmethod
+    def _statistics(values: np.ndarray) -> dict:
+        return {
+            'mean': np.mean(values, axis=0).tolist(),
+            'std': np.std(values, axis=0).tolist(),
+            'quantiles': np.quantile(values, QUANTILES, axis=0).tolist(),
+        }
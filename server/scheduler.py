@@ -0,0 +1,189 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from statistics import mean, quantiles
+
+from server.config import SOLVER_CONCURRENCY, SOLVER_MEMORY_BUDGET, SOLVER_MAX_WAIT
+from server.meta_data import Mode
+from server.progress import Task, tasks
+
+
+class SolverOverloadError(Exception):
+    """
+    Решение не может быть выполнено: модель слишком велика или очередь решателя переполнена.
+    """
+
+    retry_after: int | None
+
+    def __init__(self, message: str, retry_after: int = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ModelSize:
+    """
+    Оценка размера задачи ЛП по размерам исходных данных, до построения модели.
+    """
+
+    BYTES_PER_NONZERO = 120  # Элемент матрицы в pulp, в LP-файле и в CBC.
+    BYTES_PER_LINE = 400  # Строка или столбец модели с именем и границами.
+
+    rows: int
+    columns: int
+    nonzeros: int
+
+    def __init__(self, rows: int, columns: int, nonzeros: int):
+        self.rows = rows
+        self.columns = columns
+        self.nonzeros = nonzeros
+
+    @property
+    def memory(self) -> int:
+        """
+        Оценка памяти модели в байтах.
+        """
+        return self.nonzeros * ModelSize.BYTES_PER_NONZERO + (self.rows + self.columns) * ModelSize.BYTES_PER_LINE
+
+    @staticmethod
+    def estimate(mode: Mode, n: int, m: int, pairs: int = None) -> 'ModelSize':
+        """
+        :param mode: режим расчётов.
+        :param n: количество наблюдений.
+        :param m: количество столбцов x (с учётом свободного члена).
+        :param pairs: количество пар с ограничениями, по умолчанию все пары наблюдений.
+        """
+        if pairs is None:
+            pairs = n * (n - 1) // 2
+
+        if mode is Mode.PIECEWISE_GIVEN:
+            rows = n + 2 * n * m + n + pairs
+            columns = 2 * n + pairs + m + n + n * m
+            nonzeros = 3 * n + 2 * n * m + 3 * n * m + n * m + 3 * pairs
+        else:
+            rows = n + pairs
+            columns = 2 * n + pairs + 2 * m
+            nonzeros = n * (2 * m + 2) + pairs * (2 * m + 1)
+
+            if mode is Mode.HMMCAO:
+                rows += n
+                columns += 1
+                nonzeros += 3 * n
+
+        return ModelSize(rows, columns, nonzeros)
+
+    def __str__(self):
+        return f'{self.rows} строк, {self.columns} столбцов, ~{self.memory // 2 ** 20} МБ'
+
+
+class SolverScheduler:
+    """
+    Планировщик решений в процессе приложения.
+    Ограничивает количество одновременно работающих процессов CBC и суммарную оценку их памяти.
+    Решения ждут в очереди по порядку поступления, модели больше бюджета памяти отклоняются сразу.
+    Решения в воркерах пула занимают места планировщика процесса приложения (server.pool.PoolRun),
+    планировщики самих воркеров в общем ограничении не участвуют.
+    """
+
+    max_solves: int
+    memory_budget: int
+    max_wait: float
+
+    def __init__(self, max_solves: int = SOLVER_CONCURRENCY, memory_budget: int = SOLVER_MEMORY_BUDGET * 2 ** 20,
+                 max_wait: float = SOLVER_MAX_WAIT):
+        self.max_solves = max_solves
+        self.memory_budget = memory_budget
+        self.max_wait = max_wait
+
+        self._condition = threading.Condition()
+        self._queue = deque()
+        self._running = 0
+        self._memory = 0
+        self._waits = deque(maxlen=1000)
+        self._solved = 0
+        self._rejected = 0
+
+    def admit(self, size: ModelSize):
+        """
+        Проверяет, что модель в принципе может быть решена. Вызывается до построения модели.
+        """
+        if size.memory > self.memory_budget:
+            with self._condition:
+                self._rejected += 1
+            raise SolverOverloadError(
+                f'Модель слишком велика ({size}) при лимите {self.memory_budget // 2 ** 20} МБ. '
+                f'Уменьшите количество наблюдений.')
+
+    @contextmanager
+    def slot(self, size: ModelSize):
+        """
+        Занимает место для решения модели, при необходимости ожидая в очереди.
+        """
+        self.acquire(size)
+        try:
+            yield
+        finally:
+            self.release(size)
+
+    def acquire(self, size: ModelSize, max_wait: float = None):
+        """
+        Занимает место для решения модели. Ожидание прерывается отменой расчёта текущего потока.
+        :param max_wait: наибольшее время ожидания в секундах, по умолчанию self.max_wait.
+        """
+        self.admit(size)
+
+        task = tasks.current()
+        ticket = object()
+        start = time.perf_counter()
+        deadline = start + (self.max_wait if max_wait is None else max_wait)
+
+        with self._condition:
+            self._queue.append(ticket)
+            try:
+                while not (self._queue[0] is ticket and self._running < self.max_solves
+                           and self._memory + size.memory <= self.memory_budget):
+                    if task is not None:
+                        task.check()
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        self._rejected += 1
+                        raise SolverOverloadError(
+                            f'Решатель перегружен: в очереди {len(self._queue) - 1} задач. Повторите попытку позже.',
+                            retry_after=int(self.max_wait))
+                    self._condition.wait(min(remaining, threading.TIMEOUT_MAX if task is None else Task.PUBLISH_INTERVAL))
+            finally:
+                self._queue.remove(ticket)
+                self._condition.notify_all()
+
+            self._running += 1
+            self._memory += size.memory
+            self._waits.append(time.perf_counter() - start)
+
+    def release(self, size: ModelSize):
+        with self._condition:
+            self._running -= 1
+            self._memory -= size.memory
+            self._solved += 1
+            self._condition.notify_all()
+
+    def stats(self) -> dict:
+        """
+        Состояние очереди: глубина, занятые места и память, время ожидания.
+        """
+        with self._condition:
+            waits = list(self._waits) if self._waits else [0.0]
+            return {
+                'queue_depth': len(self._queue),
+                'running': self._running,
+                'max_solves': self.max_solves,
+                'memory_in_use_mb': self._memory / 2 ** 20,
+                'memory_budget_mb': self.memory_budget / 2 ** 20,
+                'solved': self._solved,
+                'rejected': self._rejected,
+                'wait_mean': mean(waits),
+                'wait_p95': quantiles(waits, n=20, method='inclusive')[-1] if len(waits) > 1 else waits[0],
+                'wait_max': max(waits),
+            }
+
+
+scheduler = SolverScheduler()
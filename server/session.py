@@ -1,13 +1,22 @@
 import datetime
 import json
+import logging
 import pickle
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any
 
 import jwt
 import redis
 
-from server.lp import Result
 from server.meta_data import MetaData
-from server.config import REDIS_HOST, REDIS_PORT, SECRET_JWT
+from server.config import REDIS_HOST, REDIS_PORT, SECRET_JWT, SESSION_CACHE_MEMORY, SESSION_CACHE_SIZE
+
+if TYPE_CHECKING:
+    from server.lp import Result, IdealDotResult
+
+# Общий пул соединений процесса, чтобы не открывать новое соединение на каждое обращение.
+_redis_pool = redis.ConnectionPool(host=REDIS_HOST, port=REDIS_PORT)
 
 
 class Token:
@@ -35,31 +44,140 @@ class Token:
         return self.body
 
 
+class SessionCache:
+    """
+    Кеш сессий в памяти процесса перед Redis: проверенные токены и упакованные MetaData и Result.
+    Ключ токена в Redis хранит номер версии сессии, который увеличивается при каждом сохранении
+    в одной транзакции с записью данных. Номер версии читается вместе с проверкой токена, при совпадении
+    с версией в кеше данные не загружаются из Redis. Запись сессии другим процессом меняет версию,
+    и устаревшие данные загружаются заново.
+    Данные хранятся упакованными и распаковываются при каждом чтении, поэтому объекты запроса не разделяют
+    вложенных объектов с кешем: изменения без сохранения в кеш не попадают.
+    Старые сессии вытесняются (LRU) по количеству и по суммарному размеру упакованных данных.
+    """
+
+    class Entry:
+        token: Token
+        version: int | None
+        values: dict  # Имя данных -> упакованные данные (pickle).
+
+        def __init__(self, token: Token):
+            self.token = token
+            self.version = None
+            self.values = {}
+
+        @property
+        def size(self) -> int:
+            return sum(len(data) for data in self.values.values())
+
+    max_size: int
+    max_memory: int
+    _entries: OrderedDict
+    _memory: int
+    _lock: threading.Lock
+
+    def __init__(self, max_size: int = SESSION_CACHE_SIZE, max_memory: int = SESSION_CACHE_MEMORY * 2 ** 20):
+        self.max_size = max_size
+        self.max_memory = max_memory
+        self._entries = OrderedDict()
+        self._memory = 0
+        self._lock = threading.Lock()
+
+    def token(self, body: str) -> Token | None:
+        """
+        Ранее проверенный токен, подпись повторно не проверяется.
+        """
+        with self._lock:
+            entry = self._entries.get(body)
+            if entry is None:
+                return None
+            self._entries.move_to_end(body)
+            return entry.token
+
+    def put_token(self, token: Token):
+        with self._lock:
+            if token.body not in self._entries:
+                self._entries[token.body] = SessionCache.Entry(token)
+                self._evict()
+
+    def get(self, body: str, version: int | None, name: str) -> tuple:
+        """
+        :return: (найдено ли значение, распакованное значение). Значение найдено, только если версия совпадает.
+        """
+        with self._lock:
+            entry = self._entries.get(body)
+            if entry is None or version is None or entry.version != version or name not in entry.values:
+                return False, None
+            self._entries.move_to_end(body)
+            data = entry.values[name]
+
+        return True, pickle.loads(data)
+
+    def put(self, token: Token, version: int, values: dict):
+        """
+        Сохраняет данные сессии версии version. Данные другой версии удаляются.
+        :param values: имя данных -> упакованные данные (pickle).
+        """
+        with self._lock:
+            entry = self._entries.get(token.body)
+            if entry is None:
+                entry = self._entries[token.body] = SessionCache.Entry(token)
+            elif entry.version is not None and version < entry.version:
+                # Загружены данные старше уже известных, например, при одновременном сохранении.
+                return
+
+            self._memory -= entry.size
+            if entry.version != version:
+                entry.values = {}
+            entry.version = version
+            entry.values.update(values)
+            self._memory += entry.size
+
+            self._entries.move_to_end(token.body)
+            self._evict()
+
+    def drop(self, body: str):
+        with self._lock:
+            entry = self._entries.pop(body, None)
+            if entry is not None:
+                self._memory -= entry.size
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_size or self._memory > self.max_memory):
+            _, entry = self._entries.popitem(last=False)
+            self._memory -= entry.size
+
+
+session_cache = SessionCache()
+
+
 class Session:
     """
     Кастомная сессия пользователя.
     """
 
+    PROGRESS_TTL = 3600  # Время хранения состояния длительного расчёта в секундах.
+
     token: Token
+    version: int | None  # Версия сессии в Redis, по которой проверяется кеш процесса.
     _meta_data: MetaData
-    _result: Result
+    _result: 'Result'
+    _ideal_dot: 'IdealDotResult'
 
     def __init__(self, token: Token = None):
         if token is None:
             self.create_token()
         else:
             self.token = token
+            self.version = None
 
         self._meta_data = None
         self._result = None
+        self._ideal_dot = None
 
     @property
     def meta_data(self) -> MetaData:
-        r = Session._get_redis()
-        if r.get(f'{self.token.body}_meta_data'):
-            self._meta_data = pickle.loads(r.get(f'{self.token.body}_meta_data'))
-        else:
-            self._meta_data = MetaData()
+        self._meta_data = self._load('meta_data', MetaData)
 
         return self._meta_data
 
@@ -70,26 +188,135 @@ class Session:
         self.save()
 
     @property
-    def result(self) -> Result:
-        r = Session._get_redis()
-        if r.get(f'{self.token.body}_result'):
-            self._result = pickle.loads(r.get(f'{self.token.body}_result'))
-        else:
-            self._result = Result.new_result()
+    def result(self) -> 'Result':
+        from server.lp import Result
+
+        self._result = self._load('result', Result.new_result)
 
         return self._result
 
     @result.setter
-    def result(self, new_result: Result):
+    def result(self, new_result: 'Result'):
         self._result = new_result
 
         self.save()
 
+    @property
+    def ideal_dot(self) -> 'IdealDotResult | None':
+        """
+        Результаты поиска идеальной точки вместе с таблицей решений по r.
+        """
+        r = Session._get_redis()
+        data = r.get(f'{self.token.body}_ideal_dot')
+        r.close()
+
+        self._ideal_dot = Session._loads(data, 'ideal_dot') if data else None
+
+        return self._ideal_dot
+
+    @ideal_dot.setter
+    def ideal_dot(self, new_ideal_dot: 'IdealDotResult'):
+        self._ideal_dot = new_ideal_dot
+
+        # Сохраняется отдельно от save(), чтобы сохранение метаданных не перезаписывало таблицу решений.
+        r = Session._get_redis()
+        r.set(f'{self.token.body}_ideal_dot', pickle.dumps(self._ideal_dot))
+        r.expireat(
+            f'{self.token.body}_ideal_dot',
+            datetime.datetime.fromisoformat(f'{datetime.date.today() + datetime.timedelta(days=1)} 04:00:00'))
+        r.close()
+
+    @property
+    def history(self) -> list:
+        """
+        Индекс истории решений сессии, server.history.RunRecord.
+        """
+        r = Session._get_redis()
+        data = r.get(f'{self.token.body}_history')
+        r.close()
+
+        return pickle.loads(data) if data else []
+
+    def get_history_run(self, run_id: str) -> bytes | None:
+        """
+        Упакованный результат решения из истории.
+        """
+        r = Session._get_redis()
+        data = r.get(f'{self.token.body}_history_{run_id}')
+        r.close()
+
+        return data
+
+    def update_history(self, update) -> list:
+        """
+        Изменяет индекс истории решений вместе с новыми и удалёнными результатами в одной транзакции.
+        Индекс читается под WATCH: если другой запрос сессии изменил его до записи, изменение повторяется
+        по новому индексу, поэтому одновременные решения не теряют записи и не оставляют результатов без записи.
+        Как и данные сессии, история хранится до 04:00 следующего дня.
+        :param update: функция (индекс истории) -> (новый индекс, {идентификатор решения: упакованный результат},
+                       идентификаторы вытесненных решений).
+        :return: новый индекс истории.
+        """
+        key = f'{self.token.body}_history'
+        expire = datetime.datetime.fromisoformat(f'{datetime.date.today() + datetime.timedelta(days=1)} 04:00:00')
+
+        r = Session._get_redis()
+        pipe = r.pipeline()
+        try:
+            while True:
+                try:
+                    pipe.watch(key)
+                    data = pipe.get(key)
+                    records, runs, dropped = update(pickle.loads(data) if data else [])
+
+                    pipe.multi()
+                    pipe.set(key, pickle.dumps(records))
+                    pipe.expireat(key, expire)
+                    for run_id, blob in runs.items():
+                        pipe.set(f'{key}_{run_id}', blob)
+                        pipe.expireat(f'{key}_{run_id}', expire)
+                    if dropped:
+                        pipe.delete(*[f'{key}_{run_id}' for run_id in dropped])
+                    pipe.execute()
+                    return records
+                except redis.WatchError:
+                    continue
+        finally:
+            pipe.reset()
+            r.close()
+
+    def _load(self, name: str, default):
+        """
+        Данные сессии из кеша процесса, если их версия совпадает с версией в Redis, иначе из Redis.
+        """
+        found, value = session_cache.get(self.token.body, self.version, name)
+        if found:
+            return value
+
+        # Версия и данные читаются в одной транзакции, чтобы версия соответствовала данным.
+        r = Session._get_redis()
+        pipe = r.pipeline()
+        pipe.get(self.token.body)
+        pipe.get(f'{self.token.body}_{name}')
+        version, data = pipe.execute()
+        r.close()
+
+        value = Session._loads(data, name) if data else None
+        if value is None:
+            return default()
+
+        if version is not None:
+            self.version = Session._version(version)
+            session_cache.put(self.token, self.version, {name: data})
+
+        return value
+
     def create_token(self):
         self.token = Token()
+        self.version = 0
         r = Session._get_redis()
         r.set(
-            self.token.body, "")
+            self.token.body, self.version)
         r.expireat(
             self.token.body,
             datetime.datetime.fromisoformat(f'{datetime.date.today() + datetime.timedelta(days=1)} 04:00:00'))
@@ -98,34 +325,91 @@ class Session:
     @staticmethod
     def get_session(_token: str):
         try:
-            token = Token(_token)
+            token = session_cache.token(_token) or Token(_token)
 
             r = Session._get_redis()
             data = r.get(token.body)
             if data is None:
                 r.close()
+                session_cache.drop(token.body)
                 return Session()
+            if data == b'':
+                # Сессия создана до появления версий.
+                r.set(token.body, 0, keepttl=True)
+                data = b'0'
             r.close()
-            return Session(token)
+
+            session_cache.put_token(token)
+            session = Session(token)
+            session.version = Session._version(data)
+            return session
 
         except jwt.exceptions.InvalidSignatureError:
             return Session()
 
     def save(self):
+        meta_data = pickle.dumps(self._meta_data)
+        result = pickle.dumps(self._result)
+        expire = datetime.datetime.fromisoformat(f'{datetime.date.today() + datetime.timedelta(days=1)} 04:00:00')
+
+        # Данные и новая версия записываются в одной транзакции.
         r = Session._get_redis()
-        r.set(f'{self.token.body}_meta_data', pickle.dumps(self._meta_data))
-        r.set(f'{self.token.body}_result', pickle.dumps(self._result))
-        r.expireat(
-            f'{self.token.body}_meta_data',
-            datetime.datetime.fromisoformat(f'{datetime.date.today() + datetime.timedelta(days=1)} 04:00:00'))
-        r.expireat(
-            f'{self.token.body}_result',
-            datetime.datetime.fromisoformat(f'{datetime.date.today() + datetime.timedelta(days=1)} 04:00:00'))
+        pipe = r.pipeline()
+        pipe.set(f'{self.token.body}_meta_data', meta_data)
+        pipe.set(f'{self.token.body}_result', result)
+        pipe.expireat(f'{self.token.body}_meta_data', expire)
+        pipe.expireat(f'{self.token.body}_result', expire)
+        pipe.incr(self.token.body)
+        self.version = pipe.execute()[-1]
+        r.close()
+
+        session_cache.put(self.token, self.version, {'meta_data': meta_data, 'result': result})
+
+    @staticmethod
+    def set_progress(token: str, progress: dict):
+        """
+        Сохраняет состояние длительного расчёта сессии, которое опрашивает клиент.
+        """
+        r = Session._get_redis()
+        r.set(f'{token}_progress', json.dumps(progress), ex=Session.PROGRESS_TTL)
         r.close()
 
+    @staticmethod
+    def get_progress(token: str) -> dict | None:
+        r = Session._get_redis()
+        data = r.get(f'{token}_progress')
+        r.close()
+
+        return json.loads(data) if data else None
+
+    @staticmethod
+    def ping():
+        """
+        Открывает соединение из пула и проверяет доступность Redis.
+        """
+        r = Session._get_redis()
+        r.ping()
+        r.close()
+
+    @staticmethod
+    def _loads(data: bytes, name: str) -> Any:
+        """
+        Распаковывает данные сессии. Данные, сохранённые несовместимой версией приложения, не распаковываются:
+        вместо ошибки запроса сессия продолжается с данными по умолчанию, которые заменят их при сохранении.
+        """
+        try:
+            return pickle.loads(data)
+        except Exception:
+            logging.warning('Данные сессии %s не распакованы, используются данные по умолчанию', name, exc_info=True)
+            return None
+
+    @staticmethod
+    def _version(data: bytes) -> int:
+        return int(data) if data else 0
+
     @staticmethod
     def _get_redis() -> redis.Redis:
-        return redis.Redis(host=REDIS_HOST, port=REDIS_PORT)
+        return redis.Redis(connection_pool=_redis_pool)
 
     class DataEncoder(json.JSONEncoder):
         """
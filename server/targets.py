@@ -0,0 +1,141 @@
+import time
+from concurrent.futures import wait
+from typing import List
+
+import numpy as np
+
+from server.criteria import Criteria, Results
+from server.lp import Data, LpSolve, Result
+from server.meta_data import MetaData, Mode
+from server.pool import PoolRun
+from server.progress import Task, TaskCancelledError, tasks
+from server.scheduler import SolverOverloadError
+
+
+class TargetResult:
+    """
+    Результат решения задачи для одного выбора зависимой переменной.
+    """
+
+    var_y: int
+    result: Result | None
+    y: np.ndarray | None
+    time: float
+    error: str | None  # Причина, по которой задача не решена.
+
+    def __init__(self, var_y: int, result: Result | None, y: np.ndarray | None, _time: float, error: str = None):
+        self.var_y = var_y
+        self.result = result
+        self.y = y
+        self.time = _time
+        self.error = error
+
+    @staticmethod
+    def failed(var_y: int, error: Exception) -> 'TargetResult':
+        return TargetResult(var_y, None, None, 0.0, str(error) or type(error).__name__)
+
+    @property
+    def e(self) -> float:
+        return self.result.e
+
+    @property
+    def osp(self) -> int:
+        return self.result.osp
+
+    @property
+    def m(self) -> float:
+        return self.result.m
+
+    @property
+    def n(self) -> float:
+        return self.result.N
+
+    def to_print(self) -> list:
+        if self.error is not None:
+            return [self.var_y, f'Не решена: {self.error}']
+        return [self.var_y,
+                Results.formatting(self.e),
+                self.osp,
+                Results.formatting(self.m),
+                Results.formatting(self.n),
+                Results.formatting(self.time)]
+
+
+def _solve_target(mode: Mode, data: Data, var_y: int) -> TargetResult:
+    """
+    Решает задачу для одной зависимой переменной. Выполняется в воркере пула.
+    """
+    start = time.perf_counter()
+    result = LpSolve(mode, data, cache=True).result
+
+    return TargetResult(var_y, result, data.y, time.perf_counter() - start)
+
+
+class LpAllTargets:
+    """
+    Решение задачи для каждого выбора зависимой переменной.
+    Матрица исходных данных подготавливается один раз, задачи решаются параллельно в пуле воркеров.
+    Ход расчёта публикуется по решённым задачам, отмена прерывает решения в воркерах.
+    Задачи, которые не удалось решить, выводятся в таблице с причиной и не мешают остальным.
+    """
+
+    mode: Mode
+    results: List[TargetResult]  # Решённые задачи по возрастанию E, затем нерешённые.
+
+    def __init__(self, meta_data: MetaData):
+        # Для поиска идеальной точки решается МНМ при заданном r.
+        self.mode = Mode.MNM if meta_data.mode is Mode.IDEAL_DOT else meta_data.mode
+        self.results = []
+
+        self._calculation(meta_data)
+
+    def _calculation(self, meta_data: MetaData):
+        matrix = Data.prepare_matrix(meta_data)
+        task = tasks.current()
+
+        solved = []
+        failed = []
+        with PoolRun() as run:
+            targets = {}
+            for var_y in range(1, matrix.shape[1] + 1):
+                data = Data(meta_data, var_y=var_y, matrix=matrix)
+                try:
+                    future = run.submit(LpSolve.estimate_size(self.mode, data), _solve_target, self.mode, data, var_y)
+                except SolverOverloadError as error:
+                    failed.append(TargetResult.failed(var_y, error))
+                    continue
+                targets[future] = var_y
+
+            pending = set(targets)
+            while pending:
+                finished, pending = wait(pending, timeout=Task.PUBLISH_INTERVAL)
+                for future in finished:
+                    try:
+                        solved.append(future.result())
+                    except TaskCancelledError:
+                        raise
+                    except Exception as error:
+                        failed.append(TargetResult.failed(targets[future], error))
+
+                if task is not None:
+                    task.check()
+                    task.report(done=len(targets) - len(pending), remaining=len(pending))
+
+        solved.sort(key=lambda item: (item.e, item.n))
+        failed.sort(key=lambda item: item.var_y)
+        self.results = solved + failed
+
+    def to_print(self) -> list:
+        return [item.to_print() for item in self.results]
+
+    def to_criteria(self) -> Criteria:
+        """
+        Формирует таблицу критериев: для каждой зависимой переменной
+        фактические значения y сравниваются с расчётными.
+        """
+        solved = [item for item in self.results if item.error is None]
+        items = []
+        for item in solved:
+            items.append(Criteria(np.column_stack([item.y, item.result.yy]).tolist()))
+
+        return Criteria.join(items, [f'y = x{item.var_y}' for item in solved])
@@ -0,0 +1,36 @@
+import time
+
+from server.meta_data import MetaData, Mode
+
+
+def warm_up() -> dict:
+    """
+    Прогревает приложение перед приёмом запросов: импортирует стек решателя и выгрузки документов,
+    читает шаблоны docx, решает маленькую задачу МНМ (загрузка CBC с диска) и открывает соединение с Redis.
+    :return: время каждого этапа в секундах.
+    """
+    timings = {}
+
+    start = time.perf_counter()
+    from server.document import preload_templates
+    preload_templates()
+    timings['documents'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    from server.lp import Data, LpSolve
+    meta_data = MetaData()
+    meta_data.mode = Mode.MNM
+    meta_data.load_data = [[1.0, 2.0], [2.0, 3.5], [3.0, 3.9], [4.0, 6.0]]
+    meta_data.var_y = 1
+    meta_data.r = 0.5
+    meta_data.delta = 0.1
+    meta_data.free_chlen = False
+    LpSolve(Mode.MNM, Data(meta_data))
+    timings['solver'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    from server.session import Session
+    Session.ping()
+    timings['redis'] = time.perf_counter() - start
+
+    return timings
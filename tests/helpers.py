@@ -0,0 +1,45 @@
+import numpy as np
+
+from server.lp import Data, Result
+from server.meta_data import MetaData, Mode
+
+
+def meta_data(mode: Mode, n: int, seed: int, r: float = 0.5, high: int = None, window: int = 0,
+              sample: int = 0) -> MetaData:
+    """
+    Исходные данные задачи с тремя факторами и свободным членом.
+    :param high: верхняя граница (не включается) целых значений x и y от 1, много равных значений.
+                 По умолчанию y линейно зависит от x с нормальным шумом.
+    :param window: окно соседних пар приближённого режима.
+    :param sample: количество дальних пар на строку приближённого режима.
+    """
+    rng = np.random.default_rng(seed)
+    if high is None:
+        x = rng.normal(size=(n, 3))
+        y = x @ np.array([1.0, 2.0, -1.0]) + rng.normal(scale=0.5, size=n) + 10
+    else:
+        x = rng.integers(1, high, size=(n, 3)).astype(float)
+        y = rng.integers(1, high, size=n).astype(float)
+
+    data = MetaData()
+    data.mode = mode
+    data.load_data = np.column_stack([y, x]).tolist()
+    data.var_y = 1
+    data.free_chlen = True
+    data.r = r
+    data.delta = 0.1
+    data.delta_1 = 0.1
+    data.delta_2 = 0.1
+    data.pairs_window = window
+    data.pairs_sample = sample
+    return data
+
+
+def objective(mode: Mode, result: Result, data: Data) -> float:
+    """
+    Значение функции цели полной задачи на решении.
+    """
+    if mode is Mode.HMMCAO:
+        return data.r * result.p + (1 - data.r) * result.L + data.delta_1 * float(np.abs(result.a).sum()) + \
+            data.delta_2 * result.m
+    return data.r * result.m + (1 - data.r) * result.L + data.delta * float(np.abs(result.a).sum())
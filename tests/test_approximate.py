@@ -0,0 +1,66 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from server.lp import Data, LpSolve, Result
+from server.meta_data import Mode
+from tests.helpers import meta_data, objective
+
+# Допустимое относительное превышение функции цели полной задачи на приближённом решении
+# (окно 3, выборка 4 пары на строку, 80 строк).
+MAX_GAP = {
+    Mode.MNM: 0.05,
+    Mode.HMMCAO: 0.15,
+}
+# Параметр r задачи в режиме.
+R = {Mode.MNM: 0.5, Mode.HMMCAO: 0.8}
+
+
+class ApproximateTest(unittest.TestCase):
+    """
+    Приближённый режим с разреженным графом пар: потеря качества относительно полной задачи
+    и показатели по всем парам без массивов размера O(n²).
+    """
+
+    def test_quality_gap(self):
+        for mode in MAX_GAP:
+            for seed in range(3):
+                with self.subTest(mode=mode, seed=seed):
+                    data = Data(meta_data(mode, 80, seed, R[mode]))
+                    full = LpSolve(mode, data).result
+                    approximate = LpSolve(mode, Data(meta_data(mode, 80, seed, R[mode], window=3, sample=4))).result
+
+                    optimum = objective(mode, full, data)
+                    self.assertAlmostEqual(approximate.approximation['objective'],
+                                           objective(mode, approximate, data), places=6)
+                    gap = (approximate.approximation['objective'] - optimum) / optimum
+                    self.assertGreaterEqual(gap, -1e-6)
+                    self.assertLessEqual(gap, MAX_GAP[mode])
+
+    def test_pair_criteria_match_all_pairs(self):
+        for mode in MAX_GAP:
+            with self.subTest(mode=mode):
+                data = Data(meta_data(mode, 80, 0, R[mode], window=3, sample=4))
+                with mock.patch('server.lp.RESULT_PAIRS_LIMIT', 0):
+                    result = LpSolve(mode, data).result
+
+                # Пары не перебирались: ни омега, ни вектор l не построены.
+                self.assertIsNone(data._omega)
+                self.assertEqual(result.l.size, 0)
+                self.assertEqual(result.count_rows, data.y.size)
+
+                y, yy = data.y, result.yy
+                k, s = np.triu_indices(y.size, 1)
+                l_ = np.maximum(0.0, -data.omega * (yy[k] - yy[s]))
+                self.assertEqual(result.osp, int(np.count_nonzero((yy[k] - yy[s]) * (y[k] - y[s]) > 0)))
+                self.assertAlmostEqual(result.L, float(l_.sum()), places=8)
+                self.assertAlmostEqual(result.N, float((l_ / (y[k] + y[s])).sum() * 200 / (y.size * (y.size - 1))),
+                                       places=8)
+
+                full = Result.from_coefficients(mode, result.a, data)
+                np.testing.assert_allclose(full.l, l_)
+
+
+if __name__ == '__main__':
+    unittest.main()
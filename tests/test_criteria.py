@@ -0,0 +1,56 @@
+import io
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from server.criteria import ChunkedCriteria, Criteria
+
+
+def file(actual: np.ndarray, calculated: np.ndarray) -> io.BytesIO:
+    return io.BytesIO('\n'.join(f'{y} {yy}' for y, yy in zip(actual, calculated)).encode())
+
+
+class ChunkedCriteriaTest(unittest.TestCase):
+    """
+    Потоковый расчёт критериев: совпадение с расчётом по всем парам, оценка Ñ по выборке пар
+    для большого количества пар и ошибки разбора файла.
+    """
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.actual = rng.random(1500) * 10 + 1
+        self.calculated = self.actual + rng.normal(size=self.actual.size)
+
+    def test_matches_all_pairs(self):
+        chunked = ChunkedCriteria(file(self.actual, self.calculated), chunk_size=400).results
+        exact = Criteria(np.column_stack([self.actual, self.calculated]).tolist()).results
+
+        for key in Criteria.RESULT_FIELDS:
+            with self.subTest(key=key):
+                self.assertAlmostEqual(getattr(chunked, key)[0], getattr(exact, key)[0], places=6)
+        self.assertIsNone(chunked.intervals)
+
+    def test_sampled_relative_continuous_ksp(self):
+        exact = ChunkedCriteria(file(self.actual, self.calculated)).results
+        with mock.patch('server.criteria.CRITERIA_EXACT_PAIRS', 0):
+            sampled = ChunkedCriteria(file(self.actual, self.calculated)).results
+
+        # K и L считаются точно сортировкой при любом количестве пар.
+        self.assertEqual(sampled.ksp, exact.ksp)
+        self.assertAlmostEqual(sampled.continuous_ksp[0], exact.continuous_ksp[0], places=6)
+
+        # Оценка отличается от точного значения не больше чем на три полуширины интервала (уровень доверия 0.95).
+        low, high = sampled.intervals['relative_continuous_ksp'][0]
+        value = exact.relative_continuous_ksp[0]
+        self.assertLessEqual(abs(sampled.relative_continuous_ksp[0] - value), 1.5 * (high - low))
+        self.assertLessEqual(high - low, 0.05 * value)
+
+    def test_malformed_file(self):
+        for content in [b'', b'\n\n', b'1 2\n3\n', b'1 x\n2 3\n', b'1\n2\n', b'1 2\n']:
+            with self.subTest(content=content), self.assertRaises(ValueError):
+                ChunkedCriteria(io.BytesIO(content))
+
+
+if __name__ == '__main__':
+    unittest.main()
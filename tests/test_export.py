@@ -0,0 +1,144 @@
+import csv
+import io
+import json
+import unittest
+import zipfile
+from unittest import mock
+from xml.etree import ElementTree
+
+import numpy as np
+
+from loadtest import MemoryRedis
+from server.criteria import Criteria
+from server.export import CRITERIA_HEADERS, TABLE_HEADERS, ExportFormat, criteria_rows, pod_rows, result_rows, \
+    stream
+from server.lp import POD_DTYPE, Data, LpSolve
+from server.meta_data import Mode
+from server.session import Session
+from tests.helpers import meta_data
+
+NAMESPACE = {'s': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+
+HEADERS = ['name', 'value', 'flag']
+ROWS = [['a<&>', 1.5, True], ['b', float('nan'), False], ['c', None, True], ['d', 3, False], ['e', -0.25, True]]
+
+
+def read_xlsx(content: bytes) -> list:
+    """
+    Значения ячеек листа книги XLSX по строкам.
+    """
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        root = ElementTree.fromstring(archive.read('xl/worksheets/sheet1.xml'))
+
+    rows = []
+    for row in root.iterfind('s:sheetData/s:row', NAMESPACE):
+        values = []
+        for cell in row:
+            kind = cell.get('t')
+            if kind == 'inlineStr':
+                values.append(cell.find('s:is/s:t', NAMESPACE).text)
+            elif kind == 'b':
+                values.append(cell.find('s:v', NAMESPACE).text == '1')
+            elif cell.find('s:v', NAMESPACE) is not None:
+                values.append(float(cell.find('s:v', NAMESPACE).text))
+            else:
+                values.append(None)
+        rows.append(values)
+    return rows
+
+
+class ExportTest(unittest.TestCase):
+    """
+    Выгрузка таблиц: содержимое во всех форматах при выдаче по частям и строки таблиц результатов.
+    """
+
+    def export(self, export_format: ExportFormat) -> bytes:
+        # Маленький блок: таблица выдаётся несколькими частями.
+        with mock.patch('server.export.CHUNK_SIZE', 2):
+            chunks = list(stream(export_format, HEADERS, iter(ROWS)))
+        self.assertGreater(len(chunks), 2)
+        return b''.join(chunks)
+
+    def test_csv(self):
+        rows = list(csv.reader(io.StringIO(self.export(ExportFormat.CSV).decode())))
+
+        self.assertEqual(rows[0], HEADERS)
+        self.assertEqual(rows[1:], [[str(value) if value is not None else '' for value in row] for row in ROWS])
+
+    def test_jsonl(self):
+        lines = self.export(ExportFormat.JSONL).decode().splitlines()
+
+        self.assertEqual(len(lines), len(ROWS))
+        self.assertEqual(json.loads(lines[0]), {'name': 'a<&>', 'value': 1.5, 'flag': True})
+        self.assertEqual(json.loads(lines[2]), {'name': 'c', 'value': None, 'flag': True})
+
+    def test_xlsx(self):
+        rows = read_xlsx(self.export(ExportFormat.XLSX))
+
+        self.assertEqual(rows[0], HEADERS)
+        self.assertEqual(rows[1], ['a<&>', 1.5, True])
+        # Значения, которые не являются конечными числами, записываются строками.
+        self.assertEqual(rows[2], ['b', 'nan', False])
+        self.assertEqual(rows[3], ['c', None, True])
+        self.assertEqual(len(rows), len(ROWS) + 1)
+
+    def test_format(self):
+        self.assertIs(ExportFormat.build(None), ExportFormat.CSV)
+        self.assertIs(ExportFormat.build('xlsx'), ExportFormat.XLSX)
+        with self.assertRaises(ValueError):
+            ExportFormat.build('pdf')
+
+    def test_table_rows(self):
+        for mode in [Mode.MNM, Mode.HMMCAO]:
+            with self.subTest(mode=mode):
+                result = LpSolve(mode, Data(meta_data(mode, 7, 0))).result
+                with mock.patch('server.export.CHUNK_SIZE', 4):
+                    rows = list(result_rows(result, mode))
+
+                self.assertEqual(len(rows), result.count_rows)
+                self.assertTrue(all(len(row) <= len(TABLE_HEADERS[mode]) for row in rows))
+                self.assertEqual(rows, [row[:len(TABLE_HEADERS[mode])]
+                                        for row in result.print_rows(0, result.count_rows)])
+
+        pods = np.zeros(5, dtype=POD_DTYPE)
+        pods['r'] = np.linspace(0.1, 0.5, 5)
+        self.assertEqual([row[0] for row in pod_rows(pods)], pods['r'].tolist())
+        self.assertEqual(list(pod_rows(None)), [])
+
+        criteria = Criteria([[1.0, 1.1, 2.0], [2.0, 2.2, 1.0], [3.0, 2.9, 3.5]])
+        rows = list(criteria_rows(criteria))
+        self.assertEqual([row[0] for row in rows], ['y1', 'y2'])
+        self.assertEqual(len(rows[0]), len(CRITERIA_HEADERS))
+        self.assertEqual(list(criteria_rows(None)), [])
+
+
+class ExportRouteTest(unittest.TestCase):
+    """
+    Маршрут выгрузки: неизвестный формат и таблица, выгрузка до решения.
+    """
+
+    def setUp(self):
+        self.redis = MemoryRedis()
+        patch = mock.patch.object(Session, '_get_redis', staticmethod(lambda: self.redis))
+        patch.start()
+        self.addCleanup(patch.stop)
+
+        from app import app
+        self.client = app.test_client()
+        self.client.get('/')
+
+    def test_route(self):
+        self.assertEqual(self.client.get('/export/answer?format=pdf').status_code, 400)
+        self.assertEqual(self.client.get('/export/unknown').status_code, 404)
+
+        response = self.client.get('/export/pods?format=jsonl')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_data(), b'')
+
+        response = self.client.get('/export/criteria')
+        self.assertEqual(response.mimetype, 'text/csv')
+        self.assertEqual(response.get_data(as_text=True).splitlines(), [','.join(CRITERIA_HEADERS)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+from unittest import mock
+
+from server.first_order import FirstOrderSolve
+from server.lp import Data, LpSolve, Result
+from server.meta_data import Mode
+from server.scheduler import ModelSize
+from tests.helpers import meta_data, objective
+
+
+class FirstOrderTest(unittest.TestCase):
+    """
+    Метод первого порядка: сравнение с решением CBC на малых задачах и оценка памяти для планировщика.
+    """
+
+    def test_objective_matches_cbc(self):
+        for mode in [Mode.MNM, Mode.HMMCAO]:
+            for seed, r in enumerate([0.2, 0.5, 0.8] * 2):
+                with self.subTest(mode=mode, seed=seed, r=r):
+                    meta = meta_data(mode, 12, seed, r, high=9)
+                    data = Data(meta)
+                    optimum = objective(mode, LpSolve(mode, Data(meta)).result, data)
+                    solve = FirstOrderSolve(mode, data)
+                    value = objective(mode, solve.result, data)
+
+                    self.assertAlmostEqual(value, solve.result.convergence['objective'], places=6)
+                    self.assertGreaterEqual(value, optimum - 1e-6)
+                    self.assertLessEqual(value - optimum, solve.gap * abs(value) + 1e-6)
+
+    def test_time_limit(self):
+        meta = meta_data(Mode.MNM, 300, 0, 0.5, high=9)
+        data = Data(meta)
+        solve = FirstOrderSolve(Mode.MNM, data, gap=0, time_limit=0.5)
+        convergence = solve.result.convergence
+
+        # Разрыв 0 недостижим: расчёт останавливается по времени с лучшим найденным решением.
+        self.assertEqual(convergence['limit'], 'time')
+        self.assertLess(convergence['time'], 5)
+        self.assertGreater(convergence['gap'], 0)
+        self.assertAlmostEqual(objective(Mode.MNM, solve.result, data), convergence['objective'], places=6)
+
+        solve = FirstOrderSolve(Mode.MNM, Data(meta_data(Mode.MNM, 12, 0, 0.5, high=9)))
+        self.assertIsNone(solve.result.convergence['limit'])
+
+    def test_size_accounts_for_pairs(self):
+        meta = meta_data(Mode.MNM, 3000, 0, 0.5, high=9)
+        with mock.patch('server.lp.RESULT_PAIRS_LIMIT', 0):
+            solve = FirstOrderSolve(Mode.MNM, Data(meta), max_iterations=50)
+            self.assertIsNone(solve.data._omega)
+            self.assertEqual(solve.result.l.size, 0)
+            self.assertGreaterEqual(solve.size.memory, Result.coefficients_memory(3000))
+
+        # Вектор l сохраняется - в оценку входят все пары.
+        n = 1000
+        size = FirstOrderSolve(Mode.MNM, Data(meta_data(Mode.MNM, n, 0, 0.5, high=9)), execute=False).size
+        self.assertGreaterEqual(size.memory, n * (n - 1) // 2 * Result.PAIR_BYTES)
+        self.assertLess(size.memory, ModelSize.estimate(Mode.MNM, n, 4).memory)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from loadtest import MemoryRedis
+from server.history import RunHistory, decode, encode
+from server.lp import Data, LpSolve
+from server.meta_data import Mode
+from server.session import Session
+from tests.helpers import meta_data
+
+
+class RunHistoryTest(unittest.TestCase):
+    """
+    История решений: упаковка результата, вытеснение по количеству и размеру и одновременные изменения индекса.
+    """
+
+    def setUp(self):
+        self.redis = MemoryRedis()
+        patch = mock.patch.object(Session, '_get_redis', staticmethod(lambda: self.redis))
+        patch.start()
+        self.addCleanup(patch.stop)
+
+        self.session = Session()
+        self.meta = meta_data(Mode.MNM, 10, 0)
+        self.result = LpSolve(Mode.MNM, Data(self.meta)).result
+
+    def add(self, history: RunHistory, r: float):
+        self.meta.r = r
+        return history.add(self.meta, self.result, 0.1)
+
+    def stored(self) -> set:
+        prefix = f'{self.session.token.body}_history_'
+        return {key[len(prefix):] for key in self.redis._data if key.startswith(prefix)}
+
+    def test_encode(self):
+        result = decode(encode(self.result))
+
+        np.testing.assert_array_equal(result.a, self.result.a)
+        np.testing.assert_array_equal(result.l, self.result.l)
+        self.assertEqual(result.get_hash(), self.result.get_hash())
+
+    def test_eviction_by_count(self):
+        history = RunHistory(self.session, max_size=3)
+        records = [self.add(history, r) for r in [0.1, 0.2, 0.3, 0.4, 0.5]]
+
+        self.assertEqual([record.id for record in history.records()], [record.id for record in records[:1:-1]])
+        self.assertEqual(self.stored(), {record.id for record in records[2:]})
+
+        # Повторное решение с теми же параметрами заменяет запись.
+        record = self.add(history, 0.4)
+        self.assertEqual([item.id for item in history.records()], [record.id, records[4].id, records[2].id])
+        self.assertEqual(self.stored(), {record.id, records[4].id, records[2].id})
+        self.assertIsNotNone(RunHistory(self.session).find(self.meta))
+
+    def test_eviction_by_memory(self):
+        size = len(encode(self.result))
+        history = RunHistory(self.session, max_memory=2 * size)
+        records = [self.add(history, r) for r in [0.1, 0.2, 0.3]]
+
+        self.assertEqual([record.id for record in history.records()], [records[2].id, records[1].id])
+        self.assertEqual(self.stored(), {records[2].id, records[1].id})
+
+        # Результат больше допустимого размера истории не сохраняется.
+        self.assertIsNone(self.add(RunHistory(self.session, max_memory=size - 1), 0.4))
+        self.assertEqual(len(self.session.history), 2)
+
+    def test_concurrent_add(self):
+        history = RunHistory(self.session, max_size=2)
+        other = RunHistory(Session.get_session(self.session.token.body), max_size=2)
+        first = self.add(history, 0.1)
+        added = []
+        update_history = self.session.update_history
+
+        def racing(update):
+            def wrapped(records):
+                # Другой запрос сессии сохраняет решение между чтением индекса и записью.
+                if not added:
+                    added.append(self.add(other, 0.2))
+                return update(records)
+
+            return update_history(wrapped)
+
+        with mock.patch.object(self.session, 'update_history', racing):
+            record = self.add(history, 0.3)
+
+        # Изменение повторено по новому индексу: запись другого запроса не потеряна, старая вытеснена.
+        self.assertEqual([item.id for item in history.records()], [record.id, added[0].id])
+        self.assertEqual([item.id for item in self.session.history], [record.id, added[0].id])
+        self.assertEqual(self.stored(), {record.id, added[0].id})
+        self.assertNotIn(first.id, self.stored())
+
+
+if __name__ == '__main__':
+    unittest.main()
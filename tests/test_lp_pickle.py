@@ -0,0 +1,105 @@
+import copyreg
+import pickle
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from loadtest import MemoryRedis
+from server.lp import Data, IdealDotResult, LpSolve, Pod, Result
+from server.meta_data import Mode
+from server.session import Session
+from tests.helpers import meta_data
+
+
+class OldObject:
+    """
+    Объект, который сохраняется в pickle как объект класса cls с состоянием в словаре атрибутов,
+    как до перехода классов результатов на __slots__.
+    """
+
+    def __init__(self, cls, state: dict):
+        self.cls = cls
+        self.state = state
+
+    def __reduce__(self):
+        return copyreg._reconstructor, (self.cls, object, None), self.state
+
+
+def old_pods(pods: np.ndarray) -> list:
+    return [OldObject(Pod, {name: pod[name].item() for name in Pod.__slots__}) for pod in pods]
+
+
+def old_result(result: Result) -> OldObject:
+    # Массивы хранились списками, подзадачи — списком объектов Pod.
+    state = {name: getattr(result, name) for name in ['mode', 'e', 'osp', 'count_rows', 'N', 'L']}
+    state.update({name: getattr(result, name).tolist() for name in ['a', 'eps', 'l', 'yy', 'resp_vector']})
+    state['pods'] = old_pods(result.pods) if result.pods is not None else None
+    return OldObject(Result, state)
+
+
+class PickleTest(unittest.TestCase):
+    """
+    Результаты, сохранённые в сессии до перехода на __slots__, восстанавливаются.
+    """
+
+    def setUp(self):
+        self.result = LpSolve(Mode.MNM, Data(meta_data(Mode.MNM, 8, 0))).result
+
+    def test_result(self):
+        result = pickle.loads(pickle.dumps(old_result(self.result)))
+
+        self.assertIsInstance(result, Result)
+        for name in ['a', 'eps', 'l', 'yy', 'resp_vector']:
+            self.assertIsInstance(getattr(result, name), np.ndarray)
+            np.testing.assert_array_equal(getattr(result, name), getattr(self.result, name))
+        self.assertEqual(result.pods.dtype, self.result.pods.dtype)
+        self.assertEqual(pickle.loads(pickle.dumps(result)).get_hash(), result.get_hash())
+
+    def test_ideal_dot(self):
+        state = {'r': 0.5, 'result': old_result(self.result), 'pods': None, 'pods_': None}
+        ideal_dot = pickle.loads(pickle.dumps(OldObject(IdealDotResult, state)))
+
+        self.assertIsInstance(ideal_dot, IdealDotResult)
+        self.assertEqual(ideal_dot.r, 0.5)
+        np.testing.assert_array_equal(ideal_dot.result.a, self.result.a)
+        self.assertIsNone(ideal_dot.key)
+
+    def test_pods(self):
+        pods = [OldObject(Pod, {'r': 0.1 * i, 'E': 1.0, 'M': 2.0, 'L': 3.0, 'r_dot': 0.2}) for i in range(3)]
+        state = {'r': 0.5, 'result': old_result(self.result), 'pods': pods, 'pods_': pods[:1]}
+        ideal_dot = pickle.loads(pickle.dumps(OldObject(IdealDotResult, state)))
+
+        self.assertIsInstance(ideal_dot.pods, np.ndarray)
+        self.assertEqual(ideal_dot.pods['r'].tolist(), [0.0, 0.1, 0.2])
+        # Поле is_max появилось позже остальных и в старых подзадачах отсутствует.
+        self.assertFalse(ideal_dot.pods['is_max'].any())
+        self.assertEqual(ideal_dot.pods_.size, 1)
+
+
+class SessionPickleTest(unittest.TestCase):
+    """
+    Данные сессии, которые не удаётся распаковать, заменяются данными по умолчанию вместо ошибки запроса.
+    """
+
+    def setUp(self):
+        self.redis = MemoryRedis()
+        patch = mock.patch.object(Session, '_get_redis', staticmethod(lambda: self.redis))
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_broken_data(self):
+        session = Session()
+        self.redis.set(f'{session.token.body}_result', b'not a pickle')
+        self.redis.set(f'{session.token.body}_ideal_dot', b'not a pickle')
+        self.redis.incr(session.token.body)
+
+        session = Session.get_session(session.token.body)
+        with self.assertLogs(level='WARNING'):
+            self.assertIsInstance(session.result, Result)
+        with self.assertLogs(level='WARNING'):
+            self.assertIsNone(session.ideal_dot)
+
+
+if __name__ == '__main__':
+    unittest.main()
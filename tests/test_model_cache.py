@@ -0,0 +1,95 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from server.model_cache import ModelCache
+
+ROOT = hasattr(os, 'getuid') and os.getuid() == 0
+
+
+class ModelCacheTest(unittest.TestCase):
+    """
+    Кеш моделей на диске: проверка владельца и прав каталога и файлов, повреждённые файлы и вытеснение (LRU).
+    """
+
+    def setUp(self):
+        self.base = tempfile.mkdtemp(prefix='nksp_test_')
+        self.addCleanup(shutil.rmtree, self.base, ignore_errors=True)
+        self.path = os.path.join(self.base, 'models')
+        self.cache = ModelCache(self.path, max_size=10 ** 6)
+
+    def test_round_trip(self):
+        self.assertIsNone(self.cache.get('a'))
+        self.cache.put('a', {'value': [1, 2]})
+
+        self.assertEqual(self.cache.get('a'), {'value': [1, 2]})
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o700)
+
+    def test_disabled(self):
+        cache = ModelCache(self.path, max_size=0)
+        cache.put('a', 1)
+
+        self.assertIsNone(cache.get('a'))
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_open_directory(self):
+        os.makedirs(self.path, mode=0o700)
+        self.cache.put('a', 1)
+        os.chmod(self.path, 0o755)
+
+        # Каталог доступен другим пользователям: модели не загружаются и не сохраняются.
+        with self.assertLogs(level='WARNING'):
+            self.assertIsNone(self.cache.get('a'))
+        with self.assertLogs(level='WARNING'):
+            self.cache.put('b', 2)
+        self.assertFalse(os.path.exists(os.path.join(self.path, 'b.pkl')))
+
+    def test_symlink(self):
+        self.cache.put('a', 1)
+        target = os.path.join(self.base, 'model.pkl')
+        with open(target, 'wb') as file:
+            pickle.dump(2, file)
+        os.symlink(target, os.path.join(self.path, 'b.pkl'))
+
+        self.assertIsNone(self.cache.get('b'))
+
+    def test_corrupted_file(self):
+        self.cache.put('a', 1)
+        file_name = os.path.join(self.path, 'a.pkl')
+        with open(file_name, 'wb') as file:
+            file.write(b'not a pickle')
+
+        self.assertIsNone(self.cache.get('a'))
+        self.assertFalse(os.path.exists(file_name))
+
+    @unittest.skipUnless(ROOT, 'смена владельца файла требует прав root')
+    def test_foreign_owner(self):
+        self.cache.put('a', 1)
+        os.chown(os.path.join(self.path, 'a.pkl'), 12345, -1)
+        with self.assertLogs(level='WARNING'):
+            self.assertIsNone(self.cache.get('a'))
+
+        os.chown(self.path, 12345, -1)
+        self.cache.put('b', 2)
+        with self.assertLogs(level='WARNING'):
+            self.assertIsNone(self.cache.get('b'))
+
+    def test_eviction(self):
+        size = len(pickle.dumps(b'x' * 1000, protocol=pickle.HIGHEST_PROTOCOL))
+        cache = ModelCache(self.path, max_size=2 * size)
+        cache.put('a', b'x' * 1000)
+        cache.put('b', b'x' * 1000)
+        os.utime(os.path.join(self.path, 'a.pkl'), (1, 1))
+        os.utime(os.path.join(self.path, 'b.pkl'), (2, 2))
+
+        # Обращение к модели a делает вытесняемой b.
+        self.assertIsNotNone(cache.get('a'))
+        cache.put('c', b'x' * 1000)
+
+        self.assertEqual(sorted(os.listdir(self.path)), ['a.pkl', 'c.pkl'])
+
+
+if __name__ == '__main__':
+    unittest.main()
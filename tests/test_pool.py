@@ -0,0 +1,63 @@
+import multiprocessing
+import os
+import tempfile
+import time
+import unittest
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from unittest import mock
+
+import pulp.apis.coin_api
+
+import server.lp  # noqa: F401 - привязывает процессы решателя к расчётам (track_processes).
+from server.pool import PoolRun
+from server.progress import TaskCancelledError, tasks
+from server.scheduler import ModelSize, SolverScheduler
+
+
+def _solver_process(marker: str) -> int:
+    """
+    Задача воркера: запускает долгий процесс через модуль решателя, как CBC, и ждёт его завершения.
+    """
+    process = pulp.apis.coin_api.subprocess.Popen(['sleep', '30'])
+    open(marker, 'w').close()
+    code = process.wait()
+    tasks.current().check()
+    return code
+
+
+class PoolRunTest(unittest.TestCase):
+    """
+    Отмена расчёта в пуле воркеров завершает процессы решателя в воркерах.
+    """
+
+    def test_cancel_stops_running_solver(self):
+        scheduler = SolverScheduler(max_solves=2, memory_budget=10 ** 9, max_wait=30)
+        executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+        marker = os.path.join(tempfile.mkdtemp(prefix='nksp_test_'), 'started')
+        try:
+            with mock.patch('server.pool.scheduler', scheduler), mock.patch('server.pool._executor', executor), \
+                    PoolRun() as run:
+                future = run.submit(ModelSize(1, 1, 1), _solver_process, marker)
+                queued = run.submit(ModelSize(1, 1, 1), _solver_process, marker)
+
+                deadline = time.monotonic() + 60
+                while not os.path.exists(marker) and time.monotonic() < deadline:
+                    time.sleep(0.05)
+                self.assertTrue(os.path.exists(marker))
+
+                start = time.monotonic()
+                run.cancel()
+                with self.assertRaises(TaskCancelledError):
+                    future.result(timeout=10)
+                self.assertLess(time.monotonic() - start, 5)
+                # Вторая задача ждёт воркер: она отменяется до начала или прерывается по флагу при запуске.
+                with self.assertRaises((CancelledError, TaskCancelledError)):
+                    queued.result(timeout=10)
+        finally:
+            executor.shutdown()
+            os.remove(marker)
+            os.rmdir(os.path.dirname(marker))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+import numpy as np
+
+from server.first_order import FirstOrderSolve
+from server.lp import Data, LpSolve, Presolve
+from server.meta_data import Mode
+from tests.helpers import meta_data, objective
+
+
+def duplicated(mode: Mode, seed: int) -> Data:
+    """
+    Данные с повторяющимися строками, равными y и нулевым последним столбцом x.
+    """
+    meta = meta_data(mode, 40, seed, high=3)
+    meta.load_data = [row + [0.0] for row in meta.load_data]
+    return Data(meta)
+
+
+class PresolveTest(unittest.TestCase):
+    """
+    Предобработка: уменьшенная задача эквивалентна исходной, значения переносятся на все исходные строки и пары.
+    """
+
+    def test_reduction(self):
+        data = duplicated(Mode.MNM, 0)
+        presolve = Presolve(Mode.MNM, data)
+        model = presolve.data
+
+        self.assertLess(model.y.size, data.y.size)
+        self.assertEqual(int(presolve.weights.sum()), data.y.size)
+        np.testing.assert_array_equal(model.y[presolve.rows] * model.scale_y, data.y)
+        np.testing.assert_array_equal((model.x / model.scale_x)[presolve.rows], data.x[:, presolve.columns])
+        self.assertNotIn(data.x.shape[1] - 1, presolve.columns)
+
+        self.assertTrue(np.all(presolve.omega != 0))
+        np.testing.assert_array_equal(presolve.omega, np.sign(model.y[presolve.k] - model.y[presolve.s]))
+        np.testing.assert_array_equal(presolve.pair_weights,
+                                      presolve.weights[presolve.k] * presolve.weights[presolve.s])
+
+    def test_restore_pairs(self):
+        for mode in [Mode.MNM, Mode.HMMCAO]:
+            for seed in range(3):
+                with self.subTest(mode=mode, seed=seed):
+                    data = duplicated(mode, seed)
+                    result = LpSolve(mode, data).result
+
+                    k, s = np.triu_indices(data.y.size, 1)
+                    expected = np.maximum(0.0, -data.omega * (result.yy[k] - result.yy[s]))
+                    np.testing.assert_allclose(result.l, expected, atol=1e-6)
+                    self.assertEqual(result.a[-1], 0.0)
+                    self.assertEqual(result.eps.size, data.y.size)
+
+    def test_objective_matches_full_problem(self):
+        # Метод первого порядка решает задачу по всем исходным строкам и парам без предобработки.
+        for mode in [Mode.MNM, Mode.HMMCAO]:
+            with self.subTest(mode=mode):
+                data = duplicated(mode, 0)
+                value = objective(mode, LpSolve(mode, data).result, data)
+                convergence = FirstOrderSolve(mode, duplicated(mode, 0), gap=1e-6).result.convergence
+
+                self.assertGreaterEqual(value, convergence['dual'] - 1e-6)
+                self.assertLessEqual(value, convergence['objective'] + 1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+
+import numpy as np
+import pulp
+
+from server.lp import Data, LpSolve
+from server.meta_data import Mode
+from tests.helpers import meta_data
+
+
+class RangingTest(unittest.TestCase):
+    """
+    Интервал устойчивости по r: внутри интервала решение остаётся оптимальным, вне его - нет.
+    """
+
+    def test_solution_is_optimal_inside_range(self):
+        for mode in [Mode.MNM, Mode.HMMCAO]:
+            for seed in range(4):
+                with self.subTest(mode=mode, seed=seed):
+                    meta = meta_data(mode, 9, seed, high=5)
+                    lp = LpSolve(mode, Data(meta), ranging=True)
+                    low, high = lp.result.r_range
+                    self.assertLessEqual(low, meta.r)
+                    self.assertGreaterEqual(high, meta.r)
+
+                    for r in np.linspace(0.01, 0.99, 25):
+                        cold = LpSolve(mode, Data(meta), execute=False)
+                        cold.data.r = r
+                        cold._build_function_c()
+                        cold.solve()
+                        optimum = pulp.value(cold._problem.objective)
+
+                        # Значение функции цели при r на решении, найденном при meta.r.
+                        for variable in cold._problem.variables():
+                            variable.varValue = lp._vars[variable.name].varValue
+                        value = pulp.value(cold._problem.objective)
+
+                        inside = low - 1e-6 <= r <= high + 1e-6
+                        self.assertEqual(inside, abs(value - optimum) <= 1e-6 * max(1.0, abs(optimum)), r)
+                        if low + 1e-6 < r < high - 1e-6:
+                            np.testing.assert_allclose(cold.result.a, lp.result.a, atol=1e-6)
+
+    def test_update_params_skips_solve_inside_range(self):
+        meta = meta_data(Mode.MNM, 9, 0, high=5)
+        lp = LpSolve(Mode.MNM, Data(meta), ranging=True)
+        low, high = lp.result.r_range
+        result = lp.result
+
+        self.assertIs(lp.update_params((low + high) / 2), result)
+        if high < 0.99:
+            self.assertIsNot(lp.update_params(min(high + 0.05, 0.99)), result)
+
+
+if __name__ == '__main__':
+    unittest.main()
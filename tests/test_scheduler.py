@@ -0,0 +1,113 @@
+import multiprocessing
+import threading
+import time
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
+
+from server.pool import PoolRun
+from server.scheduler import ModelSize, SolverOverloadError, SolverScheduler
+
+
+def _hold(seconds: float) -> tuple:
+    """
+    Задача воркера: занимает место на seconds секунд и возвращает интервал выполнения.
+    """
+    start = time.time()
+    time.sleep(seconds)
+    return start, time.time()
+
+
+def _overlap(intervals: list) -> int:
+    """
+    Наибольшее количество одновременно выполнявшихся интервалов.
+    """
+    events = sorted([(start, 1) for start, _ in intervals] + [(stop, -1) for _, stop in intervals])
+    current = maximum = 0
+    for _, change in events:
+        current += change
+        maximum = max(maximum, current)
+    return maximum
+
+
+class SchedulerTest(unittest.TestCase):
+    """
+    Планировщик решений: порядок очереди, бюджет памяти и ограничение решений в воркерах пула.
+    """
+
+    def test_queue_is_fifo(self):
+        scheduler = SolverScheduler(max_solves=1, memory_budget=10 ** 9, max_wait=10)
+        size = ModelSize(1, 1, 1)
+        order = []
+
+        def solve(name):
+            with scheduler.slot(size):
+                order.append(name)
+                time.sleep(0.05)
+
+        scheduler.acquire(size)
+        threads = []
+        for name in range(5):
+            thread = threading.Thread(target=solve, args=(name,))
+            thread.start()
+            threads.append(thread)
+            # Следующий поток встаёт в очередь после предыдущего.
+            while scheduler.stats()['queue_depth'] < name + 1:
+                time.sleep(0.01)
+        scheduler.release(size)
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(order, list(range(5)))
+        self.assertEqual(scheduler.stats()['running'], 0)
+
+    def test_memory_budget(self):
+        scheduler = SolverScheduler(max_solves=4, memory_budget=100 * ModelSize.BYTES_PER_NONZERO, max_wait=0.2)
+        half = ModelSize(0, 0, 60)
+
+        with self.assertRaises(SolverOverloadError):
+            scheduler.admit(ModelSize(0, 0, 101))
+
+        with scheduler.slot(half):
+            # Вторая модель не помещается в оставшуюся память и ждёт дольше max_wait.
+            with self.assertRaises(SolverOverloadError) as error:
+                scheduler.acquire(half)
+            self.assertIsNotNone(error.exception.retry_after)
+            self.assertEqual(scheduler.stats()['queue_depth'], 0)
+
+        with scheduler.slot(half):
+            self.assertEqual(scheduler.stats()['memory_in_use_mb'], half.memory / 2 ** 20)
+        self.assertEqual(scheduler.stats()['rejected'], 2)
+
+    def test_pool_runs_respect_limit(self):
+        scheduler = SolverScheduler(max_solves=2, memory_budget=10 ** 9, max_wait=30)
+        executor = ProcessPoolExecutor(max_workers=4, mp_context=multiprocessing.get_context('spawn'))
+        intervals = []
+        running = []
+
+        def calculation():
+            with PoolRun() as run:
+                for _ in range(3):
+                    run.submit(ModelSize(1, 1, 1), _hold, 0.3)
+                    running.append(scheduler.stats()['running'])
+                intervals.extend(future.result() for future in run.futures)
+
+        try:
+            with mock.patch('server.pool.scheduler', scheduler), mock.patch('server.pool._executor', executor):
+                threads = [threading.Thread(target=calculation) for _ in range(2)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+        finally:
+            executor.shutdown()
+
+        self.assertEqual(len(intervals), 6)
+        self.assertLessEqual(_overlap(intervals), 2)
+        self.assertLessEqual(max(running), 2)
+        self.assertEqual(scheduler.stats()['running'], 0)
+        self.assertEqual(scheduler.stats()['solved'], 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import pickle
+import unittest
+from unittest import mock
+
+from loadtest import MemoryRedis
+from server.meta_data import MetaData
+from server.session import Session, SessionCache, Token
+
+
+class SessionCacheTest(unittest.TestCase):
+    """
+    Кеш сессий процесса: проверка версии, независимость прочитанных объектов и вытеснение (LRU).
+    """
+
+    def setUp(self):
+        self.cache = SessionCache(max_size=2, max_memory=10 ** 6)
+        self.token = Token()
+
+    def test_version(self):
+        self.cache.put(self.token, 2, {'meta_data': pickle.dumps({'r': 0.5})})
+
+        self.assertEqual(self.cache.get(self.token.body, 2, 'meta_data'), (True, {'r': 0.5}))
+        self.assertEqual(self.cache.get(self.token.body, 3, 'meta_data'), (False, None))
+        self.assertEqual(self.cache.get(self.token.body, None, 'meta_data'), (False, None))
+        self.assertEqual(self.cache.get(self.token.body, 2, 'result'), (False, None))
+
+        # Данные старше известных не заменяют их, данные новой версии заменяют все данные сессии.
+        self.cache.put(self.token, 1, {'meta_data': pickle.dumps({'r': 0.1})})
+        self.assertEqual(self.cache.get(self.token.body, 2, 'meta_data'), (True, {'r': 0.5}))
+        self.cache.put(self.token, 3, {'result': pickle.dumps([1])})
+        self.assertEqual(self.cache.get(self.token.body, 3, 'meta_data'), (False, None))
+        self.assertEqual(self.cache.get(self.token.body, 3, 'result'), (True, [1]))
+
+    def test_values_are_not_shared(self):
+        self.cache.put(self.token, 1, {'meta_data': pickle.dumps({'load_data': [[1.0, 2.0]]})})
+
+        _, value = self.cache.get(self.token.body, 1, 'meta_data')
+        value['load_data'][0][0] = 100.0
+
+        self.assertEqual(self.cache.get(self.token.body, 1, 'meta_data'), (True, {'load_data': [[1.0, 2.0]]}))
+
+    def test_lru(self):
+        tokens = [Token() for _ in range(3)]
+        for token in tokens[:2]:
+            self.cache.put(token, 1, {'meta_data': pickle.dumps(token.body)})
+
+        # Обращение к первой сессии делает вытесняемой вторую.
+        self.assertIs(self.cache.token(tokens[0].body), tokens[0])
+        self.cache.put(tokens[2], 1, {'meta_data': pickle.dumps(tokens[2].body)})
+
+        self.assertIsNotNone(self.cache.token(tokens[0].body))
+        self.assertIsNone(self.cache.token(tokens[1].body))
+        self.assertIsNotNone(self.cache.token(tokens[2].body))
+
+    def test_memory_limit(self):
+        cache = SessionCache(max_size=10, max_memory=1000)
+        tokens = [Token() for _ in range(3)]
+        for token in tokens:
+            cache.put(token, 1, {'meta_data': pickle.dumps(b'x' * 400)})
+
+        self.assertIsNone(cache.token(tokens[0].body))
+        self.assertIsNotNone(cache.token(tokens[1].body))
+        self.assertIsNotNone(cache.token(tokens[2].body))
+
+
+class SessionTest(unittest.TestCase):
+    """
+    Данные сессии читаются из кеша процесса, пока версия в Redis не изменится.
+    """
+
+    def setUp(self):
+        self.redis = MemoryRedis()
+        patch = mock.patch.object(Session, '_get_redis', staticmethod(lambda: self.redis))
+        patch.start()
+        self.addCleanup(patch.stop)
+        cache = mock.patch('server.session.session_cache', SessionCache())
+        cache.start()
+        self.addCleanup(cache.stop)
+
+    def test_cache_follows_version(self):
+        session = Session()
+        meta_data = MetaData()
+        meta_data.r = 0.3
+        session.meta_data = meta_data
+
+        with mock.patch.object(self.redis, 'get', wraps=self.redis.get) as get:
+            self.assertEqual(Session.get_session(session.token.body).meta_data.r, 0.3)
+            # Прочитан только номер версии, данные взяты из кеша.
+            self.assertEqual([call.args[0] for call in get.call_args_list], [session.token.body])
+
+        # Другой процесс сохраняет сессию: версия меняется, и данные загружаются из Redis.
+        meta_data.r = 0.7
+        self.redis.set(f'{session.token.body}_meta_data', pickle.dumps(meta_data))
+        self.redis.incr(session.token.body)
+
+        self.assertEqual(Session.get_session(session.token.body).meta_data.r, 0.7)
+
+    def test_changes_without_save(self):
+        session = Session()
+        meta_data = MetaData()
+        meta_data.load_data = [[1.0, 2.0]]
+        session.meta_data = meta_data
+
+        Session.get_session(session.token.body).meta_data.load_data[0][0] = 100.0
+
+        self.assertEqual(Session.get_session(session.token.body).meta_data.load_data, [[1.0, 2.0]])
+
+
+if __name__ == '__main__':
+    unittest.main()
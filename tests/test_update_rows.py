@@ -0,0 +1,73 @@
+import copy
+import unittest
+
+import numpy as np
+
+from server.lp import Data, LpSolve
+from server.meta_data import MetaData, Mode
+from tests.helpers import meta_data, objective
+
+
+def changed(meta: MetaData, edits: dict, appended: list) -> MetaData:
+    """
+    Копия метаданных с заменёнными строками edits (номер строки -> строка) и строками appended в конце.
+    """
+    meta = copy.deepcopy(meta)
+    for index, row in edits.items():
+        meta.load_data[index] = list(row)
+    meta.load_data += [list(row) for row in appended]
+    return meta
+
+
+class UpdateRowsTest(unittest.TestCase):
+    """
+    Перенос построенной задачи на изменённые строки: решение совпадает с решением задачи, построенной заново.
+    """
+
+    def check(self, mode: Mode, meta: MetaData, edits: dict, appended: list):
+        lp = LpSolve(mode, Data(meta))
+        new = changed(meta, edits, appended)
+
+        self.assertTrue(lp.update_rows(Data(new), list(edits), len(appended)))
+        result = lp.update_params(new.r)
+        fresh = LpSolve(mode, Data(new))
+
+        data = Data(new)
+        self.assertAlmostEqual(objective(mode, result, data), objective(mode, fresh.result, data), places=6)
+        self.assertEqual(result.yy.size, data.y.size)
+        self.assertEqual(result.l.size, data.y.size * (data.y.size - 1) // 2)
+        # Пары строк с нулевым весом исключаются, у самих строк остаётся только ограничение ошибки.
+        self.assertEqual(lp.presolve.k.size, fresh.presolve.k.size)
+        self.assertEqual(len(lp._problem.constraints) - len(fresh._problem.constraints),
+                         int(np.count_nonzero(lp.presolve.weights == 0)))
+
+    def test_edit_and_append(self):
+        for mode in [Mode.MNM, Mode.HMMCAO]:
+            for seed in range(3):
+                with self.subTest(mode=mode, seed=seed):
+                    meta = meta_data(mode, 15, seed, high=6)
+                    rng = np.random.default_rng(seed + 100)
+                    rows = rng.integers(1, 6, size=(5, 4)).astype(float).tolist()
+                    self.check(mode, meta, {2: rows[0], 7: rows[1]}, rows[2:])
+
+    def test_duplicates(self):
+        for mode in [Mode.MNM, Mode.HMMCAO]:
+            with self.subTest(mode=mode):
+                meta = meta_data(mode, 15, 0, high=6)
+                # Строка 3 совпадает со строкой 0, а единственная исходная строка 5 исчезает;
+                # добавленные строки повторяют существующие.
+                self.check(mode, meta, {3: meta.load_data[0], 5: meta.load_data[1]},
+                           [meta.load_data[2], meta.load_data[2]])
+
+    def test_rebuild_required(self):
+        meta = meta_data(Mode.MNM, 10, 0, high=6)
+        meta.load_data = [row + [0.0] for row in meta.load_data]
+        lp = LpSolve(Mode.MNM, Data(meta))
+
+        # Ненулевое значение в исключённом нулевом столбце x требует построить задачу заново.
+        new = changed(meta, {}, [[1.0, 2.0, 3.0, 4.0, 5.0]])
+        self.assertFalse(lp.update_rows(Data(new), [], 1))
+
+
+if __name__ == '__main__':
+    unittest.main()